@@ -0,0 +1,34 @@
+import argparse
+import time
+from transformers import pipeline
+from bert_engine import MODEL_NAME, BertBatchScorer, normalize_bert_label
+from news_io import read_news
+
+# 📏 Compare the per-row pipeline path with the batched engine on the same texts
+parser = argparse.ArgumentParser(description="BERT throughput: per-row vs batched")
+parser.add_argument("--input", default="gnews_output.csv")
+parser.add_argument("--model", default=MODEL_NAME)
+parser.add_argument("--rows", type=int, default=500, help="Repeat descriptions up to this many rows")
+parser.add_argument("--batch-sizes", default="8,16,32,64")
+args = parser.parse_args()
+
+descriptions = read_news(args.input, columns=['description'])['description'].astype(str).tolist()
+texts = (descriptions * (args.rows // len(descriptions) + 1))[:args.rows]
+print(f"📄 Benchmarking {len(texts)} descriptions with {args.model}")
+
+# 🐢 Current path: one forward pass per article
+sentiment_pipeline = pipeline("sentiment-analysis", model=args.model, framework="pt")
+start = time.perf_counter()
+baseline = [normalize_bert_label(sentiment_pipeline(text)[0]['label']) for text in texts]
+baseline_secs = time.perf_counter() - start
+print(f"per-row      : {len(texts) / baseline_secs:8.1f} rows/s")
+
+# 🚀 Batched path: length-sorted micro-batches with dynamic padding
+for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+    scorer = BertBatchScorer(args.model, batch_size=batch_size)
+    start = time.perf_counter()
+    labels, _ = scorer.score(texts)
+    secs = time.perf_counter() - start
+    agreement = sum(a == b for a, b in zip(labels, baseline)) / len(texts)
+    print(f"batch={batch_size:<6}: {len(texts) / secs:8.1f} rows/s  "
+          f"speedup {baseline_secs / secs:5.1f}x  agreement {agreement:.1%}")
@@ -0,0 +1,56 @@
+import argparse
+import time
+import pandas as pd
+from openai import OpenAI
+from gpt_classifier import MODEL, PROMPT_TEMPLATE, SYSTEM_PROMPT, classify_texts
+from gpt_stub_server import start_stub_server
+
+# 📏 Compare one-at-a-time GPT calls with the async classifier against the local stub
+parser = argparse.ArgumentParser(description="GPT throughput: sequential vs async, against a stub server")
+parser.add_argument("--input", default="pune_news_data.csv")
+parser.add_argument("--rows", type=int, default=100)
+parser.add_argument("--latency", type=float, default=0.2, help="Stub seconds per response")
+parser.add_argument("--error-rate", type=float, default=0.05, help="Stub fraction of 429/5xx replies")
+parser.add_argument("--concurrency", default="4,16,32")
+parser.add_argument("--pack-sizes", default="5,10,20", help="Articles per request for the packed runs")
+args = parser.parse_args()
+
+descriptions = pd.read_csv(args.input)['description'].astype(str).tolist()
+texts = (descriptions * (args.rows // len(descriptions) + 1))[:args.rows]
+server, base_url = start_stub_server(latency=args.latency, error_rate=args.error_rate)
+print(f"📄 {len(texts)} requests against {base_url} ({args.latency}s latency, {args.error_rate:.0%} errors)")
+
+# 🐢 Current path: blocking calls, one after another (the SDK's own retries on)
+client = OpenAI(api_key="stub", base_url=base_url)
+start = time.perf_counter()
+for text in texts:
+    try:
+        client.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "system", "content": SYSTEM_PROMPT},
+                      {"role": "user", "content": PROMPT_TEMPLATE.format(text=text)}],
+            temperature=0.3,
+            max_tokens=10,
+        )
+    except Exception as e:
+        print("Error:", e)
+baseline_secs = time.perf_counter() - start
+print(f"sequential      : {len(texts) / baseline_secs:7.1f} req/s")
+
+# 🚀 Async path: bounded concurrency with jittered retries
+for concurrency in [int(value) for value in args.concurrency.split(",")]:
+    start = time.perf_counter()
+    results = classify_texts(texts, api_key="stub", base_url=base_url, concurrency=concurrency)
+    secs = time.perf_counter() - start
+    print(f"concurrency={concurrency:<4}: {len(texts) / secs:7.1f} req/s  speedup {baseline_secs / secs:5.1f}x  "
+          f"unknown {results.count('Unknown')}")
+
+# 📦 Packed path: several numbered articles per request, at the last concurrency setting
+for pack_size in [int(value) for value in args.pack_sizes.split(",")]:
+    start = time.perf_counter()
+    results = classify_texts(texts, api_key="stub", base_url=base_url, concurrency=concurrency, pack_size=pack_size)
+    secs = time.perf_counter() - start
+    print(f"pack_size={pack_size:<6}: {len(texts) / secs:7.1f} articles/s  speedup {baseline_secs / secs:5.1f}x  "
+          f"unknown {results.count('Unknown')}")
+
+server.shutdown()
@@ -0,0 +1,320 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# 🏁 Benchmarks for every hot path on synthetic corpora of realistic size.
+# Results are stored in benchmark_results/ and compared against a saved
+# baseline; a throughput drop beyond --tolerance is flagged as a regression.
+
+RESULTS_DIR = "benchmark_results"
+BASELINE_FILE = os.path.join(RESULTS_DIR, "baseline.json")
+BENCHMARKS = ("vader", "bert", "gpt", "fetch", "dashboard")
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+SEED_FILES = ("gnews_output.csv", "news_data.csv", "pune_news_data.csv")
+SENTIMENT_WORDS = ["growth", "record", "celebrate", "success", "boost", "win", "crash", "fatal", "loss",
+                   "breach", "war", "injury", "good", "bad", "great", "terrible", "happy", "sad"]
+SOURCES = ["The Hindu", "Times of India", "Hindustan Times", "NDTV", "The Indian Express", "Mint",
+           "Pune Mirror", "Reuters", "BBC", "Moneycontrol"]
+
+
+# --- Synthetic data ----------------------------------------------------------
+
+
+def seed_vocabulary():
+    words = []
+    for path in SEED_FILES:
+        if os.path.exists(path):
+            df = pd.read_csv(path)
+            for column in ("title", "description"):
+                words.extend(" ".join(df[column].dropna().astype(str)).split())
+    return np.array(words + SENTIMENT_WORDS * 20, dtype=object)
+
+
+def synthetic_corpus(rows, seed=0, duplicate_rate=0.3):
+    """Articles shaped like GNews output: ~12-word titles, ~40-word descriptions, some reposts."""
+    rng = np.random.default_rng(seed)
+    vocabulary = seed_vocabulary()
+
+    def texts(count, mean_words):
+        lengths = np.clip(rng.poisson(mean_words, count), 3, None)
+        words = vocabulary[rng.integers(0, len(vocabulary), lengths.sum())]
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        return [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(count)]
+
+    unique = max(1, int(rows * (1 - duplicate_rate)))
+    titles, descriptions = texts(unique, 12), texts(unique, 40)
+    # Reposts: the same title and description under another URL and source
+    pick = np.concatenate([np.arange(unique), rng.integers(0, unique, rows - unique)])
+    published = pd.Timestamp("2025-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s")
+    labels = np.array(["Positive", "Neutral", "Negative"], dtype=object)
+    return pd.DataFrame({
+        "title": np.array(titles, dtype=object)[pick],
+        "description": np.array(descriptions, dtype=object)[pick],
+        "publishedAt": published,
+        "source": np.array(SOURCES, dtype=object)[rng.integers(0, len(SOURCES), rows)],
+        "url": [f"https://news.example.com/{seed}/{i}" for i in range(rows)],
+        "sentiment_title": labels[rng.integers(0, 3, rows)],
+        "sentiment_description": labels[rng.integers(0, 3, rows)],
+    })
+
+
+def timed(fn, repeat=1):
+    """Best wall time over `repeat` runs (and the last result)."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def metric(seconds, items):
+    return {"seconds": round(seconds, 6), "items": int(items), "items_per_sec": round(items / seconds, 2)}
+
+
+# --- Hot paths ---------------------------------------------------------------
+
+
+def bench_vader(df, args):
+    from vader_engine import bucket_compound, compound_scores, stock_mismatches
+
+    def run():
+        return bucket_compound(compound_scores(df["description"], n_jobs=args.jobs))
+
+    seconds, _ = timed(run, args.repeat)
+    # Speed only counts if the labels still match stock NLTK VADER
+    sample = df["description"].drop_duplicates().iloc[:args.vader_parity_rows]
+    mismatches = stock_mismatches(sample)
+    if mismatches:
+        raise RuntimeError(f"{len(mismatches)}/{len(sample)} labels differ from stock VADER, "
+                           f"e.g. {mismatches[0][:80]!r}")
+    # The pre-optimization path, row by row through NLTK, for the speedup on the same machine
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    stock = SentimentIntensityAnalyzer()
+    rows = df["description"].iloc[:args.vader_parity_rows].tolist()
+    stock_seconds, _ = timed(lambda: [stock.polarity_scores(str(text))["compound"] for text in rows], 1)
+    results = {"score_description": metric(seconds, len(df)), "stock_nltk": metric(stock_seconds, len(rows))}
+    print(f"⚡ VADER {results['score_description']['items_per_sec'] / results['stock_nltk']['items_per_sec']:.1f}x "
+          f"stock NLTK with --jobs {args.jobs}")
+    return results
+
+
+def bench_bert(df, args):
+    from bert_engine import make_scorer
+
+    texts = df["description"].iloc[:args.bert_rows].tolist()
+    results = {}
+    for batch_size in [int(size) for size in args.bert_batch_sizes.split(",")]:
+        scorer = make_scorer(args.bert_backend, model_name=args.bert_model, batch_size=batch_size)
+        scorer.score(texts[:batch_size])  # warm-up
+        seconds, _ = timed(lambda: scorer.score(texts), args.repeat)
+        results[f"batch_{batch_size}"] = metric(seconds, len(texts))
+    return results
+
+
+def bench_gpt(df, args):
+    from gpt_classifier import classify_texts
+    from gpt_stub_server import start_stub_server
+
+    texts = df["description"].iloc[:args.gpt_rows].tolist()
+    server, base_url = start_stub_server(latency=args.gpt_latency)
+    try:
+        results = {}
+        for pack_size in (1, 10):
+            seconds, _ = timed(lambda: classify_texts(texts, api_key="stub", base_url=base_url,
+                                                      concurrency=args.gpt_concurrency, pack_size=pack_size),
+                               args.repeat)
+            results[f"pack_{pack_size}"] = metric(seconds, len(texts))
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_fetch(df, args):
+    from fetch_news_gnews import PAGE_SIZE, merge_articles, parse_articles
+
+    # Raw response bodies as GNews would send them, PAGE_SIZE articles per page
+    pages = []
+    for start in range(0, len(df), PAGE_SIZE):
+        page = df.iloc[start:start + PAGE_SIZE]
+        pages.append(json.dumps({"totalArticles": len(df), "articles": [
+            {"title": row.title, "description": row.description,
+             "publishedAt": row.publishedAt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+             "source": {"name": row.source, "url": "https://example.com"}, "url": row.url}
+            for row in page.itertuples(index=False)
+        ]}).encode("utf-8"))
+
+    def run():
+        articles = []
+        for body in pages:
+            articles.extend(parse_articles(json.loads(body)))
+        new = pd.DataFrame(articles)
+        return merge_articles(new.iloc[0:0], new)
+
+    seconds, _ = timed(run, args.repeat)
+    return {"parse_and_merge": metric(seconds, len(df))}
+
+
+def bench_dashboard(df, args):
+    from data_loader import _parse
+    from news_io import write_news
+    from search_index import SearchIndex
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Different stems, so news_io.locate does not swap one copy for the other
+        parquet_path = write_news(df, os.path.join(tmp, "news_parquet.parquet"), "parquet")
+        csv_path = write_news(df, os.path.join(tmp, "news_csv.csv"), "csv")
+        seconds, frame = timed(lambda: _parse(parquet_path), args.repeat)
+        results["load_parquet"] = metric(seconds, len(df))
+        seconds, _ = timed(lambda: _parse(csv_path), args.repeat)
+        results["load_csv"] = metric(seconds, len(df))
+
+    seconds, index = timed(lambda: SearchIndex.build(frame), 1)
+    results["index_build"] = metric(seconds, len(df))
+    queries = ["india", "air india", "growth OR crash", "celeb*"]
+    seconds, _ = timed(lambda: [index.search(query) for query in queries], args.repeat)
+    results["search"] = metric(seconds, len(queries))
+
+    cutoff = frame["publishedAt"].max() - pd.Timedelta(days=30)
+    seconds, _ = timed(lambda: frame[(frame["sentiment_description"] == "Positive")
+                                     & (frame["publishedAt"] >= cutoff)], args.repeat)
+    results["filter"] = metric(seconds, len(df))
+    seconds, _ = timed(lambda: frame.groupby([frame["publishedAt"].dt.date, "sentiment_description"])
+                       .size().unstack(fill_value=0), args.repeat)
+    results["aggregate_daily"] = metric(seconds, len(df))
+    return results
+
+
+BENCHMARK_FUNCTIONS = {"vader": bench_vader, "bert": bench_bert, "gpt": bench_gpt,
+                       "fetch": bench_fetch, "dashboard": bench_dashboard}
+
+
+# --- Results and regressions -------------------------------------------------
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "commit": commit, "pandas": pd.__version__, "numpy": np.__version__}
+
+
+def flatten(results):
+    """{'vader/100k/score_description': items_per_sec, ...} for every measured case."""
+    return {f"{bench}/{size}/{case}": values["items_per_sec"]
+            for bench, by_size in results.items() for size, cases in by_size.items()
+            if isinstance(cases, dict) for case, values in cases.items() if isinstance(values, dict)}
+
+
+def compare(current, baseline, tolerance):
+    """(regressions, missing) against the baseline.
+
+    regressions are cases whose throughput fell more than `tolerance`; missing
+    are baseline cases of a benchmark and size this run covered that have no
+    measurement now (skipped after an error, or no longer produced).
+    """
+    regressions, missing = [], []
+    previous = flatten(baseline["results"])
+    measured = flatten(current["results"])
+    for key, value in measured.items():
+        if key in previous and value < previous[key] * (1 - tolerance):
+            regressions.append((key, previous[key], value))
+    for key in previous:
+        bench, size, _ = key.split("/", 2)
+        if key not in measured and size in current["results"].get(bench, {}):
+            missing.append((key, current["results"][bench][size].get("skipped", "not measured")))
+    return regressions, missing
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    from bert_engine import BACKENDS, MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Benchmark every hot path and flag regressions against a baseline")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="1k,100k", help=f"Corpus sizes, from {','.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is kept")
+    parser.add_argument("--jobs", type=int, default=1, help="VADER processes")
+    parser.add_argument("--vader-parity-rows", type=int, default=2000,
+                        help="Distinct texts checked against stock NLTK VADER per size")
+    parser.add_argument("--bert-model", default=MODEL_NAME)
+    parser.add_argument("--bert-backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--bert-batch-sizes", default="8,32,64")
+    parser.add_argument("--bert-rows", type=int, default=2000, help="Cap on texts scored by BERT per size")
+    parser.add_argument("--gpt-rows", type=int, default=2000, help="Cap on texts sent to the GPT stub per size")
+    parser.add_argument("--gpt-latency", type=float, default=0.05, help="Stub seconds per response")
+    parser.add_argument("--gpt-concurrency", type=int, default=16)
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop before flagging")
+    args = parser.parse_args()
+
+    benchmarks = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(sorted(unknown))}; choose from {','.join(SIZES)}")
+
+    report = {"started": datetime.now().isoformat(timespec="seconds"), "environment": environment(),
+              "settings": {key: value for key, value in vars(args).items()
+                           if key not in ("baseline", "save_baseline")},
+              "results": {name: {} for name in benchmarks}}
+    for size in sizes:
+        print(f"🧪 Generating {size} synthetic articles...")
+        corpus = synthetic_corpus(SIZES[size])
+        for name in benchmarks:
+            try:
+                results = BENCHMARK_FUNCTIONS[name](corpus, args)
+            except Exception as e:
+                print(f"⚠️ {name}/{size} skipped: {e}")
+                report["results"][name][size] = {"skipped": str(e)}
+                continue
+            report["results"][name][size] = results
+            for case, values in results.items():
+                print(f"{name:<9} {size:>5} {case:<18}: {values['items_per_sec']:>12,.1f} items/s "
+                      f"({values['seconds']:.3f}s)")
+
+    path = os.path.join(RESULTS_DIR, f"run_{datetime.now():%Y%m%d_%H%M%S}.json")
+    save_report(report, path)
+    print(f"💾 Results saved to {path}")
+
+    if args.save_baseline:
+        save_report(report, args.baseline)
+        print(f"📌 Baseline updated: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, missing = compare(report, baseline, args.tolerance)
+        print(f"📊 Compared with baseline from {baseline['started']} "
+              f"({len(glob.glob(os.path.join(RESULTS_DIR, 'run_*.json')))} runs on record)")
+        for key, before, after in regressions:
+            print(f"❌ Regression {key}: {before:,.1f} → {after:,.1f} items/s ({after / before - 1:+.0%})")
+        for key, reason in missing:
+            print(f"❌ Missing {key}: in the baseline but {reason}")
+        if regressions or missing:
+            raise SystemExit(1)
+        print("✅ No regressions")
+    else:
+        print("ℹ️ No baseline yet; run with --save-baseline to record one")
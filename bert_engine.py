@@ -0,0 +1,233 @@
+import os
+import time
+import numpy as np
+from tqdm import tqdm
+import perf_metrics
+
+MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", ".onnx_models")
+BACKENDS = ("torch", "onnx")
+LONG_TEXT_MODES = ("truncate", "window")
+
+
+# Convert labels like 'POSITIVE'/'NEGATIVE' to 'Positive'/'Negative'/'Neutral'
+def normalize_bert_label(label):
+    if label == 'POSITIVE':
+        return 'Positive'
+    elif label == 'NEGATIVE':
+        return 'Negative'
+    else:
+        return 'Neutral'
+
+
+def length_sorted_batches(lengths, batch_size):
+    """Group row positions into micro-batches of similar token length."""
+    order = np.argsort(np.asarray(lengths), kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def pad_batch(sequences, pad_id=0):
+    """Pad token id lists to the longest one in the batch (dynamic padding)."""
+    width = max(len(seq) for seq in sequences)
+    input_ids = np.full((len(sequences), width), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+    for row, seq in enumerate(sequences):
+        input_ids[row, :len(seq)] = seq
+        attention_mask[row, :len(seq)] = 1
+    return input_ids, attention_mask
+
+
+class BertBatchScorer:
+    """Batched DistilBERT sentiment scorer.
+
+    Texts are tokenized once, sorted by token length and run through the model
+    in micro-batches padded only to the longest text in each batch, so short
+    headlines never pay for the padding of long descriptions.
+
+    Texts longer than `max_length` tokens are truncated by default. With
+    `long_text="window"` they are split into overlapping windows of
+    `max_length` tokens (`stride` tokens shared between neighbours, at most
+    `max_windows` per text); the windows of all texts are scored together in
+    the same batches and averaged back into one label per text.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=32, max_length=512,
+                 long_text="truncate", stride=128, max_windows=8):
+        from transformers import AutoConfig, AutoTokenizer
+
+        if long_text not in LONG_TEXT_MODES:
+            raise ValueError(f"Unknown long_text mode {long_text!r}; choose one of {LONG_TEXT_MODES}")
+        if long_text == "window" and max_windows < 1:
+            raise ValueError(f"max_windows must be at least 1, got {max_windows}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.long_text = long_text
+        self.stride = stride
+        self.max_windows = max_windows
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.id2label = AutoConfig.from_pretrained(model_name).id2label
+        self.pad_id = self.tokenizer.pad_token_id or 0
+        # Each window holds max_length tokens minus [CLS]/[SEP]; neighbours must advance by at least one
+        window = max_length - self.tokenizer.num_special_tokens_to_add()
+        if long_text == "window" and not 0 <= stride < window:
+            raise ValueError(f"stride must be between 0 and {window - 1} for max_length={max_length}, got {stride}")
+        self._load_model()
+
+    def _load_model(self):
+        from transformers import AutoModelForSequenceClassification
+
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        self.model.eval()
+
+    def _predict_proba(self, input_ids, attention_mask):
+        import torch
+
+        with torch.inference_mode():
+            logits = self.model(input_ids=torch.from_numpy(input_ids),
+                                attention_mask=torch.from_numpy(attention_mask)).logits
+        return torch.softmax(logits, dim=-1).numpy()
+
+    def _tokenize(self, texts):
+        """Token ids per model input and the text each input belongs to."""
+        if self.long_text == "truncate":
+            input_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+            return input_ids, np.arange(len(texts))
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length, stride=self.stride,
+                                 return_overflowing_tokens=True)
+        owners = np.asarray(encoded["overflow_to_sample_mapping"])
+        # Keep only the first max_windows windows of each text to bound its cost
+        rank = np.arange(len(owners)) - np.searchsorted(owners, owners, side="left")
+        keep = np.flatnonzero(rank < self.max_windows)
+        return [encoded["input_ids"][i] for i in keep], owners[keep]
+
+    def _score_inputs(self, input_ids, progress=False):
+        """Class probabilities for each tokenized input; NaN rows where a batch failed."""
+        probs = np.full((len(input_ids), len(self.id2label)), np.nan)
+        batches = length_sorted_batches([len(ids) for ids in input_ids], self.batch_size)
+        stage_metrics = perf_metrics.metrics("bert")
+        for batch in tqdm(batches, disable=not progress, unit="batch"):
+            start = time.perf_counter()
+            try:
+                probs[batch] = self._predict_proba(*pad_batch([input_ids[i] for i in batch], self.pad_id))
+            except Exception as e:
+                print("Error:", e)
+                stage_metrics.count("failed_batches")
+            stage_metrics.observe(time.perf_counter() - start, len(batch))
+        stage_metrics.count("model_inputs", len(input_ids))
+        return probs
+
+    def score(self, texts, progress=False):
+        """Return (labels, scores) for `texts`, in the same order as the input.
+
+        Texts whose inputs all fail are reported as 'Unknown' with a NaN score,
+        matching the per-row behaviour of `classify_sentiment_bert`.
+        """
+        texts = [str(text) for text in texts]
+        labels = ['Unknown'] * len(texts)
+        scores = np.full(len(texts), np.nan)
+        if not texts:
+            return labels, scores
+
+        with perf_metrics.stage("bert", items=len(texts)):
+            input_ids, owners = self._tokenize(texts)
+            probs = self._score_inputs(input_ids, progress)
+        # Average window probabilities per text, weighted by window length; failed windows are skipped
+        ok = ~np.isnan(probs).any(axis=1)
+        weights = np.array([len(ids) for ids in input_ids], dtype=float) * ok
+        totals = np.zeros((len(texts), probs.shape[1]))
+        np.add.at(totals, owners[ok], probs[ok] * weights[ok, None])
+        counts = np.bincount(owners, weights=weights, minlength=len(texts))
+
+        for row in np.flatnonzero(counts > 0):
+            text_probs = totals[row] / counts[row]
+            label_id = int(text_probs.argmax())
+            labels[row] = normalize_bert_label(self.id2label[label_id])
+            scores[row] = float(text_probs[label_id])
+        return labels, scores
+
+
+def onnx_model_path(model_name=MODEL_NAME, quantize=True, cache_dir=ONNX_CACHE_DIR):
+    name = model_name.strip("/").replace("/", "__")
+    return os.path.join(cache_dir, name, "model.int8.onnx" if quantize else "model.onnx")
+
+
+def export_onnx(model_name=MODEL_NAME, quantize=True, cache_dir=ONNX_CACHE_DIR):
+    """Export the classifier to ONNX (int8 dynamic quantization by default) once and reuse the file.
+
+    Files are written under a temporary name and renamed into place, so a
+    concurrent reader never sees half an export.
+    """
+    path = onnx_model_path(model_name, quantize, cache_dir)
+    if os.path.exists(path):
+        return path
+
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    fp32_path = onnx_model_path(model_name, False, cache_dir)
+    os.makedirs(os.path.dirname(fp32_path), exist_ok=True)
+    if not os.path.exists(fp32_path):
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        model.eval()
+        dummy = (torch.ones(1, 8, dtype=torch.long), torch.ones(1, 8, dtype=torch.long))
+        tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        torch.onnx.export(
+            model,
+            dummy,
+            tmp_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                          "attention_mask": {0: "batch", 1: "sequence"},
+                          "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+        os.replace(tmp_path, fp32_path)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, path)
+    return path
+
+
+class OnnxBertScorer(BertBatchScorer):
+    """Same batching as BertBatchScorer, but runs an int8-quantized ONNX export through ONNX Runtime.
+
+    Torch is only needed the first time, to export the model; later runs load
+    the cached .onnx file directly.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=32, max_length=512, quantize=True, threads=None,
+                 **kwargs):
+        self.quantize = quantize
+        self.threads = threads
+        super().__init__(model_name, batch_size, max_length, **kwargs)
+
+    def _load_model(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self.session = ort.InferenceSession(export_onnx(self.model_name, self.quantize), options,
+                                            providers=["CPUExecutionProvider"])
+
+    def _predict_proba(self, input_ids, attention_mask):
+        logits = self.session.run(["logits"], {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def make_scorer(backend="torch", **kwargs):
+    """Build a batch scorer for the chosen backend ('torch' or 'onnx')."""
+    if backend == "onnx":
+        return OnnxBertScorer(**kwargs)
+    if backend == "torch":
+        return BertBatchScorer(**kwargs)
+    raise ValueError(f"Unknown BERT backend {backend!r}; choose one of {BACKENDS}")
@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from bert_engine import BACKENDS, MODEL_NAME
+from news_io import read_news
+
+# ⚖️ Check that the quantized ONNX backend gives the same labels as torch, and what it saves.
+# Each backend runs in its own process so load time and peak memory are measured separately.
+
+
+def load_texts(paths, rows=None):
+    texts = []
+    for path in paths:
+        try:
+            df = read_news(path, columns=['description'])
+        except FileNotFoundError:
+            continue
+        if 'description' in df.columns:
+            texts.extend(df['description'].dropna().astype(str).tolist())
+    return texts[:rows] if rows else texts
+
+
+def run_backend(backend, model, texts_path, output_path, batch_size):
+    from bert_engine import make_scorer
+
+    with open(texts_path) as f:
+        texts = json.load(f)
+    start = time.perf_counter()
+    scorer = make_scorer(backend, model_name=model, batch_size=batch_size)
+    load_secs = time.perf_counter() - start
+    start = time.perf_counter()
+    labels, scores = scorer.score(texts)
+    score_secs = time.perf_counter() - start
+    with open(output_path, "w") as f:
+        json.dump({
+            "labels": labels,
+            "scores": [None if score != score else float(score) for score in scores],
+            "load_secs": load_secs,
+            "score_secs": score_secs,
+            # ru_maxrss is KiB on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }, f)
+
+
+def measure(backend, args, texts_path):
+    fd, output_path = tempfile.mkstemp(suffix=f".{backend}.json")
+    os.close(fd)
+    try:
+        subprocess.run([sys.executable, __file__, "--worker", backend, "--model", args.model,
+                        "--batch-size", str(args.batch_size), "--texts-file", texts_path,
+                        "--result-file", output_path], check=True)
+        with open(output_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BERT backend parity: labels, latency and memory vs torch")
+    parser.add_argument("--input", action="append",
+                        help="CSV with a description column; repeat for several (default: our news CSVs)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backend", choices=BACKENDS, default="onnx", help="Backend to compare against torch")
+    parser.add_argument("--rows", type=int, default=None, help="Only use the first N descriptions")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Exit non-zero below this label agreement")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_backend(args.worker, args.model, args.texts_file, args.result_file, args.batch_size)
+        raise SystemExit(0)
+
+    inputs = args.input or ["gnews_output.csv", "news_data.csv", "pune_news_data.csv"]
+    texts = load_texts(inputs, args.rows)
+    if not texts:
+        print("❌ No descriptions found in", ", ".join(inputs))
+        raise SystemExit(1)
+    print(f"📄 {len(texts)} descriptions from {', '.join(path for path in inputs if os.path.exists(path))}")
+
+    fd, texts_path = tempfile.mkstemp(suffix=".texts.json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(texts, f)
+    try:
+        results = {backend: measure(backend, args, texts_path) for backend in ("torch", args.backend)}
+    finally:
+        os.remove(texts_path)
+
+    for backend, result in results.items():
+        print(f"{backend:<6}: load {result['load_secs']:6.2f}s  score {result['score_secs']:7.2f}s  "
+              f"{len(texts) / result['score_secs']:8.1f} rows/s  peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+    reference, candidate = results["torch"], results[args.backend]
+    agreement = np.mean([a == b for a, b in zip(reference["labels"], candidate["labels"])])
+    deltas = np.abs(np.array(reference["scores"], dtype=float) - np.array(candidate["scores"], dtype=float))
+    print(f"🔁 Label agreement: {agreement:.2%}  |  max score delta {np.nanmax(deltas):.4f}, "
+          f"mean {np.nanmean(deltas):.4f}")
+    print(f"🚀 Speedup {reference['score_secs'] / candidate['score_secs']:.2f}x, "
+          f"memory {candidate['peak_rss_mb'] / reference['peak_rss_mb']:.0%} of torch")
+    if agreement < args.min_agreement:
+        print(f"❌ Agreement below {args.min_agreement:.0%}")
+        raise SystemExit(1)
@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+import perf_metrics
+
+DEFAULT_URL = os.getenv("BERT_SERVER_URL", "http://127.0.0.1:8765")
+
+
+class MicroBatcher:
+    """Coalesces concurrent score requests into shared model batches.
+
+    A single worker thread owns the model. It takes the first waiting request,
+    then keeps collecting requests for up to `max_wait` seconds or until
+    `max_batch_texts` texts are queued, scores them together and hands each
+    caller its own slice of the result.
+    """
+
+    def __init__(self, scorer, max_batch_texts=256, max_wait=0.01):
+        self.scorer = scorer
+        self.max_batch_texts = max_batch_texts
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts):
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch_texts:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                labels, scores = self.scorer.score(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for request_texts, future in pending:
+                stop = start + len(request_texts)
+                future.set_result((labels[start:stop], [None if score != score else float(score)
+                                                        for score in scores[start:stop]]))
+                start = stop
+
+
+def scorer_config(backend="torch", model_name=None, long_text="truncate", stride=128, max_windows=8, **_):
+    """The settings that decide a scorer's labels, as /health reports them."""
+    from bert_engine import MODEL_NAME
+
+    return {"backend": backend, "model": model_name or MODEL_NAME, "long_text": long_text,
+            "stride": stride, "max_windows": max_windows}
+
+
+def make_handler(batcher, config):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok", **config})
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                labels, scores = batcher.submit([str(text) for text in request["texts"]]).result()
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, {"labels": labels, "scores": scores})
+
+    return Handler
+
+
+class BertClient:
+    """Thin client for a running bert_server; same score() contract as BertBatchScorer."""
+
+    def __init__(self, url=DEFAULT_URL, chunk_size=512, timeout=300):
+        self.url = url.rstrip("/")
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def health(self):
+        """The server's /health payload, or None when it is not reachable."""
+        try:
+            response = self.session.get(f"{self.url}/health", timeout=2)
+        except requests.RequestException:
+            return None
+        return response.json() if response.ok else None
+
+    def is_available(self):
+        return self.health() is not None
+
+    def score(self, texts, progress=False):
+        texts = [str(text) for text in texts]
+        labels, scores = [], []
+        with perf_metrics.stage("bert", items=len(texts)) as stage_metrics:
+            for i in range(0, len(texts), self.chunk_size):
+                chunk = texts[i:i + self.chunk_size]
+                with stage_metrics.timer(len(chunk)):
+                    response = self.session.post(f"{self.url}/score", json={"texts": chunk}, timeout=self.timeout)
+                response.raise_for_status()
+                data = response.json()
+                labels.extend(data["labels"])
+                scores.extend(float("nan") if score is None else score for score in data["scores"])
+        return labels, scores
+
+
+def get_scorer(url=DEFAULT_URL, backend="torch", **local_kwargs):
+    """Use the resident server when it is up with the same settings, otherwise load the model in this process."""
+    client = BertClient(url)
+    health = client.health()
+    if health is not None:
+        wanted = scorer_config(backend, **local_kwargs)
+        different = [f"{key}={health.get(key)!r} (want {value!r})" for key, value in wanted.items()
+                     if health.get(key) != value]
+        if not different:
+            print(f"🔌 Using BERT server at {url}")
+            return client
+        print(f"⚠️ BERT server at {url} has {', '.join(different)}; scoring locally instead")
+    from bert_engine import make_scorer
+    return make_scorer(backend, **local_kwargs)
+
+
+if __name__ == "__main__":
+    from bert_engine import BACKENDS, LONG_TEXT_MODES, MODEL_NAME, make_scorer
+
+    parser = argparse.ArgumentParser(description="Keep DistilBERT warm and score texts for local clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="'onnx' runs an int8-quantized export through ONNX Runtime")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per forward pass")
+    parser.add_argument("--long-text", choices=LONG_TEXT_MODES, default="truncate",
+                        help="'window' scores texts over 512 tokens as overlapping windows")
+    parser.add_argument("--stride", type=int, default=128, help="Tokens shared by neighbouring windows")
+    parser.add_argument("--max-windows", type=int, default=8, help="Upper bound on windows per text")
+    parser.add_argument("--max-batch-texts", type=int, default=256, help="Texts coalesced across requests")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="How long to wait for more requests")
+    args = parser.parse_args()
+
+    print(f"⏳ Loading {args.model} ({args.backend})...")
+    scorer = make_scorer(args.backend, model_name=args.model, batch_size=args.batch_size,
+                         long_text=args.long_text, stride=args.stride, max_windows=args.max_windows)
+    scorer.score(["warm-up"])
+    batcher = MicroBatcher(scorer, args.max_batch_texts, args.max_wait_ms / 1000)
+    config = scorer_config(args.backend, args.model, args.long_text, args.stride, args.max_windows)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher, config))
+    server.daemon_threads = True
+    print(f"✅ BERT server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import sqlite3
+import pandas as pd
+import perf_metrics
+
+LEDGER_PATH = os.getenv("BQ_LEDGER_PATH", ".bq_load_ledger.sqlite")
+KEY_COLUMN = "article_key"
+# Keys looked up in the ledger per query
+LOOKUP_CHUNK = 900
+# New tables are partitioned by day of publishedAt, so date-range queries only scan matching days
+PARTITION_FIELD = "publishedAt"
+
+
+def article_key(url):
+    # Same value as TO_HEX(SHA256(url)) in BigQuery, so old rows can be backfilled server-side
+    return hashlib.sha256(str(url).encode("utf-8")).hexdigest()
+
+
+def row_keys(df):
+    """article_key (sha256 of the URL) per row; rows without a URL fall back to title and description."""
+    urls = df["url"] if "url" in df.columns else pd.Series(pd.NA, index=df.index)
+    keys = [None if pd.isna(url) else article_key(url) for url in urls]
+    for i in [i for i, key in enumerate(keys) if key is None]:
+        values = [df[column].iloc[i] for column in ("title", "description") if column in df.columns]
+        # Same text as TEXT_KEY_SQL builds for old rows in BigQuery
+        text = "\n".join("" if pd.isna(value) else str(value) for value in values)
+        keys[i] = "text:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return keys
+
+
+# row_keys() in SQL, for backfilling tables that predate article_key
+TEXT_KEY_SQL = ("COALESCE(TO_HEX(SHA256(url)), CONCAT('text:', TO_HEX(SHA256("
+                "CONCAT(COALESCE(title, ''), '\\n', COALESCE(description, '')))))")
+
+
+def with_article_keys(df):
+    """Return a copy of `df` with an article_key column and one row per key (the last one wins)."""
+    df = df.copy()
+    df[KEY_COLUMN] = row_keys(df)
+    return df.drop_duplicates(subset=KEY_COLUMN, keep="last").reset_index(drop=True)
+
+
+def clustering_fields(columns):
+    """source plus up to three sentiment columns: what dashboard queries filter and group on."""
+    fields = [column for column in columns if column == "source"]
+    fields += [column for column in columns if "sentiment" in column.lower()]
+    return fields[:4]
+
+
+def row_hashes(df):
+    columns = sorted(column for column in df.columns if column != KEY_COLUMN)
+    text = df[columns].astype(str).where(df[columns].notna(), "nan")
+    if PARTITION_FIELD in text.columns:
+        # Typed (Parquet) or raw ("...Z") timestamps hash like the CSV string "YYYY-MM-DD hh:mm:ss+00:00"
+        published = pd.to_datetime(df[PARTITION_FIELD], utc=True, errors="coerce", format="ISO8601")
+        text[PARTITION_FIELD] = published.astype(str).where(published.notna(), text[PARTITION_FIELD])
+    return pd.util.hash_pandas_object(text, index=False).map("{:016x}".format)
+
+
+class LoadLedger:
+    """Local record of which article keys (and which version of each row) a table already has."""
+
+    def __init__(self, destination, path=LEDGER_PATH):
+        self.destination = destination
+        # Long-lived owners (ingest_daemon.py) use it from worker threads, one call at a time
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS loaded ("
+            " destination TEXT NOT NULL, article_key TEXT NOT NULL, row_hash TEXT NOT NULL,"
+            " PRIMARY KEY (destination, article_key))"
+        )
+
+    def pending(self, df):
+        """Split keyed rows into (new, changed) frames relative to what was loaded before."""
+        keys, known = df[KEY_COLUMN].tolist(), {}
+        # Only this frame's keys, in chunks under SQLite's bound-parameter limit
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            known.update(self._conn.execute(
+                f"SELECT article_key, row_hash FROM loaded WHERE destination = ? "
+                f"AND article_key IN ({', '.join('?' * len(chunk))})", (self.destination, *chunk)
+            ).fetchall())
+        hashes = row_hashes(df)
+        previous = df[KEY_COLUMN].map(known)
+        new = df[previous.isna()]
+        changed = df[previous.notna() & (previous != hashes)]
+        return new, changed
+
+    def mark_loaded(self, df):
+        rows = zip([self.destination] * len(df), df[KEY_COLUMN], row_hashes(df))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO loaded (destination, article_key, row_hash) VALUES (?, ?, ?)", rows
+            )
+
+
+class BigQuerySink:
+    """Upserts rows into a BigQuery table through a staging table and MERGE on article_key."""
+
+    def __init__(self, client, table_ref, location="asia-south1"):
+        self.client = client
+        self.table_ref = table_ref
+        self.location = location
+
+    @property
+    def destination(self):
+        return f"{self.table_ref.project}.{self.table_ref.dataset_id}.{self.table_ref.table_id}"
+
+    def _run(self, sql):
+        self.client.query(sql, location=self.location).result()
+
+    def _ensure_key_column(self):
+        # Tables created by the old full-upload script have no article_key yet
+        table = self.client.get_table(self.table_ref)
+        if KEY_COLUMN not in [field.name for field in table.schema]:
+            self._run(f"ALTER TABLE `{self.destination}` ADD COLUMN {KEY_COLUMN} STRING")
+            self._run(f"UPDATE `{self.destination}` SET {KEY_COLUMN} = {TEXT_KEY_SQL} "
+                      f"WHERE {KEY_COLUMN} IS NULL")
+        return table
+
+    @staticmethod
+    def _match_schema(df, table):
+        # Tables loaded from CSV keep publishedAt as STRING; send typed timestamps the same way
+        string_fields = {field.name for field in table.schema if field.field_type == "STRING"}
+        df = df.copy()
+        for column in df.columns:
+            if column in string_fields and pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = df[column].astype(str).where(df[column].notna(), None)
+        return df
+
+    @staticmethod
+    def _layout(df):
+        from google.cloud import bigquery
+
+        job_config = bigquery.LoadJobConfig(clustering_fields=clustering_fields(df.columns) or None)
+        if PARTITION_FIELD in df.columns and pd.api.types.is_datetime64_any_dtype(df[PARTITION_FIELD]):
+            job_config.time_partitioning = bigquery.TimePartitioning(
+                type_=bigquery.TimePartitioningType.DAY, field=PARTITION_FIELD)
+        return job_config
+
+    def repartition(self):
+        """Rewrite an existing unpartitioned table as partitioned and clustered; False if it already is.
+
+        BigQuery can't replace a table with one partitioned differently, so the
+        rows are copied into `<table>_partitioned` (one scan; publishedAt goes
+        from STRING to TIMESTAMP on the way), then the old table is dropped and
+        the copy renamed. If a step fails the copy is kept, and a rerun finishes
+        the swap.
+        """
+        from google.api_core.exceptions import NotFound
+
+        rewritten = f"{self.destination}_partitioned"
+        try:
+            table = self.client.get_table(self.table_ref)
+        except NotFound:
+            # An earlier run dropped the old table but stopped before the rename
+            self.client.get_table(rewritten)
+            self._run(f"ALTER TABLE `{rewritten}` RENAME TO `{self.table_ref.table_id}`")
+            return True
+        if table.time_partitioning is not None and table.time_partitioning.field == PARTITION_FIELD:
+            return False
+        fields = {field.name: field.field_type for field in table.schema}
+        select = "*"
+        if fields.get(PARTITION_FIELD) == "STRING":
+            select = f"* REPLACE (TIMESTAMP({PARTITION_FIELD}) AS {PARTITION_FIELD})"
+        cluster = ", ".join(f"`{column}`" for column in clustering_fields(list(fields)))
+        self._run(f"CREATE OR REPLACE TABLE `{rewritten}` PARTITION BY DATE({PARTITION_FIELD})"
+                  + (f" CLUSTER BY {cluster}" if cluster else "") + f" AS SELECT {select} FROM `{self.destination}`")
+        copied = self.client.get_table(rewritten).num_rows
+        if copied != table.num_rows:
+            raise RuntimeError(f"{rewritten} has {copied} rows but {self.destination} has {table.num_rows}; "
+                               f"{self.destination} left as it was")
+        self._run(f"DROP TABLE `{self.destination}`")
+        self._run(f"ALTER TABLE `{rewritten}` RENAME TO `{self.table_ref.table_id}`")
+        return True
+
+    def upsert(self, df):
+        from google.api_core.exceptions import NotFound
+        from google.cloud import bigquery
+
+        try:
+            df = self._match_schema(df, self._ensure_key_column())
+        except NotFound:
+            # First load: nothing to merge against; create the table partitioned and clustered
+            self.client.load_table_from_dataframe(df, self.table_ref, job_config=self._layout(df),
+                                                  location=self.location).result()
+            return len(df)
+
+        staging_ref = bigquery.DatasetReference(self.table_ref.project, self.table_ref.dataset_id).table(
+            f"{self.table_ref.table_id}_staging")
+        job_config = bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE")
+        self.client.load_table_from_dataframe(df, staging_ref, job_config=job_config, location=self.location).result()
+        columns = ", ".join(f"`{column}`" for column in df.columns)
+        updates = ", ".join(f"`{column}` = S.`{column}`" for column in df.columns if column != KEY_COLUMN)
+        self._run(
+            f"MERGE `{self.destination}` T "
+            f"USING `{staging_ref.project}.{staging_ref.dataset_id}.{staging_ref.table_id}` S "
+            f"ON T.{KEY_COLUMN} = S.{KEY_COLUMN} "
+            f"WHEN MATCHED THEN UPDATE SET {updates} "
+            f"WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({columns})"
+        )
+        self.client.delete_table(staging_ref, not_found_ok=True)
+        return len(df)
+
+
+class SQLiteSink:
+    """Local stand-in for BigQuerySink: same upsert semantics, backed by a SQLite table."""
+
+    def __init__(self, path, table="news_with_sentiment"):
+        self.path = path
+        self.table = table
+        self.destination = f"sqlite:{os.path.abspath(path)}:{table}"
+
+    def upsert(self, df):
+        with sqlite3.connect(self.path) as conn:
+            existing = [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+            if not existing:
+                columns = ", ".join(f'"{column}"' + (" PRIMARY KEY" if column == KEY_COLUMN else "")
+                                    for column in df.columns)
+                conn.execute(f'CREATE TABLE "{self.table}" ({columns})')
+            else:
+                for column in df.columns:
+                    if column not in existing:
+                        conn.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{column}"')
+            columns = ", ".join(f'"{column}"' for column in df.columns)
+            updates = ", ".join(f'"{column}" = excluded."{column}"' for column in df.columns if column != KEY_COLUMN)
+            marks = ", ".join("?" * len(df.columns))
+            rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            conn.executemany(
+                f'INSERT INTO "{self.table}" ({columns}) VALUES ({marks}) '
+                f"ON CONFLICT({KEY_COLUMN}) DO UPDATE SET {updates}",
+                [tuple(str(value) if isinstance(value, pd.Timestamp) else value for value in row) for row in rows],
+            )
+        return len(df)
+
+
+def upload_delta(df, sink, ledger=None):
+    """Send only rows the destination has not seen (or that changed) and record them as loaded."""
+    with perf_metrics.stage("upload") as stage_metrics:
+        ledger = ledger or LoadLedger(sink.destination)
+        keyed = with_article_keys(df)
+        new, changed = ledger.pending(keyed)
+        delta = pd.concat([new, changed])
+        if not delta.empty:
+            with stage_metrics.timer(len(delta)):
+                sink.upsert(delta.reset_index(drop=True))
+            ledger.mark_loaded(delta)
+        stage_metrics.add_items(len(delta))
+        stage_metrics.count("rows_new", len(new))
+        stage_metrics.count("rows_changed", len(changed))
+        stage_metrics.count("rows_skipped", len(keyed) - len(delta))
+    return {"total": len(keyed), "new": len(new), "changed": len(changed),
+            "skipped": len(keyed) - len(delta)}
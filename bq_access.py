@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+import pandas as pd
+import perf_metrics
+from news_io import file_signature, locate, read_news
+
+# Read access to the uploaded news table for dashboard.py. Queries project only
+# the columns shown, filter publishedAt so BigQuery prunes partitions, and are
+# cached for a TTL keyed on the SQL text and parameters, so Streamlit reruns
+# don't re-run (or re-bill) them. DuckDBStore answers the same calls from a
+# local Parquet/CSV file, for development and tests without a GCP project.
+
+QUERY_TTL = int(os.getenv("DASHBOARD_QUERY_TTL", "600"))
+MAX_CACHED_QUERIES = 64
+# Refuse BigQuery queries that would bill more than this (0 = no limit)
+MAX_BYTES_BILLED = int(os.getenv("BQ_MAX_BYTES_BILLED", "0"))
+DISPLAY_COLUMNS = ("title", "description", "publishedAt", "source", "url")
+
+
+class QueryCache:
+    """Query results keyed on (store, SQL, parameters), each kept for `ttl` seconds; shared by every session."""
+
+    def __init__(self, ttl=QUERY_TTL, max_entries=MAX_CACHED_QUERIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_run(self, scope, sql, params, run):
+        key = (scope, sql, tuple(sorted((params or {}).items())))
+        stage_metrics = perf_metrics.metrics("dashboard_query")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                stage_metrics.count("cache_hits")
+                return entry[1]
+        stage_metrics.count("cache_misses")
+        with perf_metrics.stage("dashboard_query", items=1), stage_metrics.timer():
+            result = run()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_query_cache = QueryCache()
+
+
+def day_bounds(start, end):
+    """[start, end] as UTC timestamps, end exclusive; None leaves that side open."""
+    to_utc = lambda day: datetime(day.year, day.month, day.day, tzinfo=timezone.utc)  # noqa: E731
+    return (to_utc(start) if start else None), (to_utc(end + timedelta(days=1)) if end else None)
+
+
+class NewsStore:
+    """Dashboard queries against one news table; subclasses supply the dialect and the execution."""
+
+    def __init__(self, cache=None):
+        self.cache = cache or _query_cache
+
+    # --- dialect ---
+    table = None
+    # Identifies the data behind the store in cache keys
+    name = None
+
+    def quote(self, column):
+        return f'"{column}"'
+
+    def param(self, name):
+        return f"${name}"
+
+    def _execute(self, sql, params):
+        raise NotImplementedError
+
+    def _schema(self):
+        """{column: type name} of the table."""
+        raise NotImplementedError
+
+    def published_expr(self):
+        return self.quote("publishedAt")
+
+    # --- queries ---
+    def query(self, sql, params=None):
+        return self.cache.get_or_run(self.name, sql, params, lambda: self._execute(sql, params or {}))
+
+    def schema(self):
+        return self.cache.get_or_run(self.name, "schema", None, self._schema)
+
+    def columns(self):
+        return list(self.schema())
+
+    def _date_filter(self, start, end, *conditions):
+        low, high = day_bounds(start, end)
+        clauses, params = list(conditions), {}
+        if low is not None:
+            clauses.append(f"{self.published_expr()} >= {self.param('start')}")
+            params["start"] = low
+        if high is not None:
+            clauses.append(f"{self.published_expr()} < {self.param('end')}")
+            params["end"] = high
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def recent_sql(self, columns, start=None, end=None, limit=100):
+        where, params = self._date_filter(start, end)
+        projection = ", ".join(self.quote(column) for column in columns)
+        return (f"SELECT {projection} FROM {self.table}{where} "
+                f"ORDER BY {self.published_expr()} DESC LIMIT {int(limit)}"), params
+
+    def recent_articles(self, columns=None, start=None, end=None, limit=100):
+        """Newest `limit` articles published between `start` and `end` (inclusive dates), only `columns`."""
+        available = self.columns()
+        columns = [column for column in (columns or available) if column in available]
+        return self.query(*self.recent_sql(columns, start, end, limit))
+
+    def latest_day(self):
+        """Date of the newest article in the table, or None when it is empty."""
+        latest = self.query(f"SELECT MAX({self.published_expr()}) AS latest FROM {self.table}")["latest"].iloc[0]
+        return None if pd.isna(latest) else pd.Timestamp(latest).date()
+
+    def sentiment_counts(self, column, start=None, end=None):
+        """Articles per label of `column` over the date range, counted by the database (unscored rows left out)."""
+        where, params = self._date_filter(start, end, f"{self.quote(column)} IS NOT NULL")
+        sql = (f"SELECT {self.quote(column)} AS sentiment, COUNT(*) AS count FROM {self.table}{where} "
+               f"GROUP BY sentiment ORDER BY count DESC")
+        return self.query(sql, params)
+
+
+class BigQueryStore(NewsStore):
+    """Parameterised queries against a BigQuery table (ideally partitioned on publishedAt)."""
+
+    def __init__(self, client, table_id, location="asia-south1", cache=None):
+        super().__init__(cache)
+        self.client = client
+        self.table_id = table_id
+        self.table = f"`{table_id}`"
+        self.name = f"bigquery:{table_id}"
+        self.location = location
+
+    def quote(self, column):
+        return f"`{column}`"
+
+    def param(self, name):
+        return f"@{name}"
+
+    def published_expr(self):
+        # Tables loaded from CSV before partitioning keep publishedAt as STRING (no pruning there)
+        if self.schema().get("publishedAt") == "STRING":
+            return "TIMESTAMP(`publishedAt`)"
+        return "`publishedAt`"
+
+    def _schema(self):
+        return {field.name: field.field_type for field in self.client.get_table(self.table_id).schema}
+
+    def _execute(self, sql, params):
+        from google.cloud import bigquery
+
+        types = {datetime: "TIMESTAMP", date: "DATE", int: "INT64", float: "FLOAT64", str: "STRING"}
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter(name, types[type(value)], value)
+                              for name, value in params.items()])
+        if MAX_BYTES_BILLED:
+            job_config.maximum_bytes_billed = MAX_BYTES_BILLED
+        job = self.client.query(sql, job_config=job_config, location=self.location)
+        df = job.to_dataframe()
+        stage_metrics = perf_metrics.metrics("dashboard_query")
+        stage_metrics.count("bytes_processed", job.total_bytes_processed or 0)
+        stage_metrics.count("bytes_billed", job.total_bytes_billed or 0)
+        return df
+
+
+class DuckDBStore(NewsStore):
+    """Same queries over a local dataset (the newer of its .parquet/.csv copies) with DuckDB."""
+
+    def __init__(self, path, cache=None):
+        import duckdb
+
+        super().__init__(cache)
+        self.path = locate(path)
+        self.table = "news"
+        # The file's version is part of the name, so cached results of an older copy are never served for it
+        self.signature = file_signature(self.path)
+        self.name = f"duckdb:{os.path.abspath(self.path)}:{self.signature[1]}:{self.signature[2]}"
+        self._conn = duckdb.connect()
+        if self.path.endswith(".parquet"):
+            self._conn.execute(f"CREATE VIEW news AS SELECT * FROM read_parquet('{self.path}')")
+        else:
+            # Typed the same way as everywhere else (publishedAt as a UTC timestamp)
+            self._conn.register("news", read_news(self.path))
+        self._lock = threading.Lock()
+
+    def _schema(self):
+        with self._lock:
+            return {row[0]: row[1] for row in self._conn.execute("DESCRIBE news").fetchall()}
+
+    def _execute(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).df()
+
+
+_stores = {}
+
+
+def make_store(spec):
+    """'bigquery:project.dataset.table' (GOOGLE_APPLICATION_CREDENTIALS) or 'duckdb:PATH'.
+
+    One store per spec; a DuckDB store is rebuilt when its file is rewritten.
+    """
+    kind, _, target = spec.partition(":")
+    if kind == "duckdb" and spec in _stores and _stores[spec].signature != file_signature(target):
+        del _stores[spec]
+    if spec not in _stores:
+        if kind == "duckdb":
+            _stores[spec] = DuckDBStore(target)
+        elif kind == "bigquery":
+            from google.cloud import bigquery
+
+            project_id = target.split(".")[0]
+            _stores[spec] = BigQueryStore(bigquery.Client(project=project_id), target)
+        else:
+            raise ValueError(f"Unknown store {spec!r}; use bigquery:project.dataset.table or duckdb:PATH")
+    return _stores[spec]
@@ -0,0 +1,151 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+import perf_metrics
+from vader_engine import bucket_compound, compound_scores
+
+# 🪜 Cascade scoring: VADER labels clear-cut articles, BERT labels the ones VADER
+# finds ambiguous, and only articles BERT is unsure about are sent to GPT.
+# Every row records the tier that decided it and that tier's confidence.
+
+TIERS = ("vader", "bert", "gpt")
+# |VADER compound| at or above this is confident enough to keep
+VADER_BAND = 0.5
+# BERT softmax probability at or above this is confident enough to keep
+BERT_CONFIDENCE = 0.9
+
+
+def cascade_score(texts, bert_fn=None, gpt_fn=None, vader_band=VADER_BAND, bert_confidence=BERT_CONFIDENCE,
+                  n_jobs=1, vader_cache=None):
+    """Label `texts` through the cascade; returns a frame of label, tier and confidence per text.
+
+    `bert_fn` and `gpt_fn` take a list of texts and return (labels, scores),
+    like the functions passed to `cached_score`. A missing tier is skipped:
+    without GPT, low-confidence BERT labels stand; without BERT, ambiguous
+    VADER rows go straight to GPT. Confidence is |compound| for VADER, the
+    softmax probability for BERT and empty for GPT, which reports none. A
+    row whose escalation fails ('Unknown') keeps the label of the tier below.
+    The frame's `attrs["sent"]` holds how many texts were sent to each model.
+    """
+    texts = [None if text is None or text != text else str(text) for text in texts]
+    compound = compound_scores(texts, n_jobs=n_jobs, cache=vader_cache)
+    labels = bucket_compound(compound).astype(object)
+    tiers = np.full(len(texts), "vader", dtype=object)
+    # Rows without text have nothing to escalate and stay Neutral
+    confidence = np.where(np.isnan(compound), 0.0, np.abs(compound))
+    sent = {"bert": 0, "gpt": 0}
+
+    with perf_metrics.stage("cascade", items=len(texts)) as stage_metrics:
+        pending = np.flatnonzero(~np.isnan(compound) & (np.abs(compound) < vader_band))
+        if bert_fn is not None and len(pending):
+            sent["bert"] = len(pending)
+            bert_labels, bert_scores = bert_fn([texts[i] for i in pending])
+            bert_scores = np.array([np.nan if score is None else score for score in bert_scores], dtype=np.float64)
+            scored = np.array([label != "Unknown" for label in bert_labels], dtype=bool)
+            labels[pending[scored]] = np.asarray(bert_labels, dtype=object)[scored]
+            tiers[pending[scored]] = "bert"
+            confidence[pending[scored]] = bert_scores[scored]
+            # NaN compares False, so rows BERT failed on escalate too
+            pending = pending[~(scored & (bert_scores >= bert_confidence))]
+
+        if gpt_fn is not None and len(pending):
+            sent["gpt"] = len(pending)
+            gpt_labels, _ = gpt_fn([texts[i] for i in pending])
+            answered = np.array([label != "Unknown" for label in gpt_labels], dtype=bool)
+            labels[pending[answered]] = np.asarray(gpt_labels, dtype=object)[answered]
+            tiers[pending[answered]] = "gpt"
+            confidence[pending[answered]] = np.nan
+
+        for tier in TIERS:
+            stage_metrics.count(f"decided_{tier}", int((tiers == tier).sum()))
+
+    result = pd.DataFrame({"cascade_sentiment": labels, "cascade_tier": tiers, "cascade_confidence": confidence})
+    result.attrs["sent"] = sent
+    return result
+
+
+def tier_summary(tiers):
+    """One line with the share of rows each tier decided."""
+    counts = pd.Series(tiers).value_counts()
+    total = max(len(tiers), 1)
+    return ", ".join(f"{tier.upper()} {counts.get(tier, 0)} ({counts.get(tier, 0) / total:.0%})" for tier in TIERS)
+
+
+if __name__ == "__main__":
+    from bert_engine import BACKENDS, MODEL_NAME
+    from bert_server import DEFAULT_URL, get_scorer
+    from gpt_classifier import (MODEL, PACKED_PROMPT_TEMPLATE, PACKED_SYSTEM_PROMPT, PROMPT_TEMPLATE,
+                                SYSTEM_PROMPT, classify_texts, normalize_gpt_label, prompt_version)
+    from news_io import read_news, write_news
+    from sentiment_cache import SentimentCache, cached_score
+    from sentiment_rollup import update_rollups
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Score news descriptions with the VADER → BERT → GPT cascade")
+    parser.add_argument("--input", default="gnews_output.csv")
+    parser.add_argument("--output", default="news_with_cascade_sentiment.csv")
+    parser.add_argument("--vader-band", type=float, default=VADER_BAND,
+                        help="Escalate to BERT when |VADER compound| is below this")
+    parser.add_argument("--bert-confidence", type=float, default=BERT_CONFIDENCE,
+                        help="Escalate to GPT when BERT's probability is below this")
+    parser.add_argument("--tiers", default=",".join(TIERS), help="Tiers to use, e.g. 'vader,bert' for no API calls")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="BERT backend")
+    parser.add_argument("--server", default=DEFAULT_URL, help="Resident bert_server to use when it is running")
+    parser.add_argument("--pack-size", type=int, default=1, help="Articles per GPT request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum GPT requests in flight")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="API base URL, e.g. a local stub server")
+    parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+    args = parser.parse_args()
+
+    tiers = {tier.strip() for tier in args.tiers.split(",") if tier.strip()}
+    if "vader" not in tiers or tiers - set(TIERS):
+        parser.error(f"--tiers must include vader and only use {', '.join(TIERS)}")
+
+    # Each tier keeps its own cache namespace, shared with the single-model scripts
+    bert_namespace = f"bert:{MODEL_NAME}:v1" if args.backend == "torch" else f"bert:{MODEL_NAME}:{args.backend}-int8:v1"
+    if args.pack_size > 1:
+        gpt_namespace = f"gpt:{MODEL}:{prompt_version(PACKED_SYSTEM_PROMPT, PACKED_PROMPT_TEMPLATE)}"
+    else:
+        gpt_namespace = f"gpt:{MODEL}:{prompt_version(SYSTEM_PROMPT, PROMPT_TEMPLATE)}"
+    cache = (lambda namespace: None) if args.no_cache else SentimentCache
+
+    scorer = None
+
+    def score_bert(texts):
+        global scorer
+        if scorer is None:
+            scorer = get_scorer(args.server, backend=args.backend, model_name=MODEL_NAME)
+        return scorer.score(texts, progress=True)
+
+    def classify_gpt(texts):
+        return classify_texts(texts, api_key=os.getenv("OPENAI_API_KEY"), base_url=args.base_url,
+                              concurrency=args.concurrency, pack_size=args.pack_size), None
+
+    bert_cache, gpt_cache = cache(bert_namespace), cache(gpt_namespace)
+
+    def gpt_fn(texts):
+        # Labels cached by news_sentiment_LLM.py are the raw replies
+        replies, _ = cached_score(gpt_cache, texts, classify_gpt)
+        return [reply if reply == "Unknown" else normalize_gpt_label(reply) for reply in replies], None
+
+    bert_fn = (lambda texts: cached_score(bert_cache, texts, score_bert)) if "bert" in tiers else None
+    gpt_fn = gpt_fn if "gpt" in tiers else None
+
+    df = read_news(args.input)
+    result = cascade_score(df["description"].tolist(), bert_fn, gpt_fn, args.vader_band, args.bert_confidence,
+                           vader_cache=cache("vader:nltk:v2"))
+    sent = result.attrs["sent"]
+    df = pd.concat([df.drop(columns=result.columns, errors="ignore").reset_index(drop=True), result], axis=1)
+    print("🪜 Decided by:", tier_summary(df["cascade_tier"]))
+    print(f"💸 BERT scored {sent['bert']} of {len(df)} articles, GPT {sent['gpt']}")
+
+    written = write_news(df, args.output)
+    update_rollups(df, written)
+    print(f"✅ Saved to {written}")
+    print(df[["title", "cascade_sentiment", "cascade_tier", "cascade_confidence"]].head(10))
+
+    # 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+    perf_metrics.export()
@@ -1,46 +1,51 @@
 import streamlit as st
-from google.cloud import bigquery
-import pandas as pd
 import plotly.express as px
 import os
+from datetime import date, timedelta
+import perf_metrics
+from bq_access import DISPLAY_COLUMNS, make_store
 
 # ✅ Step 1: Set Google credentials (hardcoded path)
 gcp_key_path = r"<PATH_TO_GCP_KEY>.json"  # Make sure this is the correct .json key
 project_id = "<YOUR_PROJECT_ID>"
+dataset = "news_dataset_asia"
+table = "news_with_sentiment"
 
-if not os.path.exists(gcp_key_path):
-    st.error(f"❌ GCP key file not found at: {gcp_key_path}")
-    st.stop()
+# NEWS_STORE=duckdb:news_with_bert_sentiment.csv runs the same queries on a local file instead
+store_spec = os.getenv("NEWS_STORE", f"bigquery:{project_id}.{dataset}.{table}")
 
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = gcp_key_path
+if store_spec.startswith("bigquery"):
+    if not os.path.exists(gcp_key_path):
+        st.error(f"❌ GCP key file not found at: {gcp_key_path}")
+        st.stop()
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = gcp_key_path
 
 # ✅ Step 2: Set up Streamlit layout
 st.set_page_config(page_title="News Dashboard", layout="wide")
 st.title("📰 Real-time News Sentiment Dashboard")
 
 try:
-    st.write("🔌 Connecting to BigQuery...")
+    st.write(f"🔌 Connecting to {store_spec.split(':')[0]}...")
 
-    # ✅ Step 3: Initialize BigQuery client
-    client = bigquery.Client()
+    # ✅ Step 3: Initialize the data store (shared across reruns; results are cached for DASHBOARD_QUERY_TTL)
+    store = make_store(store_spec)
 
-    # ✅ Step 4: Define dataset and table
-    dataset = "news_dataset_asia"
-    table = "news_with_sentiment"
+    # ✅ Step 4: Date range: only these days' partitions are scanned (default: the table's newest week)
+    latest = store.latest_day() or date.today()
+    picked = st.date_input("📅 Published between:", (latest - timedelta(days=7), latest))
+    picked = tuple(picked) if isinstance(picked, (tuple, list)) else (picked,)
+    start, end = picked[0], picked[-1]
 
-    # ✅ Step 5: Run SQL query
-    query = f"""
-    SELECT * 
-    FROM `{project_id}.{dataset}.{table}`
-    ORDER BY publishedAt DESC
-    LIMIT 100
-    """
+    # ✅ Step 5: Run SQL query, selecting only the columns shown below
+    sentiment_columns = [column for column in store.columns() if 'sentiment' in column.lower()]
+    query, params = store.recent_sql([column for column in DISPLAY_COLUMNS + tuple(sentiment_columns)
+                                      if column in store.columns()], start, end)
 
     st.code(query)
     st.write("📥 Running query...")
 
-    df = client.query(query).to_dataframe()
-    st.success("✅ Data fetched successfully!")
+    df = store.query(query, params)
+    st.success(f"✅ Data fetched successfully! ({len(df)} newest articles)")
 
     # ✅ Step 6: Search filter
     keyword = st.text_input("🔍 Search by keyword (in title or description):")
@@ -52,9 +57,13 @@ try:
     st.markdown("### 📄 News Results")
     st.dataframe(df)
 
-    # ✅ Step 8: Sentiment Distribution
-    if 'sentiment' in df.columns:
-        sentiment_counts = df['sentiment'].value_counts().reset_index()
+    # ✅ Step 8: Sentiment Distribution over the whole date range, counted by the database
+    if sentiment_columns:
+        selected_sentiment = st.selectbox("Select sentiment column:", sentiment_columns)
+        if keyword:
+            sentiment_counts = df[selected_sentiment].value_counts().reset_index()
+        else:
+            sentiment_counts = store.sentiment_counts(selected_sentiment, start, end)
         sentiment_counts.columns = ['sentiment', 'count']
 
         st.markdown("### 📊 Sentiment Distribution")
@@ -69,3 +78,6 @@ except Exception as e:
 # ✅ Step 9: Footer
 st.markdown("---")
 st.write("© 2025 Pallavi Ranamale | Powered by Streamlit & Google BigQuery")
+
+# 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+perf_metrics.export(verbose=False)
@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import requests
 import os
 from dotenv import load_dotenv
+from data_loader import load_news_frame, load_search_index, load_sentiment_counts
+from gnews_cache import fetch_news, remaining_quota
+from news_io import read_news
+import perf_metrics
 from openai import OpenAI
 from tqdm import tqdm
 
@@ -47,32 +50,27 @@ with tab1:
     
     # File selection
     data_source = st.selectbox(
-        "Choose CSV file:",
+        "Choose data file:",
         ["news_with_sentiment.csv", "news_with_bert_sentiment.csv", "gnews_output.csv", "news_with_gpt_sentiment.csv"]
     )
     
     try:
-        # Load data from CSV
-        df = pd.read_csv(data_source)
+        # Load the Parquet copy (or the CSV if newer), parsed once per file version and shared across sessions
+        df = load_news_frame(data_source)
         
         if df.empty:
             st.warning("No data found in the selected file.")
         else:
             st.success(f"✅ Loaded {len(df)} articles from {data_source}")
             
-            # Convert publishedAt to datetime if it exists
-            if 'publishedAt' in df.columns:
-                df['publishedAt'] = pd.to_datetime(df['publishedAt'], errors='coerce')
-                df = df.sort_values('publishedAt', ascending=False)
-            
             # Search filter
-            keyword = st.text_input("🔍 Search by keyword (in title or description):")
+            keyword = st.text_input(
+                "🔍 Search by keyword (in title or description):",
+                help="Words are ANDed; use OR for alternatives and a trailing * for prefixes, e.g. air india OR aviat*"
+            )
             if keyword:
-                mask = (
-                    df['title'].astype(str).str.contains(keyword, case=False, na=False) |
-                    df['description'].astype(str).str.contains(keyword, case=False, na=False)
-                )
-                df = df[mask]
+                # Look the terms up in the inverted index built once for this file version
+                df = df.iloc[load_search_index(data_source).search(keyword)]
                 st.info(f"Found {len(df)} articles matching '{keyword}'")
             
             # Show data
@@ -86,7 +84,12 @@ with tab1:
                 selected_sentiment = st.selectbox("Select sentiment column:", sentiment_columns)
                 
                 if selected_sentiment in df.columns:
-                    sentiment_counts = df[selected_sentiment].value_counts().reset_index()
+                    if keyword:
+                        label_counts = df[selected_sentiment].value_counts()
+                    else:
+                        # Counted at ingest (sentiment_rollup.py): no pass over the articles on rerun
+                        label_counts = load_sentiment_counts(data_source, selected_sentiment)
+                    sentiment_counts = label_counts.reset_index()
                     sentiment_counts.columns = ['sentiment', 'count']
                     
                     st.markdown("### 📊 Sentiment Distribution")
@@ -111,10 +114,10 @@ with tab1:
                     with col1:
                         st.metric("Total Articles", len(df))
                     with col2:
-                        positive_count = len(df[df[selected_sentiment].isin(['Positive', 'POSITIVE'])])
+                        positive_count = int(label_counts.reindex(['Positive', 'POSITIVE']).fillna(0).sum())
                         st.metric("Positive", positive_count)
                     with col3:
-                        negative_count = len(df[df[selected_sentiment].isin(['Negative', 'NEGATIVE'])])
+                        negative_count = int(label_counts.reindex(['Negative', 'NEGATIVE']).fillna(0).sum())
                         st.metric("Negative", negative_count)
             else:
                 st.info("No sentiment columns found. Run sentiment analysis scripts first.")
@@ -146,6 +149,7 @@ with tab2:
         """)
     else:
         st.success("✅ GNews API is configured!")
+        st.caption(f"📮 About {remaining_quota()} GNews requests left in today's budget")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -160,28 +164,14 @@ with tab2:
             
             with st.spinner("Fetching news articles..."):
                 try:
-                    BASE_URL = 'https://gnews.io/api/v4/search'
-                    params = {
-                        'token': api_key,
-                        'q': query,
-                        'lang': lang,
-                        'country': country,
-                        'max': max_articles,
-                    }
-                    
-                    response = requests.get(BASE_URL, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    articles = []
-                    for item in data.get("articles", []):
-                        articles.append({
-                            "title": item.get("title"),
-                            "description": item.get("description"),
-                            "publishedAt": item.get("publishedAt"),
-                            "source": item.get("source", {}).get("name"),
-                            "url": item.get("url")
-                        })
+                    # Shared by every session: repeated searches within the TTL don't spend quota
+                    result = fetch_news(query, lang, country, max_articles, api_key)
+                    articles = result.articles
+                    if result.status == "stale":
+                        st.warning(f"⚠️ GNews request budget used up or API unavailable; showing results from "
+                                   f"{result.age / 60:.0f} min ago")
+                    elif result.status == "cached":
+                        st.caption(f"♻️ Same search as {result.age / 60:.0f} min ago, served from cache")
                     
                     df_new = pd.DataFrame(articles)
                     
@@ -231,7 +221,7 @@ with tab3:
         if st.button("🚀 Run GPT-3.5 Analysis", type="primary"):
             try:
                 # Load data
-                df_analyze = pd.read_csv(analysis_file)
+                df_analyze = read_news(analysis_file)
                 st.info(f"Analyzing {len(df_analyze)} articles...")
                 
                 # Initialize OpenAI client
@@ -319,3 +309,6 @@ with tab3:
 st.markdown("---")
 st.write("© 2025 Pallavi Ranamale | Powered by Streamlit")
 
+
+# 📈 Refresh the exported metrics (PERF_REPORT / PERF_PROMETHEUS) after every rerun
+perf_metrics.export(verbose=False)
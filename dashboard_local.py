@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import requests
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from data_loader import load_news_frame, load_search_index, load_sentiment_counts
+from gnews_cache import fetch_news, remaining_quota
+from news_io import read_news
+import perf_metrics
+from gpt_classifier import classify_texts, normalize_gpt_label
 
 # Load environment variables for local development
 load_dotenv()
@@ -60,32 +63,27 @@ with tab1:
     
     # File selection
     data_source = st.selectbox(
-        "Choose CSV file:",
+        "Choose data file:",
         ["news_with_sentiment.csv", "news_with_bert_sentiment.csv", "gnews_output.csv", "news_with_gpt_sentiment.csv"]
     )
     
     try:
-        # Load data from CSV
-        df = pd.read_csv(data_source)
+        # Load the Parquet copy (or the CSV if newer), parsed once per file version and shared across sessions
+        df = load_news_frame(data_source)
     
         if df.empty:
             st.warning("No data found in the selected file.")
         else:
             st.success(f"✅ Loaded {len(df)} articles from {data_source}")
             
-            # Convert publishedAt to datetime if it exists
-            if 'publishedAt' in df.columns:
-                df['publishedAt'] = pd.to_datetime(df['publishedAt'], errors='coerce')
-                df = df.sort_values('publishedAt', ascending=False)
-            
             # Search filter
-            keyword = st.text_input("🔍 Search by keyword (in title or description):")
+            keyword = st.text_input(
+                "🔍 Search by keyword (in title or description):",
+                help="Words are ANDed; use OR for alternatives and a trailing * for prefixes, e.g. air india OR aviat*"
+            )
             if keyword:
-                mask = (
-                    df['title'].astype(str).str.contains(keyword, case=False, na=False) |
-                    df['description'].astype(str).str.contains(keyword, case=False, na=False)
-                )
-                df = df[mask]
+                # Look the terms up in the inverted index built once for this file version
+                df = df.iloc[load_search_index(data_source).search(keyword)]
                 st.info(f"Found {len(df)} articles matching '{keyword}'")
             
             # Show data
@@ -99,7 +97,12 @@ with tab1:
                 selected_sentiment = st.selectbox("Select sentiment column:", sentiment_columns)
                 
                 if selected_sentiment in df.columns:
-                    sentiment_counts = df[selected_sentiment].value_counts().reset_index()
+                    if keyword:
+                        label_counts = df[selected_sentiment].value_counts()
+                    else:
+                        # Counted at ingest (sentiment_rollup.py): no pass over the articles on rerun
+                        label_counts = load_sentiment_counts(data_source, selected_sentiment)
+                    sentiment_counts = label_counts.reset_index()
                     sentiment_counts.columns = ['sentiment', 'count']
                     
                     st.markdown("### 📊 Sentiment Distribution")
@@ -124,10 +127,10 @@ with tab1:
                     with col1:
                         st.metric("Total Articles", len(df))
                     with col2:
-                        positive_count = len(df[df[selected_sentiment].isin(['Positive', 'POSITIVE'])])
+                        positive_count = int(label_counts.reindex(['Positive', 'POSITIVE']).fillna(0).sum())
                         st.metric("Positive", positive_count)
                     with col3:
-                        negative_count = len(df[df[selected_sentiment].isin(['Negative', 'NEGATIVE'])])
+                        negative_count = int(label_counts.reindex(['Negative', 'NEGATIVE']).fillna(0).sum())
                         st.metric("Negative", negative_count)
             else:
                 st.info("No sentiment columns found. Use the 'Analyze with GPT' tab to add sentiment analysis.")
@@ -159,6 +162,7 @@ with tab2:
         """)
     else:
         st.success("✅ GNews API is configured!")
+        st.caption(f"📮 About {remaining_quota()} GNews requests left in today's budget")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -173,28 +177,14 @@ with tab2:
             
             with st.spinner("⏳ Fetching news articles from GNews..."):
                 try:
-                    BASE_URL = 'https://gnews.io/api/v4/search'
-                    params = {
-                        'token': api_key,
-                        'q': query,
-                        'lang': lang,
-                        'country': country,
-                        'max': max_articles,
-                    }
-                    
-                    response = requests.get(BASE_URL, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    articles = []
-                    for item in data.get("articles", []):
-                        articles.append({
-                            "title": item.get("title"),
-                            "description": item.get("description"),
-                            "publishedAt": item.get("publishedAt"),
-                            "source": item.get("source", {}).get("name"),
-                            "url": item.get("url")
-                        })
+                    # Shared by every session: repeated searches within the TTL don't spend quota
+                    result = fetch_news(query, lang, country, max_articles, api_key)
+                    articles = result.articles
+                    if result.status == "stale":
+                        st.warning(f"⚠️ GNews request budget used up or API unavailable; showing results from "
+                                   f"{result.age / 60:.0f} min ago")
+                    elif result.status == "cached":
+                        st.caption(f"♻️ Same search as {result.age / 60:.0f} min ago, served from cache")
                     
                     df_new = pd.DataFrame(articles)
                     
@@ -259,7 +249,7 @@ with tab3:
             )
             
             try:
-                df_analyze = pd.read_csv(analysis_file)
+                df_analyze = read_news(analysis_file)
                 st.info(f"📊 Ready to analyze {len(df_analyze)} articles from {analysis_file}")
             except FileNotFoundError:
                 st.error(f"❌ File {analysis_file} not found.")
@@ -273,56 +263,34 @@ with tab3:
         df_analyze = df_analyze.head(max_analyze)
         
         if st.button("🚀 Run GPT-3.5 Analysis", type="primary"):
-            # Initialize OpenAI client
             openai_key = get_secret("OPENAI_API_KEY")
-            client = OpenAI(api_key=openai_key)
-            
-            def classify_sentiment_gpt(text):
-                """Classify sentiment using GPT-3.5"""
-                if pd.isna(text) or not str(text).strip():
-                    return "Neutral"
-                
-                # Use description if available, otherwise title
-                text_to_analyze = str(text)[:500]  # Limit length to control costs
-                
-                prompt = f"What is the sentiment of the following news text? Respond with only one word: Positive, Negative, or Neutral.\n\nText: {text_to_analyze}"
-                
-                try:
-                    response = client.chat.completions.create(
-                        model="gpt-3.5-turbo",
-                        messages=[
-                            {"role": "system", "content": "You are a sentiment analysis assistant. Always respond with only one word: Positive, Negative, or Neutral."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=10
-                    )
-                    sentiment = response.choices[0].message.content.strip()
-                    # Normalize response
-                    if "Positive" in sentiment or "positive" in sentiment:
-                        return "Positive"
-                    elif "Negative" in sentiment or "negative" in sentiment:
-                        return "Negative"
-                    else:
-                        return "Neutral"
-                except Exception as e:
-                    st.error(f"Error analyzing: {str(e)}")
-                    return "Unknown"
             
             # Analyze with progress bar
             progress_bar = st.progress(0)
             status_text = st.empty()
-            results = []
             
-            for idx, row in df_analyze.iterrows():
-                status_text.text(f"⏳ Analyzing article {idx + 1}/{len(df_analyze)}...")
-                
-                # Use description if available, otherwise title
-                text_to_analyze = row.get('description', row.get('title', ''))
-                sentiment = classify_sentiment_gpt(text_to_analyze)
-                results.append(sentiment)
-                
-                progress_bar.progress((idx + 1) / len(df_analyze))
+            def update_progress(done, total):
+                status_text.text(f"⏳ Analyzed {done}/{total} articles...")
+                progress_bar.progress(done / total)
+            
+            # Use description if available, otherwise title
+            text_column = 'description' if 'description' in df_analyze.columns else 'title'
+            texts = df_analyze[text_column].tolist()
+            
+            # Empty texts are Neutral without an API call; the rest are sent concurrently
+            to_classify = [i for i, text in enumerate(texts) if not (pd.isna(text) or not str(text).strip())]
+            results = ["Neutral"] * len(texts)
+            replies = classify_texts(
+                [str(texts[i])[:500] for i in to_classify],  # Limit length to control costs
+                api_key=openai_key,
+                concurrency=8,
+                system_prompt="You are a sentiment analysis assistant. Always respond with only one word: Positive, Negative, or Neutral.",
+                prompt_template="What is the sentiment of the following news text? Respond with only one word: Positive, Negative, or Neutral.\n\nText: {text}",
+                on_error=lambda e: st.error(f"Error analyzing: {str(e)}"),
+                on_progress=update_progress,
+            )
+            for i, reply in zip(to_classify, replies):
+                results[i] = reply if reply == "Unknown" else normalize_gpt_label(reply)
             
             # Add results to dataframe
             df_analyze['gpt_sentiment'] = results
@@ -376,3 +344,6 @@ with tab3:
 st.markdown("---")
 st.write("© 2025 Pallavi Ranamale | Powered by Streamlit")
 
+
+# 📈 Refresh the exported metrics (PERF_REPORT / PERF_PROMETHEUS) after every rerun
+perf_metrics.export(verbose=False)
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+import perf_metrics
+from news_io import file_signature, read_news
+from search_index import SearchIndex
+
+# Parsed frames are shared by every Streamlit session in this process
+MAX_CACHE_BYTES = int(os.getenv("DASHBOARD_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _parse(path, columns=None):
+    # publishedAt comes back typed from read_news
+    df = read_news(path, columns)
+    if 'publishedAt' in df.columns:
+        df = df.sort_values('publishedAt', ascending=False)
+    return df
+
+
+def _cached(key, build, size_of, stage):
+    """Return the cached value for `key` (a file signature plus a kind), building it on a miss.
+
+    Hits, misses and build times are recorded under the perf_metrics `stage`.
+    """
+    stage_metrics = perf_metrics.metrics(stage)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            stage_metrics.count("cache_hits")
+            return _cache[key][0]
+
+    stage_metrics.count("cache_misses")
+    with perf_metrics.stage(stage, items=1), stage_metrics.timer():
+        value = build()
+    size = size_of(value)
+
+    with _lock:
+        # Older versions of the same file can never be hit again
+        path, kind = key[0][0], key[1]
+        for stale in [cached for cached in _cache if cached[0][0] == path and cached[1] == kind and cached != key]:
+            del _cache[stale]
+        _cache[key] = (value, size)
+        _cache.move_to_end(key)
+        total = sum(entry[1] for entry in _cache.values())
+        while total > MAX_CACHE_BYTES and len(_cache) > 1:
+            _, (_, evicted_size) = _cache.popitem(last=False)
+            total -= evicted_size
+    return value
+
+
+def load_news_frame(path, columns=None):
+    """Return the parsed, typed and sorted frame for `path`, reusing it until the file changes.
+
+    `columns` limits the frame to those columns (only they are read from Parquet).
+    The returned frame is shared across sessions, so callers must treat it as
+    read-only (filtering into a new frame is fine; assigning columns is not).
+    Raises FileNotFoundError when neither a .parquet nor a .csv copy exists.
+    """
+    kind = "frame" if columns is None else ("frame",) + tuple(columns)
+    return _cached((file_signature(path), kind), lambda: _parse(path, columns),
+                   lambda df: int(df.memory_usage(deep=True).sum()), "dashboard_load")
+
+
+def load_search_index(path):
+    """Inverted index over title and description of `load_news_frame(path)`, built once per file version.
+
+    Positions returned by its `search()` index into that frame with `.iloc`.
+    """
+    return _cached((file_signature(path), "index"), lambda: SearchIndex.build(load_news_frame(path)),
+                   lambda index: index.nbytes, "dashboard_index")
+
+
+def load_sentiment_counts(path, column):
+    """Articles per label of `column` in `path`, read from the rollup tables (see sentiment_rollup.py).
+
+    Scripts that write datasets keep the rollups current; a file changed some
+    other way is synced once from its frame, and later reruns only query the
+    pre-aggregated counts.
+    """
+    from sentiment_rollup import SentimentRollup
+
+    def build():
+        rollup = SentimentRollup.for_path(path)
+        try:
+            if not rollup.is_synced(path):
+                rollup.sync(load_news_frame(path), path)
+            return rollup.counts(column)
+        finally:
+            rollup.close()
+
+    return _cached((file_signature(path), ("counts", column)), build,
+                   lambda counts: int(counts.memory_usage(deep=True)), "dashboard_rollup")
+
+
+def cache_info():
+    with _lock:
+        return {"entries": len(_cache), "bytes": sum(entry[1] for entry in _cache.values()),
+                "max_bytes": MAX_CACHE_BYTES}
@@ -1,48 +1,205 @@
+import argparse
+import json
+import os
+import time
 import requests
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-import os
-
-# Load API key from .env
-load_dotenv()
-API_KEY = os.getenv("API_KEY")
-print("🔐 Loaded API Key:", API_KEY)  # Debug print
+import perf_metrics
+from news_io import read_news, write_news
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE_URL = 'https://gnews.io/api/v4/search'
+OUTPUT_FILE = "gnews_output.csv"
+STATE_FILE = "gnews_state.json"
+PAGE_SIZE = 100
+
+
+def make_session(pool_size=10, retries=3):
+    """Pooled HTTP session that keeps connections to gnews.io alive between pages; 5xx replies are retried."""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=1, status_forcelist=[500, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def parse_articles(data):
+    articles = []
+    for item in data.get("articles", []):
+        articles.append({
+            "title": item.get("title"),
+            "description": item.get("description"),
+            "publishedAt": item.get("publishedAt"),
+            "source": (item.get("source") or {}).get("name"),
+            "url": item.get("url")
+        })
+    return articles
+
+
+def fetch_since(session, api_key, query, since=None, lang='en', country='in', page_size=PAGE_SIZE, max_pages=10,
+                until=None):
+    """Fetch articles newer than `since` (and not after `until`), newest first, paging until caught up.
+
+    Returns (articles, caught_up). `caught_up` is False when `max_pages` ran out
+    first: articles between `since` and the oldest one returned were not fetched.
+    """
+    params = {
+        'token': api_key,
+        'q': query,
+        'lang': lang,
+        'country': country,
+        'max': page_size,
+        'sortby': 'publishedAt',
+    }
+    if since:
+        params['from'] = since
+    if until:
+        params['to'] = until
+    articles = []
+    stage_metrics = perf_metrics.metrics("fetch")
+    for page in range(1, max_pages + 1):
+        params['page'] = page
+        start = time.perf_counter()
+        response = session.get(BASE_URL, params=params, timeout=30)
+        stage_metrics.count("requests")
+        # urllib3 keeps the retries it made for this response
+        retries = getattr(getattr(response.raw, "retries", None), "history", ())
+        stage_metrics.count("retries", len(retries))
+        response.raise_for_status()
+        data = response.json()
+        batch = parse_articles(data)
+        stage_metrics.observe(time.perf_counter() - start, max(len(batch), 1))
+        articles.extend(batch)
+        total = data.get("totalArticles")
+        if len(batch) < page_size or (total is not None and len(articles) >= total):
+            return articles, True
+    return articles, False
+
+
+def fetch_back_to(session, api_key, query, since, lang='en', country='in', max_pages=10):
+    """fetch_since, then windows ending at the oldest article so far until `since` is reached.
+
+    Returns (articles, caught_up) like fetch_since. Without a `since` there is
+    nothing to reach, so only the newest `max_pages` pages are fetched.
+    """
+    articles, caught_up = fetch_since(session, api_key, query, since, lang, country, max_pages=max_pages)
+    oldest = None
+    while not caught_up and since:
+        published = pd.to_datetime(pd.Series([a["publishedAt"] for a in articles], dtype=object),
+                                   utc=True, errors="coerce")
+        if not published.notna().any() or (oldest is not None and published.min() >= oldest):
+            # No older article came back, so another window would repeat this one
+            return articles, False
+        oldest = published.min()
+        older, caught_up = fetch_since(session, api_key, query, since, lang, country, max_pages=max_pages,
+                                       until=to_watermark(oldest))
+        articles.extend(older)
+    return articles, caught_up or not since
+
+
+def state_key(query, lang, country):
+    return f"{query}|{lang}|{country}"
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def to_watermark(timestamp):
+    # GNews expects 'from' as YYYY-MM-DDThh:mm:ssZ
+    return pd.Timestamp(timestamp).tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def merge_articles(existing, new):
+    """Merge newly fetched rows into the dataset, keeping one row per article (the newest copy)."""
+    from bigquery_delta import row_keys
+
+    merged = pd.concat([existing, new], ignore_index=True)
+    merged["publishedAt"] = pd.to_datetime(merged["publishedAt"], utc=True, errors="coerce")
+    # URL-less rows are told apart by their text, not collapsed into one
+    merged = merged[~pd.Series(row_keys(merged)).duplicated(keep="last").to_numpy()]
+    return merged.sort_values("publishedAt", ascending=False, ignore_index=True)
+
+
+def fetch_incremental(session, api_key, queries, state, lang='en', country='in', max_pages=10, full=False):
+    """Fetch every query from its watermark; returns the new rows and the updated state."""
+    frames = []
+    state = dict(state)
+    with perf_metrics.stage("fetch") as stage_metrics:
+        for query in queries:
+            key = state_key(query, lang, country)
+            since = None if full else state.get(key)
+            articles, caught_up = fetch_since(session, api_key, query, since, lang, country, max_pages=max_pages)
+            stage_metrics.add_items(len(articles))
+            print(f"📰 '{query}': {len(articles)} articles since {since or 'the beginning'}")
+            if not caught_up:
+                # The watermark stays put so the next run fetches the gap again
+                stage_metrics.count("not_caught_up")
+                print(f"⚠️ '{query}': stopped after {max_pages} pages before reaching {since or 'the oldest article'}; "
+                      f"watermark not advanced (raise --max-pages)")
+            if not articles:
+                continue
+            df = pd.DataFrame(articles)
+            df["publishedAt"] = pd.to_datetime(df["publishedAt"], utc=True, errors="coerce")
+            frames.append(df)
+            newest = df["publishedAt"].max()
+            if caught_up and pd.notna(newest) and (since is None or newest > pd.Timestamp(since)):
+                state[key] = to_watermark(newest)
+    if not frames:
+        return pd.DataFrame(columns=["title", "description", "publishedAt", "source", "url"]), state
+    return pd.concat(frames, ignore_index=True), state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally fetch news from GNews")
+    parser.add_argument("--query", action="append", help="Search keyword; repeat for several (default: India)")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--country", default="in")
+    parser.add_argument("--max-pages", type=int, default=10, help="Upper bound on pages per query")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--state", default=STATE_FILE, help="Where the per-query watermarks are kept")
+    parser.add_argument("--full", action="store_true", help="Ignore watermarks and re-fetch from scratch")
+    args = parser.parse_args()
+
+    # Load API key from .env
+    load_dotenv()
+    API_KEY = os.getenv("API_KEY")
+    print("🔐 Loaded API Key:", API_KEY)  # Debug print
+
+    queries = args.query or ['India']
+    try:
+        new, state = fetch_incremental(make_session(), API_KEY, queries, load_state(args.state),
+                                       args.lang, args.country, args.max_pages, args.full)
+    except Exception as e:
+        print("❌ Error fetching data:", e)
+        raise SystemExit(1)
 
-params = {
-    'token': API_KEY,
-    'q': 'India',        # Test with broader keyword
-    'lang': 'en',
-    'country': 'in',
-    'max': 100,
-}
-
-try:
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-except Exception as e:
-    print("❌ Error fetching data:", e)
-    data = {}
-
-articles = []
-for item in data.get("articles", []):
-    articles.append({
-        "title": item.get("title"),
-        "description": item.get("description"),
-        "publishedAt": item.get("publishedAt"),
-        "source": item.get("source", {}).get("name"),
-        "url": item.get("url")
-    })
-
-df = pd.DataFrame(articles)
-
-if df.empty:
-    print("⚠️ No articles found. Please check your query.")
-else:
-    df["publishedAt"] = pd.to_datetime(df["publishedAt"])
-    df.to_csv("gnews_output.csv", index=False)
-    print("✅ Successfully fetched news!")
-    print(df.head())
+    if new.empty:
+        print("⚠️ No new articles found. Please check your query.")
+    else:
+        try:
+            existing = read_news(args.output)
+        except FileNotFoundError:
+            existing = new.iloc[0:0]
+        df = merge_articles(existing, new)
+        output = write_news(df, args.output)
+        # Only advance the watermarks once the merged rows are safely on disk
+        save_state(state, args.state)
+        print(f"✅ Successfully fetched news into {output}! {len(df) - len(existing)} new, {len(df)} total "
+              f"({datetime.now():%Y-%m-%d %H:%M})")
+        print(df.head())
+    perf_metrics.export()
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+import perf_metrics
+import fetch_news_gnews
+
+# Process-wide GNews search cache for the dashboards. Every Streamlit session in
+# the process shares it: identical searches within GNEWS_CACHE_TTL seconds are
+# answered from memory, identical searches made at the same time share one
+# request, and a token bucket keeps requests within the daily quota. When the
+# budget is used up, the last result for a search is served (marked stale)
+# instead of an error.
+
+CACHE_TTL = int(os.getenv("GNEWS_CACHE_TTL", "900"))
+# Requests per day the API plan allows (the free plan allows 100)
+DAILY_QUOTA = int(os.getenv("GNEWS_DAILY_QUOTA", "100"))
+# Where the bucket's level is kept, so restarts and other processes don't start from a full budget
+QUOTA_STATE = os.getenv("GNEWS_QUOTA_STATE", "gnews_quota.json")
+MAX_CACHED_SEARCHES = 256
+
+# status is 'fresh' (just fetched), 'cached' (within the TTL) or 'stale' (older, served for lack of quota)
+FetchResult = namedtuple("FetchResult", ["articles", "status", "age"])
+
+
+class QuotaExhausted(RuntimeError):
+    """No request budget left and nothing cached for the search."""
+
+
+class QuotaBucket:
+    """Token bucket holding at most `per_day` requests, refilled evenly over the day.
+
+    With a `state_path` the level is re-read before and saved after every
+    change (like gnews_state.json), so it survives restarts and is shared with
+    other processes on the host.
+    """
+
+    def __init__(self, per_day=DAILY_QUOTA, state_path=None):
+        self.capacity = float(per_day)
+        self.rate = per_day / 86400
+        self.state_path = state_path
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        if self.state_path:
+            state = fetch_news_gnews.load_state(self.state_path)
+            if "tokens" in state:
+                self._tokens, self._updated = min(self.capacity, float(state["tokens"])), float(state["updated"])
+        now = time.time()
+        self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            if self.state_path:
+                fetch_news_gnews.save_state({"tokens": self._tokens, "updated": self._updated}, self.state_path)
+            return True
+
+    def remaining(self):
+        with self._lock:
+            self._refill()
+            return int(self._tokens)
+
+    def seconds_until_available(self):
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate if self.rate else float("inf")
+
+
+def search_key(query, lang, country, max_articles):
+    """Searches that differ only in case or spacing of the query are the same search."""
+    return " ".join(str(query).lower().split()), str(lang).lower(), str(country).lower(), int(max_articles)
+
+
+def search_gnews(session, api_key, query, lang, country, max_articles):
+    """One GNews search request; returns parsed articles."""
+    params = {"token": api_key, "q": query, "lang": lang, "country": country, "max": max_articles}
+    response = session.get(fetch_news_gnews.BASE_URL, params=params, timeout=30)
+    response.raise_for_status()
+    return fetch_news_gnews.parse_articles(response.json())
+
+
+class GNewsCache:
+    """Searches cached for `ttl` seconds, coalesced while in flight, and rationed by `bucket`."""
+
+    def __init__(self, ttl=CACHE_TTL, bucket=None, max_entries=MAX_CACHED_SEARCHES, fetch=search_gnews):
+        self.ttl = ttl
+        self.bucket = bucket or QuotaBucket(state_path=QUOTA_STATE)
+        self.max_entries = max_entries
+        self.fetch = fetch
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._session = None
+
+    def _stale(self, key, reason):
+        """The expired entry for `key` as a stale result, or QuotaExhausted/the original error without one."""
+        entry = self._entries.get(key)
+        if entry is None:
+            raise reason
+        perf_metrics.metrics("gnews").count("stale_served")
+        return FetchResult(entry[1], "stale", time.time() - entry[0])
+
+    def search(self, query, lang, country, max_articles, api_key):
+        key = search_key(query, lang, country, max_articles)
+        stage_metrics = perf_metrics.metrics("gnews")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                stage_metrics.count("cache_hits")
+                return FetchResult(entry[1], "cached", time.time() - entry[0])
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            # Someone is already fetching this search: share their answer
+            stage_metrics.count("coalesced")
+            return future.result()
+
+        try:
+            if not self.bucket.try_acquire():
+                stage_metrics.count("quota_exhausted")
+                with self._lock:
+                    result = self._stale(key, QuotaExhausted(
+                        f"GNews request budget used up; next request in "
+                        f"{self.bucket.seconds_until_available() / 60:.0f} min"))
+            else:
+                stage_metrics.count("cache_misses")
+                if self._session is None:
+                    # No transparent retries: each one would spend a request the bucket never charged
+                    self._session = fetch_news_gnews.make_session(retries=0)
+                try:
+                    with perf_metrics.stage("gnews", items=1), stage_metrics.timer():
+                        articles = self.fetch(self._session, api_key, query, lang, country, max_articles)
+                except Exception as e:
+                    stage_metrics.count("errors")
+                    with self._lock:
+                        result = self._stale(key, e)
+                else:
+                    result = FetchResult(articles, "fresh", 0.0)
+                    with self._lock:
+                        self._entries[key] = (time.time(), articles)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+_cache = GNewsCache()
+
+
+def fetch_news(query, lang, country, max_articles, api_key):
+    """GNews search through the shared cache; returns a FetchResult. Raises QuotaExhausted or the request error."""
+    return _cache.search(query, lang, country, max_articles, api_key)
+
+
+def remaining_quota():
+    return _cache.bucket.remaining()
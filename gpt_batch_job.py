@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from dotenv import load_dotenv
+import perf_metrics
+from gpt_classifier import (MODEL, PACKED_PROMPT_TEMPLATE, PACKED_SYSTEM_PROMPT, PROMPT_TEMPLATE, SYSTEM_PROMPT,
+                            build_packed_prompt, parse_packed_reply, prompt_version)
+
+# 📦 Offline GPT scoring through the Batch API, for nightly backfills: every
+# request goes into a JSONL job file, the file is submitted as a batch, the
+# batch is polled until it finishes, and its result file is streamed back and
+# joined to the texts by custom_id.
+#
+# Each job lives in gpt_batches/<hash of its requests>/ with a state.json that
+# records the uploaded file and batch ids as soon as they exist. Re-running the
+# same command after a crash finds that directory and resumes polling instead of
+# paying for a second batch.
+
+JOBS_DIR = "gpt_batches"
+ENDPOINT = "/v1/chat/completions"
+# Most requests one batch input file may hold
+MAX_REQUESTS_PER_BATCH = 50_000
+FINISHED = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchPending(Exception):
+    """The job was submitted (or is still running) and its results are not available yet."""
+
+
+def build_requests(texts, model=MODEL, pack_size=1):
+    """Batch input lines for `texts`: custom_id is a text's position, or 'first-last' for a pack of them."""
+    requests = []
+    step = max(1, pack_size)
+    for start in range(0, len(texts), step):
+        group = texts[start:start + step]
+        if pack_size > 1:
+            custom_id = f"{start}-{start + len(group) - 1}"
+            body = {"messages": [{"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                                 {"role": "user", "content": build_packed_prompt(group)}],
+                    "max_tokens": 12 * len(group) + 20, "response_format": {"type": "json_object"}}
+        else:
+            custom_id = str(start)
+            body = {"messages": [{"role": "system", "content": SYSTEM_PROMPT},
+                                 {"role": "user", "content": PROMPT_TEMPLATE.format(text=group[0])}],
+                    "max_tokens": 10}
+        # Same settings as the interactive requests in gpt_classifier.py
+        body = {"model": model, "temperature": 0.3, **body}
+        requests.append({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body})
+    return requests
+
+
+def parse_results(lines, count):
+    """Labels for `count` texts from result-file lines; 'Unknown' for anything missing or failed.
+
+    Unpacked replies are returned as GPT wrote them, like classify_texts;
+    packed replies are already Positive/Negative/Neutral.
+    """
+    labels = ["Unknown"] * count
+    for line in lines:
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        first, _, last = result["custom_id"].partition("-")
+        first = int(first)
+        if last:
+            packed = parse_packed_reply(content, int(last) - first + 1)
+            labels[first:int(last) + 1] = [label or "Unknown" for label in packed]
+        else:
+            labels[first] = content.strip()
+    return labels
+
+
+class BatchJob:
+    """One batch job on disk: its request files, state.json and downloaded results."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.state_path = os.path.join(path, "state.json")
+        self.state = {"parts": []}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    @classmethod
+    def for_requests(cls, client, requests, jobs_dir=JOBS_DIR):
+        """The job for exactly these requests, resumed if an unfinished one exists."""
+        lines = [json.dumps(request, sort_keys=True) for request in requests]
+        digest = hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+        job = cls(client, os.path.join(jobs_dir, digest))
+        if job.state.get("collected"):
+            # A finished job is only kept for inspection; asking again means a new batch
+            job.state = {"parts": []}
+        if not job.state["parts"]:
+            os.makedirs(job.path, exist_ok=True)
+            for part, start in enumerate(range(0, len(lines), MAX_REQUESTS_PER_BATCH)):
+                request_path = os.path.join(job.path, f"requests-{part}.jsonl")
+                with open(request_path, "w") as f:
+                    f.write("\n".join(lines[start:start + MAX_REQUESTS_PER_BATCH]) + "\n")
+                job.state["parts"].append({"requests": request_path, "status": "pending"})
+            job.save()
+        return job
+
+    def save(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def submit(self):
+        """Upload and start every part that has not been started yet."""
+        for part in self.state["parts"]:
+            if "input_file_id" not in part:
+                with open(part["requests"], "rb") as f:
+                    part["input_file_id"] = self.client.files.create(file=f, purpose="batch").id
+                self.save()
+            if "batch_id" not in part:
+                batch = self.client.batches.create(input_file_id=part["input_file_id"], endpoint=ENDPOINT,
+                                                   completion_window="24h",
+                                                   metadata={"job": os.path.basename(self.path)})
+                part["batch_id"], part["status"] = batch.id, batch.status
+                self.save()
+                print(f"📤 Submitted {part['requests']} as {batch.id}")
+
+    def refresh(self):
+        """Poll every unfinished part once; returns whether all of them have finished."""
+        for part in self.state["parts"]:
+            if part["status"] in FINISHED:
+                continue
+            batch = self.client.batches.retrieve(part["batch_id"])
+            part.update(status=batch.status, output_file_id=batch.output_file_id,
+                        error_file_id=batch.error_file_id)
+            counts = batch.request_counts
+            progress = f" ({counts.completed + counts.failed}/{counts.total})" if counts and counts.total else ""
+            print(f"⏳ {batch.id}: {batch.status}{progress}")
+        self.save()
+        return all(part["status"] in FINISHED for part in self.state["parts"])
+
+    def wait(self, poll_interval=30):
+        stage_metrics = perf_metrics.metrics("gpt_batch")
+        start = time.perf_counter()
+        while not self.refresh():
+            time.sleep(poll_interval)
+            stage_metrics.count("polls")
+        stage_metrics.count("wait_seconds", time.perf_counter() - start)
+
+    def result_lines(self):
+        """Stream each part's output and error files to disk (once) and yield their lines."""
+        for n, part in enumerate(self.state["parts"]):
+            for kind in ("output", "error"):
+                file_id = part.get(f"{kind}_file_id")
+                if not file_id:
+                    continue
+                path = os.path.join(self.path, f"{kind}-{n}.jsonl")
+                if not os.path.exists(path):
+                    with self.client.files.with_streaming_response.content(file_id) as response:
+                        response.stream_to_file(f"{path}.tmp")
+                    os.replace(f"{path}.tmp", path)
+                with open(path) as f:
+                    yield from f
+
+    def mark_collected(self):
+        self.state["collected"] = True
+        self.save()
+
+
+def batch_classify(texts, client, pack_size=1, model=MODEL, jobs_dir=JOBS_DIR, poll_interval=30, wait=True):
+    """Labels for `texts` from a batch job, in the shape classify_texts returns them.
+
+    With `wait=False`, raises BatchPending unless the job had already finished.
+    """
+    texts = [str(text) for text in texts]
+    with perf_metrics.stage("gpt_batch", items=len(texts)) as stage_metrics:
+        requests = build_requests(texts, model, pack_size)
+        job = BatchJob.for_requests(client, requests, jobs_dir)
+        stage_metrics.count("requests", len(requests))
+        print(f"📦 {len(texts)} texts in {len(requests)} requests, job {job.path}")
+        job.submit()
+        if wait:
+            job.wait(poll_interval)
+        elif not job.refresh():
+            raise BatchPending(job.path)
+        labels = parse_results(job.result_lines(), len(texts))
+        job.mark_collected()
+        failed = sum(label == "Unknown" for label in labels)
+        stage_metrics.count("failed", failed)
+    if failed:
+        print(f"⚠️ {failed} texts came back without a label; re-run to send only those again")
+    return labels
+
+
+if __name__ == "__main__":
+    from openai import OpenAI
+    from news_io import read_news, write_news
+    from sentiment_cache import SentimentCache, cached_score
+    from sentiment_rollup import update_rollups
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Score news descriptions with GPT through the Batch API")
+    parser.add_argument("--input", default="pune_news_data.csv")
+    parser.add_argument("--output", default="news_with_gpt_sentiment.csv")
+    parser.add_argument("--pack-size", type=int, default=1, help="Articles per request (JSON label list when > 1)")
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--jobs-dir", default=JOBS_DIR, help="Where job files and their state are kept")
+    parser.add_argument("--poll-interval", type=float, default=30, help="Seconds between status checks")
+    parser.add_argument("--submit-only", action="store_true",
+                        help="Submit (or check on) the job and exit; run again later to collect the results")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="API base URL, e.g. a local stub server")
+    parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+    args = parser.parse_args()
+
+    # Same namespaces as news_sentiment_LLM.py: batch and interactive labels are interchangeable
+    if args.pack_size > 1:
+        version = prompt_version(PACKED_SYSTEM_PROMPT, PACKED_PROMPT_TEMPLATE)
+    else:
+        version = prompt_version(SYSTEM_PROMPT, PROMPT_TEMPLATE)
+    cache = None if args.no_cache else SentimentCache(f"gpt:{args.model}:{version}")
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=args.base_url)
+
+    def classify(texts):
+        return batch_classify(texts, client, args.pack_size, args.model, args.jobs_dir, args.poll_interval,
+                              wait=not args.submit_only), None
+
+    df = read_news(args.input)
+    try:
+        # Only descriptions not already in the cache go into the job
+        labels, _ = cached_score(cache, df["description"].astype(str).tolist(), classify)
+    except BatchPending as pending:
+        print(f"🕒 Batch job {pending} is still running; run the same command again to collect it")
+        raise SystemExit(0)
+    df["gpt_sentiment"] = labels
+
+    written = write_news(df, args.output)
+    update_rollups(df, written)
+    print(f"✅ Saved to {written}")
+    print(df[["title", "description", "gpt_sentiment"]].head())
+
+    # 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+    perf_metrics.export()
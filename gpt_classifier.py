@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+import perf_metrics
+
+MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a sentiment analysis assistant."
+PROMPT_TEMPLATE = "What is the sentiment of the following news text? Respond with Positive, Negative, or Neutral only.\n\nText: {text}"
+
+PACKED_SYSTEM_PROMPT = "You are a sentiment analysis assistant. Always reply with JSON only."
+PACKED_PROMPT_TEMPLATE = (
+    "What is the sentiment of each numbered news text below? Use Positive, Negative, or Neutral.\n"
+    'Respond with JSON of the form {{"labels": [{{"id": 1, "label": "Positive"}}, ...]}} '
+    "with exactly one entry per text.\n\n{items}"
+)
+VALID_LABELS = {"positive": "Positive", "negative": "Negative", "neutral": "Neutral"}
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError,
+                    openai.APIConnectionError, openai.APITimeoutError)
+
+
+def normalize_gpt_label(sentiment):
+    """Map a free-text GPT reply to Positive/Negative/Neutral."""
+    if "positive" in sentiment.lower():
+        return "Positive"
+    elif "negative" in sentiment.lower():
+        return "Negative"
+    else:
+        return "Neutral"
+
+
+def prompt_version(*parts):
+    """Short hash of the prompts in use, for cache namespaces."""
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def build_packed_prompt(texts, template=PACKED_PROMPT_TEMPLATE):
+    items = "\n".join(f"{i}. {' '.join(str(text).split())}" for i, text in enumerate(texts, 1))
+    return template.format(items=items)
+
+
+def parse_packed_reply(content, count):
+    """Align a packed JSON reply to its inputs: one label per item, None where missing or invalid."""
+    labels = [None] * count
+    try:
+        reply = json.loads(content)
+    except (TypeError, ValueError):
+        return labels
+    entries = reply.get("labels") if isinstance(reply, dict) else reply
+    if not isinstance(entries, list):
+        return labels
+    for position, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            item_id, label = entry.get("id"), entry.get("label")
+        elif isinstance(entry, str) and len(entries) == count:
+            item_id, label = position + 1, entry
+        else:
+            continue
+        if isinstance(item_id, str) and item_id.strip().isdigit():
+            item_id = int(item_id)
+        if not isinstance(item_id, int) or not 1 <= item_id <= count or not isinstance(label, str):
+            continue
+        label = VALID_LABELS.get(label.strip().lower())
+        if label is not None:
+            labels[item_id - 1] = label
+    return labels
+
+
+def estimate_tokens(messages, max_tokens):
+    # ~4 characters per token is close enough for budgeting against TPM limits
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
+
+class RateLimiter:
+    """Async token buckets for requests-per-minute and tokens-per-minute.
+
+    Each bucket holds at most one minute of budget and refills continuously.
+    Callers queue on a lock, so waiting requests are released in FIFO order.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens=0):
+        async with self._lock:
+            if self.tpm:
+                tokens = min(tokens, self.tpm)
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tpm)
+                if wait == 0.0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+
+def backoff_delay(attempt, error=None, base=0.5, cap=30.0):
+    """Full-jitter exponential backoff, honouring a Retry-After header (up to `cap`) if the server sent one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def _request(client, limiter, semaphore, model, messages, max_tokens, max_retries, on_error, **extra):
+    """Send one chat completion and return its text, or None once retries are exhausted."""
+    tokens = estimate_tokens(messages, max_tokens)
+    stage_metrics = perf_metrics.metrics("gpt")
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(tokens)
+            stage_metrics.count("requests")
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    **extra,
+                )
+                return response.choices[0].message.content.strip()
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    stage_metrics.count("errors")
+                    on_error(e)
+                    return None
+                stage_metrics.count("retries")
+                await asyncio.sleep(backoff_delay(attempt, e))
+            except Exception as e:
+                stage_metrics.count("errors")
+                on_error(e)
+                return None
+
+
+async def _classify_one(text, settings):
+    messages = [
+        {"role": "system", "content": settings["system_prompt"]},
+        {"role": "user", "content": settings["prompt_template"].format(text=text)},
+    ]
+    reply = await _request(messages=messages, max_tokens=settings["max_tokens"], **settings["request"])
+    return "Unknown" if reply is None else reply
+
+
+async def _classify_pack(texts, settings):
+    """Classify several texts in one request; items the reply gets wrong are re-split and retried."""
+    if len(texts) == 1:
+        reply = await _classify_one(texts[0], settings)
+        return [reply if reply == "Unknown" else normalize_gpt_label(reply)]
+    messages = [
+        {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+        {"role": "user", "content": build_packed_prompt(texts)},
+    ]
+    reply = await _request(messages=messages, max_tokens=12 * len(texts) + 20,
+                           response_format={"type": "json_object"}, **settings["request"])
+    if reply is None:
+        return ["Unknown"] * len(texts)
+
+    labels = parse_packed_reply(reply, len(texts))
+    failed = [i for i, label in enumerate(labels) if label is None]
+    if failed:
+        retry_texts = [texts[i] for i in failed]
+        half = (len(retry_texts) + 1) // 2
+        parts = [retry_texts[:half], retry_texts[half:]] if len(retry_texts) > 1 else [retry_texts]
+        retried = await asyncio.gather(*(_classify_pack(part, settings) for part in parts if part))
+        for i, label in zip(failed, [label for part in retried for label in part]):
+            labels[i] = label
+    return labels
+
+
+async def classify_texts_async(texts, client=None, concurrency=8, requests_per_minute=None,
+                               tokens_per_minute=None, max_retries=5, model=MODEL,
+                               system_prompt=SYSTEM_PROMPT, prompt_template=PROMPT_TEMPLATE,
+                               max_tokens=10, pack_size=1, on_error=None, on_progress=None):
+    """Classify `texts` concurrently and return the replies in input order.
+
+    At most `concurrency` requests are in flight, and requests/tokens per
+    minute are kept under the given limits. 429, 5xx and connection errors
+    are retried with jittered exponential backoff; anything that still fails
+    comes back as 'Unknown'.
+
+    With `pack_size > 1`, that many numbered texts share one request and the
+    reply is a JSON label list, so replies are already Positive/Negative/Neutral.
+    Items missing from or invalid in a reply are re-sent in smaller packs.
+    """
+    texts = list(texts)
+    if client is None:
+        # Retries are handled here so they can share the rate limiter
+        client = AsyncOpenAI(max_retries=0)
+    settings = {
+        "system_prompt": system_prompt,
+        "prompt_template": prompt_template,
+        "max_tokens": max_tokens,
+        "request": {
+            "client": client,
+            "limiter": RateLimiter(requests_per_minute, tokens_per_minute),
+            "semaphore": asyncio.Semaphore(concurrency),
+            "model": model,
+            "max_retries": max_retries,
+            "on_error": on_error or (lambda e: print("Error:", e)),
+        },
+    }
+    done = 0
+    stage_metrics = perf_metrics.metrics("gpt")
+
+    async def run(group):
+        nonlocal done
+        # Latency per article includes queueing for the semaphore and rate limiter
+        with stage_metrics.timer(len(group)):
+            if pack_size > 1:
+                labels = await _classify_pack(group, settings)
+            else:
+                labels = [await _classify_one(group[0], settings)]
+        done += len(group)
+        if on_progress is not None:
+            on_progress(done, len(texts))
+        return labels
+
+    step = max(1, pack_size)
+    groups = [texts[i:i + step] for i in range(0, len(texts), step)]
+    with perf_metrics.stage("gpt", items=len(texts)):
+        results = await asyncio.gather(*(run(group) for group in groups))
+    return [label for labels in results for label in labels]
+
+
+def classify_texts(texts, api_key=None, base_url=None, **kwargs):
+    """Blocking wrapper around `classify_texts_async` for scripts and Streamlit."""
+    async def main():
+        async with AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0) as client:
+            return await classify_texts_async(list(texts), client=client, **kwargs)
+
+    return asyncio.run(main())
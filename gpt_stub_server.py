@@ -0,0 +1,201 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 🧪 Minimal stand-in for the OpenAI chat completions and batch endpoints.
+# Point a client at http://127.0.0.1:<port>/v1 to measure concurrency, rate
+# limiting and retries without spending API credits.
+
+POSITIVE_WORDS = {"growth", "win", "wins", "boost", "record", "celebrate", "success", "gain", "new"}
+NEGATIVE_WORDS = {"crash", "dies", "death", "injury", "breach", "breaches", "fatal", "war", "loss", "heat"}
+
+
+def stub_sentiment(text):
+    words = {word.strip(".,:;!?'\"").lower() for word in text.split()}
+    score = len(words & POSITIVE_WORDS) - len(words & NEGATIVE_WORDS)
+    return "Positive" if score > 0 else "Negative" if score < 0 else "Neutral"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.2
+    error_rate = 0.0
+    malformed_rate = 0.0
+    # StubBatches behind /v1/files and /v1/batches, set by start_stub_server
+    batches = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    @classmethod
+    def completion(cls, request):
+        """(status, payload, headers) for one chat completion request."""
+        if random.random() < cls.error_rate:
+            status = random.choice([429, 500, 503])
+            return (status, {"error": {"message": "stub failure", "type": "server_error"}},
+                    {"retry-after": "0.05"} if status == 429 else None)
+        prompt = request["messages"][-1]["content"]
+        if request.get("response_format", {}).get("type") == "json_object":
+            # Packed request: one label per numbered line, occasionally dropping one
+            items = re.findall(r"^(\d+)\. (.*)$", prompt, flags=re.MULTILINE)
+            labels = [{"id": int(item_id), "label": stub_sentiment(text)} for item_id, text in items]
+            if labels and random.random() < cls.malformed_rate:
+                labels.pop(random.randrange(len(labels)))
+            content = json.dumps({"labels": labels})
+        else:
+            content = stub_sentiment(prompt.split("Text:", 1)[-1])
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 1,
+                      "total_tokens": len(prompt) // 4 + 1},
+        }, None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/files"):
+            self._send_json(200, self.batches.upload(self.headers.get("Content-Type", ""), body))
+            return
+        request = json.loads(body or b"{}")
+        if self.path.endswith("/batches"):
+            if request.get("input_file_id") not in self.batches.files:
+                self._send_json(404, {"error": {"message": f"No such file {request.get('input_file_id')}"}})
+                return
+            self._send_json(200, self.batches.create(request))
+            return
+        time.sleep(self.latency)
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        self._send_json(*self.completion(request))
+
+    def do_GET(self):
+        match = re.search(r"/(files|batches)/([\w-]+)(/content)?$", self.path)
+        if match and match.group(1) == "batches" and match.group(2) in self.batches.batches:
+            self._send_json(200, self.batches.retrieve(match.group(2), type(self)))
+        elif match and match.group(1) == "files" and match.group(3) and match.group(2) in self.batches.files:
+            body = self.batches.files[match.group(2)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+class StubBatches:
+    """In-memory /v1/files and /v1/batches.
+
+    A batch stays in progress for `batch_delay` seconds; the first poll after
+    that answers every line of its input file like a chat completion.
+    """
+
+    def __init__(self, batch_delay=2.0):
+        self.batch_delay = batch_delay
+        self.files = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+
+    def upload(self, content_type, body):
+        from email import policy
+        from email.parser import BytesParser
+
+        message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        parts = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        data = parts["file"].get_payload(decode=True)
+        with self._lock:
+            file_id = f"file-stub{len(self.files) + 1}"
+            self.files[file_id] = data
+        return {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+                "filename": parts["file"].get_filename() or "batch.jsonl", "purpose": "batch", "status": "processed"}
+
+    def create(self, request):
+        with self._lock:
+            batch_id = f"batch_stub{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": request["endpoint"], "errors": None,
+                "input_file_id": request["input_file_id"], "completion_window": request["completion_window"],
+                "status": "in_progress", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "metadata": request.get("metadata"),
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                "_ready_at": time.time() + self.batch_delay,
+            }
+            return self._public(self.batches[batch_id])
+
+    def retrieve(self, batch_id, handler):
+        with self._lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "in_progress" and time.time() >= batch["_ready_at"]:
+                self._run(batch, handler)
+            return self._public(batch)
+
+    def _run(self, batch, handler):
+        outputs, errors = [], []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            status, payload, _ = handler.completion(request["body"])
+            result = {"id": f"batch_req_{len(outputs) + len(errors) + 1}", "custom_id": request["custom_id"],
+                      "response": {"status_code": status, "body": payload}, "error": None}
+            (outputs if status == 200 else errors).append(json.dumps(result))
+        for kind, lines in (("output_file_id", outputs), ("error_file_id", errors)):
+            if lines:
+                file_id = f"file-stub{len(self.files) + 1}"
+                self.files[file_id] = ("\n".join(lines) + "\n").encode("utf-8")
+                batch[kind] = file_id
+        batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs),
+                                   "failed": len(errors)}
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+    @staticmethod
+    def _public(batch):
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+
+def start_stub_server(port=0, latency=0.2, error_rate=0.0, malformed_rate=0.0, batch_delay=2.0):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,),
+                   {"latency": latency, "error_rate": error_rate, "malformed_rate": malformed_rate,
+                    "batches": StubBatches(batch_delay)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat completions and batch APIs")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 429/5xx replies")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of packed replies missing an item")
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="Seconds a batch job stays in progress")
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.port, args.latency, args.error_rate, args.malformed_rate,
+                                         args.batch_delay)
+    print(f"🧪 Stub OpenAI server on {base_url} (set OPENAI_BASE_URL to use it)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import os
+import signal
+import time
+from collections import OrderedDict, deque
+import pandas as pd
+from dotenv import load_dotenv
+import perf_metrics
+from fetch_news_gnews import STATE_FILE, fetch_back_to, load_state, make_session, save_state, state_key, to_watermark
+
+# 🌊 Streaming ingestion: pollers fetch each query on a schedule into a bounded
+# queue, scorer workers pull micro-batches off it, and a sink task upserts the
+# scored rows in batches bounded by size and age. When scoring falls behind the
+# queue fills up and the pollers wait, so fetching never outruns the scorers.
+#
+# A query's watermark in gnews_state.json only moves once every article fetched
+# up to it has been flushed, so a crash re-fetches instead of losing articles.
+
+SINK = "sqlite:news_stream.sqlite"
+# URLs remembered to drop articles a later poll fetches again
+MAX_SEEN_URLS = 50_000
+
+
+class Watermarks:
+    """Durable per-query watermarks that trail the rows actually flushed.
+
+    Each poll is tracked with how many of its articles are still in flight and
+    the newest publishedAt it saw; a query's watermark advances past a poll only
+    when that poll and every earlier one have been flushed completely.
+    """
+
+    def __init__(self, state):
+        self.state = dict(state)
+        self._polls = {}
+
+    def track(self, key, poll_id, count, newest):
+        self._polls.setdefault(key, deque()).append([poll_id, count, newest])
+        return self._advance(key)
+
+    def done(self, key, poll_id, count=1):
+        for poll in self._polls.get(key, ()):
+            if poll[0] == poll_id:
+                poll[1] -= count
+                break
+        return self._advance(key)
+
+    def _advance(self, key):
+        polls, moved = self._polls.get(key, deque()), False
+        while polls and polls[0][1] <= 0:
+            newest = polls.popleft()[2]
+            if newest is not None and (key not in self.state or newest > pd.Timestamp(self.state[key])):
+                self.state[key] = to_watermark(newest)
+                moved = True
+        return moved
+
+
+def make_batch_scorer(args):
+    """Function adding the selected scorers' columns to one micro-batch, as the pipeline's score stages do."""
+    from pipeline import bert_score_fn, gpt_score_fn
+
+    scorers = set(args.scorers)
+    vader_cache = None
+    if {"vader", "cascade"} & scorers:
+        import nltk
+        from sentiment_cache import SentimentCache
+
+        nltk.download("vader_lexicon", quiet=True)
+        vader_cache = None if args.no_cache else SentimentCache("vader:nltk:v2")
+    bert_fn = bert_score_fn(args) if {"bert", "cascade"} & scorers else None
+    gpt_fn = gpt_score_fn(args) if {"gpt", "cascade"} & scorers else None
+
+    def score(df):
+        from cascade import cascade_score
+        from gpt_classifier import normalize_gpt_label
+        from vader_engine import bucket_compound, score_columns
+
+        descriptions = df["description"].astype(str).tolist()
+        if "vader" in scorers:
+            scores = score_columns(df, ["title", "description"], n_jobs=args.jobs, cache=vader_cache)
+            for column in ("title", "description"):
+                df[f"sentiment_{column}"] = bucket_compound(scores[column], args.positive_threshold,
+                                                            args.negative_threshold)
+        if "bert" in scorers:
+            df["bert_sentiment"] = bert_fn(descriptions)[0]
+        if "gpt" in scorers:
+            df["gpt_sentiment"] = gpt_fn(descriptions)[0]
+        if "cascade" in scorers:
+            def escalate_to_gpt(texts):
+                replies, _ = gpt_fn(texts)
+                return [reply if reply == "Unknown" else normalize_gpt_label(reply) for reply in replies], None
+
+            result = cascade_score(df["description"].tolist(), bert_fn, escalate_to_gpt, args.cascade_vader_band,
+                                   args.cascade_bert_confidence, n_jobs=args.jobs, vader_cache=vader_cache)
+            for column in result.columns:
+                df[column] = result[column].to_numpy()
+        return df
+
+    return score
+
+
+class IngestDaemon:
+    """Poll → bounded queue → micro-batch scorers → batched sink, until `stop` is set."""
+
+    def __init__(self, args, score_batch, sink):
+        self.args = args
+        self.score_batch = score_batch
+        self.sink = sink
+        self.stop = asyncio.Event()
+        self.articles = asyncio.Queue(maxsize=args.queue_size)
+        # Scored batches waiting for the sink; full when the sink falls behind, which stalls the scorers
+        self.scored = asyncio.Queue(maxsize=max(1, args.workers * 2))
+        self.watermarks = Watermarks(load_state(args.state))
+        self.ledger = None
+        self.seen = OrderedDict()
+        self.metrics = perf_metrics.metrics("ingest")
+
+    async def sleep(self, seconds):
+        """Sleep unless asked to stop first; returns whether the daemon is stopping."""
+        try:
+            await asyncio.wait_for(self.stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self.stop.is_set()
+
+    async def enqueue(self, item):
+        """Put `item` on the article queue, waiting for room; False if the daemon stops first."""
+        put, stopped = asyncio.create_task(self.articles.put(item)), asyncio.create_task(self.stop.wait())
+        await asyncio.wait((put, stopped), return_when=asyncio.FIRST_COMPLETED)
+        stopped.cancel()
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    def _is_new(self, url):
+        if url is None:
+            return True
+        if url in self.seen:
+            self.seen.move_to_end(url)
+            return False
+        self.seen[url] = None
+        if len(self.seen) > MAX_SEEN_URLS:
+            self.seen.popitem(last=False)
+        return True
+
+    async def poll(self, query):
+        args = self.args
+        key = state_key(query, args.lang, args.country)
+        since = self.watermarks.state.get(key)
+        session = make_session(pool_size=2)
+        poll_id = 0
+        while not self.stop.is_set():
+            # Backpressure: hold the next poll until the scorers have caught up
+            if self.articles.qsize() >= args.high_water:
+                self.metrics.count("backpressure_waits")
+                print(f"⏸️ '{query}': {self.articles.qsize()} articles queued, waiting for the scorers")
+                while self.articles.qsize() >= args.high_water // 2 and not await self.sleep(0.5):
+                    pass
+                continue
+
+            poll_id += 1
+            try:
+                with perf_metrics.stage("fetch") as stage_metrics:
+                    # Pages back with to= until `since`, so a burst bigger than --max-pages leaves no gap
+                    fetched, caught_up = await asyncio.to_thread(fetch_back_to, session, os.getenv("API_KEY"), query,
+                                                                 since, args.lang, args.country, args.max_pages)
+                    stage_metrics.add_items(len(fetched))
+            except Exception as e:
+                self.metrics.count("fetch_errors")
+                print(f"❌ '{query}': fetch failed: {e}")
+                if await self.sleep(args.interval):
+                    break
+                continue
+
+            fetched_at = time.monotonic()
+            articles = []
+            for article in fetched:
+                for column in ("title", "description"):
+                    article[column] = (article[column] or "").strip() or None
+                if (article["title"] or article["description"]) and self._is_new(article["url"]):
+                    articles.append(article)
+            published = pd.to_datetime(pd.Series([a["publishedAt"] for a in fetched], dtype=object),
+                                       utc=True, errors="coerce")
+            newest = published.max() if published.notna().any() else None
+            if not caught_up:
+                # Paging back stalled (one timestamp filling every page): keep both watermarks, retry next poll
+                self.metrics.count("polls_not_caught_up")
+                print(f"⚠️ '{query}': could not page back to {since}; watermark held")
+                newest = None
+            if newest is not None and (since is None or newest > pd.Timestamp(since)):
+                since = to_watermark(newest)
+            self.metrics.count("articles_fetched", len(fetched))
+            self.metrics.count("articles_repeated", len(fetched) - len(articles))
+            if self.watermarks.track(key, poll_id, len(articles), newest):
+                save_state(self.watermarks.state, args.state)
+            if articles:
+                print(f"📰 '{query}': {len(articles)} new articles")
+
+            for article in articles:
+                # Waits while the queue is full; articles left over at shutdown hold the watermark back
+                if not await self.enqueue((article, key, poll_id, fetched_at)):
+                    break
+            if await self.sleep(args.interval):
+                break
+
+    async def score(self):
+        args = self.args
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await self.articles.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + args.batch_wait
+            while len(batch) < args.batch_size:
+                try:
+                    item = await asyncio.wait_for(self.articles.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            df = pd.DataFrame([article for article, *_ in batch])
+            df["publishedAt"] = pd.to_datetime(df["publishedAt"], utc=True, errors="coerce")
+            while True:
+                try:
+                    with perf_metrics.stage("ingest_score", items=len(df)) as stage_metrics, \
+                            stage_metrics.timer(len(df)):
+                        scored = await asyncio.to_thread(self.score_batch, df)
+                    break
+                except Exception as e:
+                    # The batch is retried, never dropped; its watermarks stay put meanwhile
+                    self.metrics.count("score_errors")
+                    print(f"❌ Scoring {len(df)} articles failed, retrying: {e}")
+                    if await self.sleep(args.retry_delay):
+                        return
+            await self.scored.put((scored, [meta for _, *meta in batch]))
+
+    async def flush(self, pending):
+        frames = [df for df, _ in pending]
+        rows = [meta for _, batch_meta in pending for meta in batch_meta]
+        df = pd.concat(frames, ignore_index=True)
+        from bigquery_delta import LoadLedger, upload_delta
+
+        if self.ledger is None:
+            # One ledger connection for the daemon's lifetime; each flush looks up only its own keys
+            self.ledger = LoadLedger(self.sink.destination)
+        with perf_metrics.stage("ingest_flush", items=len(df)):
+            summary = await asyncio.to_thread(upload_delta, df, self.sink, self.ledger)
+        flushed_at = time.monotonic()
+        moved = False
+        for key, poll_id, fetched_at in rows:
+            # Fetch → flushed latency, per article
+            self.metrics.observe(flushed_at - fetched_at)
+            moved = self.watermarks.done(key, poll_id) or moved
+        self.metrics.add_items(len(df))
+        if moved:
+            save_state(self.watermarks.state, self.args.state)
+        p50 = self.metrics.percentiles((0.5,)).get(0.5) or 0
+        print(f"📤 Flushed {len(df)} rows ({summary['new']} new, {summary['changed']} changed); "
+              f"{self.articles.qsize()} queued, fetch→sink p50 {p50:.1f}s")
+        perf_metrics.export(self.args.metrics_report, self.args.metrics_prometheus, verbose=False)
+
+    async def drain(self):
+        args = self.args
+        loop = asyncio.get_running_loop()
+        pending, oldest, finished = [], None, False
+        while not finished or pending:
+            if not finished:
+                timeout = None if oldest is None else max(oldest + args.flush_seconds - loop.time(), 0)
+                try:
+                    item = await asyncio.wait_for(self.scored.get(), timeout)
+                    if item is None:
+                        finished = True
+                    else:
+                        pending.append(item)
+                        oldest = loop.time() if oldest is None else oldest
+                except asyncio.TimeoutError:
+                    pass
+            if not pending:
+                continue
+            rows = sum(len(df) for df, _ in pending)
+            if finished or rows >= args.flush_rows or loop.time() - oldest >= args.flush_seconds:
+                try:
+                    await self.flush(pending)
+                    pending, oldest = [], None
+                except Exception as e:
+                    # Kept and retried; meanwhile the scorers stall on the full scored queue
+                    self.metrics.count("flush_errors")
+                    print(f"❌ Flushing {rows} rows failed: {e}")
+                    if self.stop.is_set() or await self.sleep(args.retry_delay):
+                        # Their polls' watermarks never moved past them, so the next start fetches them again
+                        self.metrics.count("rows_dropped", rows)
+                        print(f"🛑 Stopping: gave up on {rows} rows; they are re-fetched on the next start")
+                        pending, oldest = [], None
+
+    async def run(self, queries):
+        workers = [asyncio.create_task(self.score()) for _ in range(self.args.workers)]
+        sink = asyncio.create_task(self.drain())
+        await asyncio.gather(*(self.poll(query) for query in queries))
+        # Pollers are done: let the scorers finish what is queued, then the sink
+        for _ in workers:
+            while True:
+                try:
+                    self.articles.put_nowait(None)
+                    break
+                except asyncio.QueueFull:
+                    # No room for the sentinel (a scorer gave up while stopping): drop the oldest
+                    # article instead of waiting forever; its watermark is held, so it is re-fetched
+                    self.articles.get_nowait()
+                    self.metrics.count("articles_dropped")
+        await asyncio.gather(*workers)
+        await self.scored.put(None)
+        await sink
+
+
+async def main(args):
+    from pipeline import make_sink
+
+    daemon = IngestDaemon(args, make_batch_scorer(args), make_sink(args.sink))
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, daemon.stop.set)
+    if args.run_for:
+        loop.call_later(args.run_for, daemon.stop.set)
+    queries = args.query or ["India"]
+    print(f"🌊 Streaming {', '.join(repr(q) for q in queries)} every {args.interval:g}s into {daemon.sink.destination}"
+          f" (scorers: {', '.join(args.scorers)}); Ctrl+C to stop")
+    await daemon.run(queries)
+    print("🛑 Stopped; watermarks cover everything flushed")
+
+
+if __name__ == "__main__":
+    from pipeline import SCORERS, add_scorer_arguments
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Continuously fetch, score and upsert news as it is published")
+    parser.add_argument("--query", action="append", help="Search keyword; repeat for several (default: India)")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--country", default="in")
+    parser.add_argument("--max-pages", type=int, default=10, help="Pages per request window; a poll pages back in windows until it reaches the watermark")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between polls of each query")
+    parser.add_argument("--state", default=STATE_FILE, help="Per-query watermarks, shared with fetch_news_gnews.py")
+    parser.add_argument("--scorers", default="vader", help=f"Comma-separated subset of {','.join(SCORERS)}")
+    parser.add_argument("--sink", default=SINK, help="'bigquery[:dataset.table]' or 'sqlite:PATH'")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the sentiment cache inside scorers")
+    parser.add_argument("--run-for", type=float, help="Stop after this many seconds (default: until SIGINT/SIGTERM)")
+    parser.add_argument("--metrics-report", default=perf_metrics.REPORT_PATH,
+                        help="JSON performance report, rewritten after every flush (default: $PERF_REPORT)")
+    parser.add_argument("--metrics-prometheus", default=perf_metrics.PROMETHEUS_PATH,
+                        help="Prometheus text-format metrics, rewritten after every flush (default: $PERF_PROMETHEUS)")
+
+    flow_group = parser.add_argument_group("flow control")
+    flow_group.add_argument("--queue-size", type=int, default=1000, help="Articles fetched but not yet scored, at most")
+    flow_group.add_argument("--high-water", type=int, help="Skip polling while this many are queued (default: 3/4 full)")
+    flow_group.add_argument("--workers", type=int, default=1, help="Concurrent scoring micro-batches")
+    flow_group.add_argument("--batch-size", type=int, default=64, help="Articles per scoring micro-batch")
+    flow_group.add_argument("--batch-wait", type=float, default=0.5,
+                            help="Seconds a micro-batch waits to fill before it is scored anyway")
+    flow_group.add_argument("--flush-rows", type=int, default=500, help="Flush to the sink at this many scored rows")
+    flow_group.add_argument("--flush-seconds", type=float, default=5,
+                            help="... or once the oldest unflushed row is this old")
+    flow_group.add_argument("--retry-delay", type=float, default=5, help="Seconds before retrying a failed batch")
+
+    add_scorer_arguments(parser)
+    args = parser.parse_args()
+
+    args.scorers = [name.strip() for name in args.scorers.split(",") if name.strip()]
+    unknown = set(args.scorers) - set(SCORERS)
+    if unknown:
+        parser.error(f"Unknown scorers: {', '.join(sorted(unknown))}")
+    args.high_water = args.high_water or max(1, args.queue_size * 3 // 4)
+
+    asyncio.run(main(args))
+    perf_metrics.export(args.metrics_report, args.metrics_prometheus)
@@ -0,0 +1,153 @@
+import re
+import zlib
+import numpy as np
+import pandas as pd
+import perf_metrics
+
+# Near-duplicate collapsing for syndicated wire stories: word shingles,
+# MinHash signatures and LSH banding, so candidate pairs are found without
+# comparing every article against every other one.
+
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_SIZE = 3
+THRESHOLD = 0.6
+# Shingle hashes are combined modulo this Mersenne prime
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(texts, shingle_size=SHINGLE_SIZE):
+    """Hashes of every word `shingle_size`-gram, flat, plus the number belonging to each text.
+
+    Each distinct word is hashed once (crc32, so results are stable across
+    runs); n-grams are then combined from word hashes with NumPy. A text
+    shorter than `shingle_size` words yields one shingle for the whole text,
+    and one with no words at all (empty, punctuation only) a sentinel shingle.
+    """
+    words = [_WORD_RE.findall(str(text).lower()) for text in texts]
+    lengths = np.array([len(w) for w in words], dtype=np.int64)
+    codes, vocabulary = pd.factorize(pd.Series([word for w in words for word in w], dtype=object))
+    word_hashes = np.array([zlib.crc32(word.encode("utf-8")) for word in vocabulary] + [0], dtype=np.int64)
+
+    # Pad every text with shingle_size sentinel words so n-grams never cross texts,
+    # and a text without words still has a full n-gram of its own
+    pad = shingle_size
+    padded = np.full(lengths.sum() + pad * len(words), len(vocabulary), dtype=np.int64)
+    text_starts = np.concatenate([[0], np.cumsum(lengths + pad)[:-1]])
+    padded[np.arange(lengths.sum()) + np.repeat(np.arange(len(words)) * pad, lengths)] = codes
+    ids = word_hashes[padded]
+
+    counts = np.maximum(lengths - shingle_size + 1, 1)
+    starts = np.repeat(text_starts, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    hashes = np.zeros(len(starts), dtype=np.int64)
+    for offset in range(shingle_size):
+        hashes = (hashes * 1000003 + ids[starts + offset] + 1) % _PRIME
+    return hashes, counts
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1, chunk=2048):
+    """(len(texts), num_perm) uint32 MinHash signatures, computed in vectorised chunks."""
+    # Permutations are h -> a * h + b (mod 2^32) with odd a: a bijection on uint32 that
+    # NumPy computes with wrapping multiplies instead of a modulo
+    rng = np.random.default_rng(seed)
+    a = (rng.integers(0, 1 << 32, num_perm, dtype=np.uint64) | 1).astype(np.uint32)[:, None]
+    b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64).astype(np.uint32)[:, None]
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), chunk):
+        hashes, counts = shingle_hashes(texts[start:start + chunk], shingle_size)
+        permuted = a * hashes.astype(np.uint32) + b
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        signatures[start:start + len(counts)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_clusters(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS,
+                            shingle_size=SHINGLE_SIZE):
+    """Representative row position for every text; near-duplicates share one.
+
+    Identical texts are collapsed first. Distinct texts whose signatures collide
+    in any LSH band are candidates, and a candidate joins a cluster only when
+    its estimated Jaccard similarity to the bucket's first member reaches
+    `threshold`. The representative is the cluster's first row.
+    """
+    codes, uniques = pd.factorize(pd.Series(list(texts), dtype=object).fillna("").astype(str))
+    if len(uniques) == 0:
+        return np.zeros(0, dtype=np.int64)
+    signatures = minhash_signatures(list(uniques), num_perm, shingle_size)
+    rows = num_perm // bands
+    parent = np.arange(len(uniques))
+
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, bucket = np.unique(keys, return_inverse=True)
+        order = np.argsort(bucket, kind="stable")
+        starts = np.flatnonzero(np.diff(bucket[order], prepend=-1))
+        for begin, end in zip(starts, np.append(starts[1:], len(order))):
+            if end - begin < 2:
+                continue
+            members = order[begin:end]
+            similarity = (signatures[members[1:]] == signatures[members[0]]).mean(axis=1)
+            root = _find(parent, members[0])
+            for member in members[1:][similarity >= threshold]:
+                other = _find(parent, member)
+                if other != root:
+                    parent[max(other, root)] = min(other, root)
+                    root = min(other, root)
+
+    unique_roots = np.array([_find(parent, i) for i in range(len(uniques))])
+    # Map each unique text's root to the first row that holds it
+    first_row = np.full(len(uniques), -1, dtype=np.int64)
+    first_row[codes[::-1]] = np.arange(len(codes))[::-1]
+    return first_row[unique_roots[codes]]
+
+
+def score_representatives(texts, representatives, score_fn):
+    """Score one text per cluster with `score_fn` and fan (labels, scores) out to every row.
+
+    Returns (labels, scores, stats); stats reports rows, clusters and the
+    inference calls saved compared with scoring every row.
+    """
+    texts = list(texts)
+    representatives = np.asarray(representatives)
+    unique_reps, positions = np.unique(representatives, return_inverse=True)
+    labels, scores = score_fn([texts[i] for i in unique_reps])
+    scores = list(scores) if scores is not None else [None] * len(unique_reps)
+    stats = {"rows": len(texts), "clusters": len(unique_reps), "inference_saved": len(texts) - len(unique_reps)}
+    stage_metrics = perf_metrics.metrics("dedup")
+    stage_metrics.count("rows", stats["rows"])
+    stage_metrics.count("inference_saved", stats["inference_saved"])
+    return [labels[p] for p in positions], [scores[p] for p in positions], stats
+
+
+def cluster_frame(df, columns=("title", "description"), threshold=THRESHOLD):
+    """Representative row position for every row of `df`, clustering on `columns` joined together."""
+    with perf_metrics.stage("dedup", items=len(df)):
+        combined = df.reindex(columns=list(columns)).fillna("").astype(str).agg(" ".join, axis=1)
+        return near_duplicate_clusters(combined.tolist(), threshold)
+
+
+def dedup_score(df, score_fn, column="description", cluster_columns=("title", "description"),
+                threshold=THRESHOLD):
+    """Cluster `df` on title+description, score `column` once per cluster and return (labels, scores, stats)."""
+    representatives = cluster_frame(df, cluster_columns, threshold)
+    return score_representatives(df[column].astype(str).tolist(), representatives, score_fn)
+
+
+if __name__ == "__main__":
+    # Texts without words must neither read past the end nor borrow the next text's shingles
+    texts = ["hello world foo bar", "hello world foo bar baz", "---", "", "breaking news from pune today"]
+    for order in (texts, texts[2:] + texts[:2], texts[:2] + texts[3:] + texts[2:3]):
+        hashes, counts = shingle_hashes(order)
+        alone = np.concatenate([shingle_hashes([text])[0] for text in order])
+        assert counts.tolist() == [shingle_hashes([text])[1][0] for text in order], order
+        assert (hashes == alone).all(), order
+        print(f"✅ {near_duplicate_clusters(order).tolist()} for {order}")
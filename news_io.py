@@ -0,0 +1,144 @@
+import argparse
+import os
+import pandas as pd
+
+# Datasets are written as zstd-compressed Parquet unless NEWS_DATA_FORMAT=csv.
+# Paths keep their familiar names ("news_with_sentiment.csv"); the extension is
+# swapped for the configured format, and reads pick up whichever copy is newest.
+DATA_FORMAT = os.getenv("NEWS_DATA_FORMAT", "parquet")
+FORMATS = ("parquet", "csv")
+DATE_COLUMNS = ("publishedAt",)
+
+
+def with_format(path, fmt):
+    return f"{os.path.splitext(path)[0]}.{fmt}"
+
+
+def locate(path):
+    """The existing copy of `path` to read: the newer of its .parquet and .csv versions."""
+    candidates = [candidate for candidate in (with_format(path, "parquet"), with_format(path, "csv"), path)
+                  if os.path.exists(candidate)]
+    if not candidates:
+        raise FileNotFoundError(f"No such file: '{path}' (looked for .parquet and .csv)")
+    return max(candidates, key=lambda candidate: (os.stat(candidate).st_mtime_ns, candidate.endswith(".parquet")))
+
+
+def file_signature(path):
+    """Identify one version of a dataset: the copy read (see locate) plus its mtime and size."""
+    path = locate(path)
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _parse_dates(df):
+    for column in DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], utc=True, errors="coerce")
+    return df
+
+
+def read_news(path, columns=None):
+    """Read a news dataset, optionally only `columns`, with publishedAt already typed.
+
+    Parquet is memory-mapped and only the requested columns are decoded; CSV
+    falls back to read_csv with `usecols`. Requested columns missing from the
+    file are ignored, like a projection onto whatever the file has.
+    """
+    path = locate(path)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [column for column in columns if column in available]
+        return _parse_dates(pd.read_parquet(path, columns=columns, memory_map=True))
+    usecols = None if columns is None else (lambda column: column in set(columns))
+    return _parse_dates(pd.read_csv(path, usecols=usecols))
+
+
+def iter_news(path, chunksize=10000, columns=None):
+    """Yield the dataset in frames of at most `chunksize` rows."""
+    path = locate(path)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize, columns=columns):
+            yield _parse_dates(batch.to_pandas())
+    else:
+        usecols = None if columns is None else (lambda column: column in set(columns))
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols):
+            yield _parse_dates(chunk)
+
+
+def write_news(df, path, fmt=None):
+    """Write `df` in `fmt` (default NEWS_DATA_FORMAT) next to `path`; returns the path written."""
+    fmt = fmt or DATA_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown data format {fmt!r}; choose one of {FORMATS}")
+    path = with_format(path, fmt)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        _parse_dates(df.copy()).to_parquet(path, index=False, compression="zstd")
+    return path
+
+
+class ChunkWriter:
+    """Append frames to one dataset file: CSV appends, Parquet adds a row group per chunk.
+
+    CSV is the default because every appended chunk is readable straight away;
+    a Parquet file only becomes readable once the writer is closed.
+    """
+
+    def __init__(self, path, fmt="csv"):
+        self.fmt = fmt
+        self.path = with_format(path, self.fmt)
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(_parse_dates(df.copy()), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+            self._writer.write_table(table.cast(self._writer.schema))
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_csv(path, output=None):
+    """CSV copy of a dataset for spreadsheets and other tools; returns the path written."""
+    df = read_news(path)
+    output = output or with_format(path, "csv")
+    df.to_csv(output, index=False)
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert news datasets between Parquet and CSV")
+    parser.add_argument("paths", nargs="+", help="Datasets to convert")
+    parser.add_argument("--to", choices=FORMATS, default="parquet")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        source = locate(path)
+        if args.to == "csv":
+            written = export_csv(source)
+        else:
+            written = write_news(read_news(source), source, "parquet")
+        print(f"✅ {source} ({os.path.getsize(source) / 1024:.0f} KB) → {written} "
+              f"({os.path.getsize(written) / 1024:.0f} KB)")
@@ -1,38 +1,93 @@
-import pandas as pd
-from transformers import pipeline
-from tqdm import tqdm
-
-# Load your CSV file
-df = pd.read_csv("gnews_output.csv")  # Make sure this file exists
-
-# Load sentiment-analysis pipeline from Hugging Face
-sentiment_pipeline = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english", framework="pt")
-
-# Function to classify sentiment using BERT
-def classify_sentiment_bert(text):
-    try:
-        result = sentiment_pipeline(str(text))[0]
-        label = result['label']
-        # Convert labels like 'POSITIVE'/'NEGATIVE' to 'Positive'/'Negative'/'Neutral'
-        if label == 'POSITIVE':
-            return 'Positive'
-        elif label == 'NEGATIVE':
-            return 'Negative'
-        else:
-            return 'Neutral'
-    except Exception as e:
-        print("Error:", e)
-        return 'Unknown'
-
-# Apply BERT sentiment analysis with a progress bar
-tqdm.pandas()
-df['bert_sentiment'] = df['description'].progress_apply(classify_sentiment_bert)
-
-# Save results to new CSV
-df.to_csv("news_with_bert_sentiment.csv", index=False)
-
-# Show a preview
-print(df[['title', 'bert_sentiment']].head(10))
-
-# ✅ Only show columns that exist
-print(df[['title', 'description', 'bert_sentiment']].head())
\ No newline at end of file
+import argparse
+from bert_engine import BACKENDS, LONG_TEXT_MODES, MODEL_NAME
+from bert_server import DEFAULT_URL, get_scorer
+import perf_metrics
+from near_dedup import THRESHOLD, dedup_score
+from news_io import ChunkWriter, iter_news, read_news, write_news
+from sentiment_cache import SentimentCache, cached_score
+from sentiment_rollup import SentimentRollup, update_rollups
+
+parser = argparse.ArgumentParser(description="Score news descriptions with DistilBERT")
+parser.add_argument("--input", default="gnews_output.csv")
+parser.add_argument("--output", default="news_with_bert_sentiment.csv")
+parser.add_argument("--batch-size", type=int, default=32, help="Articles per forward pass")
+parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                    help="'onnx' runs an int8-quantized export through ONNX Runtime (faster, smaller on CPU)")
+parser.add_argument("--long-text", choices=LONG_TEXT_MODES, default="truncate",
+                    help="'window' scores every part of descriptions over 512 tokens and averages them")
+parser.add_argument("--stride", type=int, default=128, help="Tokens shared by neighbouring windows")
+parser.add_argument("--max-windows", type=int, default=8, help="Upper bound on windows per description")
+parser.add_argument("--stream", action="store_true", help="Read, score and append the input in chunks")
+parser.add_argument("--chunksize", type=int, default=10000, help="Rows per chunk in --stream mode")
+parser.add_argument("--server", default=DEFAULT_URL, help="Resident bert_server to use when it is running")
+parser.add_argument("--near-dedup", action="store_true",
+                    help="Score one article per cluster of near-duplicate wire stories and copy its label")
+parser.add_argument("--dedup-threshold", type=float, default=THRESHOLD, help="Estimated Jaccard similarity to merge")
+parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+args = parser.parse_args()
+
+# Reuse labels for descriptions already scored on earlier runs
+# The quantized model can disagree on borderline texts, so it gets its own namespace
+namespace = f"bert:{MODEL_NAME}:v1" if args.backend == "torch" else f"bert:{MODEL_NAME}:{args.backend}-int8:v1"
+if args.long_text == "window":
+    namespace += f":window-{args.stride}-{args.max_windows}"
+cache = None if args.no_cache else SentimentCache(namespace)
+
+# Only if something is left to score: use the warm bert_server, or load DistilBERT here
+scorer = None
+
+def score_texts(texts):
+    global scorer
+    if scorer is None:
+        scorer = get_scorer(args.server, backend=args.backend, batch_size=args.batch_size,
+                            long_text=args.long_text, stride=args.stride, max_windows=args.max_windows)
+    return scorer.score(texts, progress=not args.stream)
+
+def add_bert_sentiment(frame):
+    if args.near_dedup:
+        labels, _, stats = dedup_score(frame, lambda texts: cached_score(cache, texts, score_texts),
+                                       threshold=args.dedup_threshold)
+        print(f"🧬 {stats['rows']} articles in {stats['clusters']} clusters: "
+              f"{stats['inference_saved']} inference calls saved")
+    else:
+        labels, _ = cached_score(cache, frame['description'].astype(str).tolist(), score_texts)
+    frame['bert_sentiment'] = labels
+    return frame
+
+if args.stream:
+    # Constant memory: only one chunk is held at a time, and each scored chunk
+    # is appended to the output as soon as it is done. Rollups are folded in per
+    # chunk but not marked synced: rows dropped from the input (or repeated
+    # across chunks) are only settled by the next full sync, which the
+    # dashboards run on first load.
+    total = 0
+    with ChunkWriter(args.output) as writer:
+        rollup = SentimentRollup.for_path(writer.path)
+        for i, chunk in enumerate(iter_news(args.input, chunksize=args.chunksize)):
+            chunk = add_bert_sentiment(chunk)
+            writer.write(chunk)
+            rollup.update(chunk)
+            total += len(chunk)
+            print(f"✅ Chunk {i + 1}: {total} rows written to {writer.path}")
+    rollup.close()
+    if cache is not None:
+        print("🗃️ Cache:", cache.stats())
+else:
+    # Load your CSV file
+    df = read_news(args.input)  # Make sure this file exists
+    df = add_bert_sentiment(df)
+    if cache is not None:
+        print("🗃️ Cache:", cache.stats())
+
+    # Save results and bring the dashboard's label counts up to date
+    written = write_news(df, args.output)
+    update_rollups(df, written)
+
+    # Show a preview
+    print(df[['title', 'bert_sentiment']].head(10))
+
+    # ✅ Only show columns that exist
+    print(df[['title', 'description', 'bert_sentiment']].head())
+
+# 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+perf_metrics.export()
@@ -1,40 +1,67 @@
+import argparse
 import os
-import pandas as pd
-from openai import OpenAI
 from dotenv import load_dotenv
+from gpt_classifier import (MODEL, PACKED_PROMPT_TEMPLATE, PACKED_SYSTEM_PROMPT, PROMPT_TEMPLATE,
+                            SYSTEM_PROMPT, classify_texts, prompt_version)
+import perf_metrics
+from near_dedup import THRESHOLD, dedup_score
+from news_io import read_news, write_news
+from sentiment_cache import SentimentCache, cached_score
+from sentiment_rollup import update_rollups
 
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def classify_sentiment(text):
-    prompt = f"What is the sentiment of the following news text? Respond with Positive, Negative, or Neutral only.\n\nText: {text}"
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a sentiment analysis assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=10
-        )
-        sentiment = response.choices[0].message.content.strip()
-        return sentiment
-    except Exception as e:
-        print("Error:", e)
-        return "Unknown"
+parser = argparse.ArgumentParser(description="Score news descriptions with GPT-3.5")
+parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+parser.add_argument("--pack-size", type=int, default=1, help="Articles per request (JSON label list when > 1)")
+parser.add_argument("--rpm", type=int, default=None, help="Requests-per-minute limit")
+parser.add_argument("--tpm", type=int, default=None, help="Tokens-per-minute limit")
+parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="API base URL, e.g. a local stub server")
+parser.add_argument("--near-dedup", action="store_true",
+                    help="Classify one article per cluster of near-duplicate wire stories and copy its label")
+parser.add_argument("--dedup-threshold", type=float, default=THRESHOLD, help="Estimated Jaccard similarity to merge")
+parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+args = parser.parse_args()
+
+# Cached GPT labels are only reused while the model and prompt stay the same
+if args.pack_size > 1:
+    PROMPT_VERSION = prompt_version(PACKED_SYSTEM_PROMPT, PACKED_PROMPT_TEMPLATE)
+else:
+    PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, PROMPT_TEMPLATE)
+
+def classify_sentiment(texts):
+    return classify_texts(
+        texts,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=args.base_url,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        pack_size=args.pack_size,
+    ), None
 
 # Load news data
-df = pd.read_csv("pune_news_data.csv")
+df = read_news("pune_news_data.csv")
 
-# Apply sentiment analysis
-df['gpt_sentiment'] = df['description'].apply(lambda x: classify_sentiment(str(x)))
+# Apply sentiment analysis, paying only for descriptions not seen before
+cache = None if args.no_cache else SentimentCache(f"gpt:{MODEL}:{PROMPT_VERSION}")
+if args.near_dedup:
+    labels, _, stats = dedup_score(df, lambda texts: cached_score(cache, texts, classify_sentiment),
+                                   threshold=args.dedup_threshold)
+    print(f"🧬 {stats['rows']} articles in {stats['clusters']} clusters: "
+          f"{stats['inference_saved']} API calls saved")
+else:
+    labels, _ = cached_score(cache, df['description'].astype(str).tolist(), classify_sentiment)
+df['gpt_sentiment'] = labels
+if cache is not None:
+    print("🗃️ Cache:", cache.stats())
 
-# Save to new file
-df.to_csv("news_with_gpt_sentiment.csv", index=False)
+# Save to new file and bring the dashboard's label counts up to date
+written = write_news(df, "news_with_gpt_sentiment.csv")
+update_rollups(df, written)
 
 # ✅ Only show columns that exist
 print(df[['title', 'description', 'gpt_sentiment']].head())
+
+# 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+perf_metrics.export()
@@ -1,35 +1,48 @@
-import pandas as pd
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import argparse
+import os
 import nltk
+import perf_metrics
+from news_io import read_news, write_news
+from sentiment_cache import SentimentCache
+from sentiment_rollup import update_rollups
+from vader_engine import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD, bucket_compound, score_columns
 
-# 🔁 Load previous CSV
-df = pd.read_csv("news_data.csv")
-
-# 📥 Download VADER Lexicon (if not already downloaded)
-nltk.download('vader_lexicon')
-
-# 🧠 Initialize VADER
-vader = SentimentIntensityAnalyzer()
-
-# 🧪 Apply sentiment analysis to each row
-def get_sentiment(text):
-    if pd.isna(text):
-        return "Neutral"
-    score = vader.polarity_scores(text)["compound"]
-    if score >= 0.05:
-        return "Positive"
-    elif score <= -0.05:
-        return "Negative"
-    else:
-        return "Neutral"
-
-# 🧾 Apply to title and description (you can choose one or both)
-df["sentiment_title"] = df["title"].apply(get_sentiment)
-df["sentiment_description"] = df["description"].apply(get_sentiment)
-
-# 💾 Save updated data
-df.to_csv("news_with_sentiment.csv", index=False)
-
-# ✅ Preview result
-print("Sentiment analysis complete!")
-print(df[["title", "sentiment_title", "description", "sentiment_description"]].head())
+
+def main():
+    parser = argparse.ArgumentParser(description="Score news titles and descriptions with VADER")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Processes used to score distinct texts")
+    parser.add_argument("--positive-threshold", type=float, default=POSITIVE_THRESHOLD)
+    parser.add_argument("--negative-threshold", type=float, default=NEGATIVE_THRESHOLD)
+    parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+    args = parser.parse_args()
+
+    # 🔁 Load previous CSV
+    df = read_news("news_data.csv")
+
+    # 📥 Download VADER Lexicon (if not already downloaded)
+    nltk.download('vader_lexicon')
+
+    # 🗃️ Reuse compound scores for texts already scored on earlier runs
+    cache = None if args.no_cache else SentimentCache("vader:nltk:v2")
+
+    # 🧪 Score title and description together: each distinct text is scored once
+    scores = score_columns(df, ["title", "description"], n_jobs=args.jobs, cache=cache)
+
+    # 🧾 Bucket compound scores into Positive / Neutral / Negative
+    df["sentiment_title"] = bucket_compound(scores["title"], args.positive_threshold, args.negative_threshold)
+    df["sentiment_description"] = bucket_compound(scores["description"], args.positive_threshold, args.negative_threshold)
+
+    # 💾 Save updated data and bring the dashboard's label counts up to date
+    written = write_news(df, "news_with_sentiment.csv")
+    update_rollups(df, written)
+
+    # ✅ Preview result
+    print("Sentiment analysis complete!")
+    if cache is not None:
+        print("🗃️ Cache:", cache.stats())
+    print(df[["title", "sentiment_title", "description", "sentiment_description"]].head())
+    perf_metrics.export()
+
+
+if __name__ == "__main__":
+    main()
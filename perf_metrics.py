@@ -0,0 +1,217 @@
+import bisect
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# Process-wide, in-memory stage metrics: wall time, items, per-item latency
+# percentiles, counters (cache hits, retries, ...) and peak RSS. Recording is a
+# couple of bucket increments under a lock and memory stays fixed however long
+# the process runs, so it stays on in production and in the ingest daemon.
+#
+# Set PERF_REPORT=run.json and/or PERF_PROMETHEUS=run.prom to have scripts that
+# call export() write a JSON run report and a Prometheus text-format file.
+
+REPORT_PATH = os.getenv("PERF_REPORT")
+PROMETHEUS_PATH = os.getenv("PERF_PROMETHEUS")
+# Prometheus histogram buckets for per-item latency, in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Finer log-spaced buckets (2% apart, 1µs to ~3h) that the percentiles are read from
+PERCENTILE_BUCKETS = tuple(np.geomspace(1e-6, 1e4, int(np.log(1e10) / np.log(1.02)) + 1).tolist())
+
+_stages = {}
+_lock = threading.Lock()
+
+
+def peak_rss_bytes():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageMetrics:
+    """Measurements for one stage, accumulated over every time it runs in this process."""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.items = 0
+        self.runs = 0
+        self.counters = {}
+        self.peak_rss_bytes = 0
+        # Per-item latency as item counts per bucket; one batch adds its size to the bucket of its average
+        self._fine_counts = [0] * (len(PERCENTILE_BUCKETS) + 1)
+        self._bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._latency_min = float("inf")
+        self._latency_max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, items=1):
+        """Record that `items` items took `seconds` together (per-item latency is the average)."""
+        if items <= 0:
+            return
+        latency = seconds / items
+        with self._lock:
+            self._fine_counts[bisect.bisect_left(PERCENTILE_BUCKETS, latency)] += items
+            self._bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += items
+            self._latency_sum += seconds
+            self._latency_min = min(self._latency_min, latency)
+            self._latency_max = max(self._latency_max, latency)
+
+    @contextmanager
+    def timer(self, items=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, items)
+
+    def add_items(self, count):
+        with self._lock:
+            self.items += int(count)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """Per-item latency quantiles, accurate to the 2% width of PERCENTILE_BUCKETS."""
+        with self._lock:
+            counts = np.asarray(self._fine_counts, dtype=float)
+            low, high = self._latency_min, self._latency_max
+        if not counts.sum():
+            return {q: None for q in quantiles}
+        cumulative = np.cumsum(counts) / counts.sum()
+        bounds = PERCENTILE_BUCKETS + (high,)
+        return {q: float(min(max(bounds[min(np.searchsorted(cumulative, q), len(bounds) - 1)], low), high))
+                for q in quantiles}
+
+    def histogram(self):
+        """Cumulative item counts per LATENCY_BUCKETS upper bound, plus the latency sum and item count."""
+        with self._lock:
+            counts, total = list(self._bucket_counts), self._latency_sum
+        cumulative = np.cumsum(counts, dtype=float)
+        return cumulative[:-1].tolist(), float(total), float(cumulative[-1])
+
+    def summary(self):
+        p = self.percentiles()
+        hits, misses = self.counters.get("cache_hits", 0), self.counters.get("cache_misses", 0)
+        return {
+            "runs": self.runs,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "items": self.items,
+            "items_per_sec": round(self.items / self.wall_seconds, 2) if self.wall_seconds and self.items else None,
+            "latency_p50": p[0.5],
+            "latency_p95": p[0.95],
+            "latency_p99": p[0.99],
+            "cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "counters": dict(self.counters),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2 ** 20, 1),
+        }
+
+
+def metrics(name):
+    """The StageMetrics for `name`, created on first use."""
+    with _lock:
+        if name not in _stages:
+            _stages[name] = StageMetrics(name)
+        return _stages[name]
+
+
+@contextmanager
+def stage(name, items=None):
+    """Time one run of a stage; `items` (if known up front) is added to its item count."""
+    stage_metrics = metrics(name)
+    start = time.perf_counter()
+    try:
+        yield stage_metrics
+    finally:
+        with stage_metrics._lock:
+            stage_metrics.wall_seconds += time.perf_counter() - start
+            stage_metrics.runs += 1
+            stage_metrics.peak_rss_bytes = max(stage_metrics.peak_rss_bytes, peak_rss_bytes())
+        if items is not None:
+            stage_metrics.add_items(items)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def report():
+    """JSON-serialisable run report for every stage recorded so far."""
+    with _lock:
+        stages = dict(_stages)
+    return {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "argv": sys.argv,
+        "peak_rss_mb": round(peak_rss_bytes() / 2 ** 20, 1),
+        "stages": {name: stage_metrics.summary() for name, stage_metrics in sorted(stages.items())},
+    }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix="news_pipeline"):
+    """Prometheus text exposition format for every stage recorded so far."""
+    with _lock:
+        stages = sorted(_stages.items())
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}")
+
+    family("stage_wall_seconds_total", "counter", "Wall time spent in the stage.",
+           [("", {"stage": name}, s.wall_seconds) for name, s in stages])
+    family("stage_items_total", "counter", "Items processed by the stage.",
+           [("", {"stage": name}, s.items) for name, s in stages])
+    family("stage_runs_total", "counter", "Times the stage ran.",
+           [("", {"stage": name}, s.runs) for name, s in stages])
+    family("stage_peak_rss_bytes", "gauge", "Process peak RSS observed when the stage finished.",
+           [("", {"stage": name}, s.peak_rss_bytes) for name, s in stages])
+
+    samples = []
+    for name, s in stages:
+        counts, total, observed = s.histogram()
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            samples.append(("_bucket", {"stage": name, "le": bound}, count))
+        samples.append(("_bucket", {"stage": name, "le": "+Inf"}, observed))
+        samples.append(("_sum", {"stage": name}, total))
+        samples.append(("_count", {"stage": name}, observed))
+    family("item_latency_seconds", "histogram", "Per-item latency (batch time divided by batch size).", samples)
+
+    samples = []
+    for name, s in stages:
+        for counter, value in sorted(s.counters.items()):
+            samples.append(("", {"stage": name, "counter": counter}, value))
+    family("stage_events_total", "counter", "Stage events such as cache hits, misses and retries.", samples)
+    return "\n".join(lines) + "\n"
+
+
+def export(report_path=None, prometheus_path=None, verbose=True):
+    """Write the JSON report and/or Prometheus file (defaults: PERF_REPORT / PERF_PROMETHEUS)."""
+    report_path = report_path or REPORT_PATH
+    prometheus_path = prometheus_path or PROMETHEUS_PATH
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report(), f, indent=2)
+        if verbose:
+            print(f"📈 Performance report written to {report_path}")
+    if prometheus_path:
+        with open(prometheus_path, "w") as f:
+            f.write(prometheus_text())
+        if verbose:
+            print(f"📈 Prometheus metrics written to {prometheus_path}")
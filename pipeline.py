@@ -0,0 +1,467 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from functools import partial
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+import perf_metrics
+from news_io import DATA_FORMAT, locate, read_news, write_news
+
+# 🧭 fetch → normalize → score (vader / bert / gpt) → combine → upload, as one DAG.
+# Every stage is keyed on a hash of its config and the bytes of its input files;
+# a stage whose key and outputs match the last run is skipped.
+
+WORKDIR = "pipeline_data"
+STATE_FILE = ".pipeline_state.json"
+SCORERS = ("vader", "bert", "gpt", "cascade")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Stage:
+    """One node of the DAG: reads `inputs`, writes `outputs`, described by `config`.
+
+    `volatile` stages (fetching from the API) have no inputs to hash, so they
+    always run; stages downstream of them are still skipped when the fetched
+    file comes out byte-for-byte the same.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), config=None, volatile=False):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config = config or {}
+        self.volatile = volatile
+
+    def key(self):
+        payload = {
+            "stage": self.name,
+            "config": self.config,
+            "inputs": {os.path.basename(path): file_hash(path) for path in self.inputs},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Pipeline:
+    def __init__(self, stages, workdir=WORKDIR):
+        self.stages = stages
+        self.workdir = workdir
+        self.state_path = os.path.join(workdir, STATE_FILE)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    def _save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def is_current(self, stage, key):
+        previous = self.state.get(stage.name)
+        if stage.volatile or previous is None or previous["key"] != key:
+            return False
+        return all(os.path.exists(path) and previous["outputs"].get(path) == file_hash(path)
+                   for path in stage.outputs)
+
+    def run(self, force=(), dry_run=False):
+        """Run stages in order, skipping current ones; returns {stage: 'ran' | 'skipped' | 'pending'}."""
+        outcome = {}
+        producers = {path: stage.name for stage in self.stages for path in stage.outputs}
+        for stage in self.stages:
+            upstream = {producers[path] for path in stage.inputs if path in producers}
+            if dry_run and any(outcome[name] == "pending" for name in upstream):
+                # Inputs are about to change, so the key cannot be computed yet
+                outcome[stage.name] = "pending"
+                print(f"⏳ {stage.name}: would run (upstream changes)")
+                continue
+            missing = [path for path in stage.inputs if not os.path.exists(path)]
+            if missing:
+                if dry_run:
+                    outcome[stage.name] = "pending"
+                    print(f"⏳ {stage.name}: would run (missing {', '.join(missing)})")
+                    continue
+                raise FileNotFoundError(f"Stage {stage.name} is missing inputs: {', '.join(missing)}")
+
+            key = stage.key()
+            if stage.name not in force and self.is_current(stage, key):
+                outcome[stage.name] = "skipped"
+                print(f"⏭️ {stage.name}: up to date")
+                continue
+            if dry_run:
+                outcome[stage.name] = "pending"
+                print(f"⏳ {stage.name}: would run")
+                continue
+
+            print(f"▶️ {stage.name}...")
+            start = time.perf_counter()
+            with perf_metrics.stage(f"pipeline_{stage.name}"):
+                stage.run()
+            self.state[stage.name] = {"key": key, "outputs": {path: file_hash(path) for path in stage.outputs}}
+            self._save_state()
+            outcome[stage.name] = "ran"
+            print(f"✅ {stage.name} done in {time.perf_counter() - start:.1f}s")
+        return outcome
+
+
+# --- Stage bodies ------------------------------------------------------------
+
+
+def fetch(args, raw_path):
+    from fetch_news_gnews import fetch_incremental, load_state, make_session, merge_articles, save_state
+
+    state_path = os.path.join(args.workdir, "gnews_state.json")
+    new, state = fetch_incremental(make_session(), os.getenv("API_KEY"), args.query or ["India"],
+                                   load_state(state_path), args.lang, args.country, args.max_pages)
+    if new.empty and os.path.exists(raw_path):
+        return
+    existing = read_news(raw_path) if os.path.exists(raw_path) else new.iloc[0:0]
+    write_news(merge_articles(existing, new), raw_path)
+    save_state(state, state_path)
+
+
+def normalize(source_path, output_path):
+    """One row per article, trimmed text, newest first, and no rows without any text."""
+    df = read_news(source_path)
+    for column in ("title", "description"):
+        if column in df.columns:
+            df[column] = df[column].astype("string").str.strip().replace("", pd.NA)
+    text_columns = [column for column in ("title", "description") if column in df.columns]
+    df = df.dropna(subset=text_columns, how="all")
+    if "url" in df.columns:
+        from bigquery_delta import row_keys
+
+        # Rows without a URL are keyed by their text, so they aren't collapsed into one
+        df = df[~pd.Series(row_keys(df)).duplicated(keep="last").to_numpy()]
+    if "publishedAt" in df.columns:
+        df = df.sort_values("publishedAt", ascending=False, kind="stable")
+    write_news(df, output_path)
+
+
+def dedup(args, input_path, output_path):
+    """Near-duplicate clusters over title+description: each row's representative row position."""
+    from near_dedup import cluster_frame
+
+    df = read_news(input_path, columns=["title", "description"])
+    representatives = cluster_frame(df, threshold=args.dedup_threshold)
+    print(f"🧬 {len(df)} articles in {len(set(representatives))} near-duplicate clusters")
+    write_news(pd.DataFrame({"representative": representatives}), output_path)
+
+
+def score_once_per_cluster(texts, clusters_path, score_fn):
+    """score_fn over `texts`, or over one text per cluster when dedup is on; returns labels."""
+    if clusters_path is None:
+        labels, _ = score_fn(texts)
+        return labels
+    from near_dedup import score_representatives
+
+    representatives = read_news(clusters_path)["representative"].to_numpy()
+    labels, _, stats = score_representatives(texts, representatives, score_fn)
+    print(f"🧬 Scored {stats['clusters']} of {stats['rows']} articles: {stats['inference_saved']} inference calls saved")
+    return labels
+
+
+def score_vader(args, input_path, output_path):
+    import nltk
+    from sentiment_cache import SentimentCache
+    from vader_engine import bucket_compound, score_columns
+
+    df = read_news(input_path, columns=["title", "description"])
+    nltk.download("vader_lexicon", quiet=True)
+    cache = None if args.no_cache else SentimentCache("vader:nltk:v2")
+    scores = score_columns(df, ["title", "description"], n_jobs=args.jobs, cache=cache)
+    write_news(pd.DataFrame({
+        "sentiment_title": bucket_compound(scores["title"], args.positive_threshold, args.negative_threshold),
+        "sentiment_description": bucket_compound(scores["description"], args.positive_threshold,
+                                                 args.negative_threshold),
+    }), output_path)
+
+
+def bert_score_fn(args):
+    """Cached BERT (labels, scores) function; the model is only loaded once something misses the cache."""
+    from bert_server import get_scorer
+    from sentiment_cache import SentimentCache, cached_score
+
+    cache = None if args.no_cache else SentimentCache(bert_namespace(args))
+    scorer = None
+
+    def score_texts(texts):
+        nonlocal scorer
+        if scorer is None:
+            options = dict(backend=args.bert_backend, model_name=args.bert_model, batch_size=args.bert_batch_size,
+                           long_text=args.bert_long_text, stride=args.bert_stride,
+                           max_windows=args.bert_max_windows)
+            if args.bert_workers > 1:
+                from sharded_scoring import ShardedScorer
+
+                scorer = ShardedScorer("bert", args.bert_workers, args.bert_threads, **options)
+            else:
+                scorer = get_scorer(args.bert_server, **options)
+        return scorer.score(texts, progress=True)
+
+    return lambda texts: cached_score(cache, texts, score_texts)
+
+
+def gpt_score_fn(args):
+    """Cached GPT (labels, None) function."""
+    from gpt_classifier import classify_texts
+    from sentiment_cache import SentimentCache, cached_score
+
+    cache = None if args.no_cache else SentimentCache(f"gpt:{args.gpt_model}:{gpt_prompt_version(args)}")
+
+    def classify(texts):
+        return classify_texts(texts, api_key=os.getenv("OPENAI_API_KEY"), base_url=args.gpt_base_url,
+                              model=args.gpt_model, concurrency=args.gpt_concurrency,
+                              pack_size=args.gpt_pack_size), None
+
+    return lambda texts: cached_score(cache, texts, classify)
+
+
+def score_bert(args, input_path, output_path, clusters_path=None):
+    df = read_news(input_path, columns=["description"])
+    labels = score_once_per_cluster(df["description"].astype(str).tolist(), clusters_path, bert_score_fn(args))
+    write_news(pd.DataFrame({"bert_sentiment": labels}), output_path)
+
+
+def score_gpt(args, input_path, output_path, clusters_path=None):
+    df = read_news(input_path, columns=["description"])
+    labels = score_once_per_cluster(df["description"].astype(str).tolist(), clusters_path, gpt_score_fn(args))
+    write_news(pd.DataFrame({"gpt_sentiment": labels}), output_path)
+
+
+def score_cascade(args, input_path, output_path, clusters_path=None):
+    import nltk
+    from cascade import cascade_score, tier_summary
+    from gpt_classifier import normalize_gpt_label
+    from sentiment_cache import SentimentCache
+
+    df = read_news(input_path, columns=["description"])
+    nltk.download("vader_lexicon", quiet=True)
+    gpt_fn = gpt_score_fn(args)
+
+    def escalate_to_gpt(texts):
+        replies, _ = gpt_fn(texts)
+        return [reply if reply == "Unknown" else normalize_gpt_label(reply) for reply in replies], None
+
+    texts = df["description"].tolist()
+    rows = np.arange(len(texts))
+    if clusters_path is not None:
+        # Only cluster representatives go through the cascade; members copy their result
+        rows, positions = np.unique(read_news(clusters_path)["representative"].to_numpy(), return_inverse=True)
+    result = cascade_score([texts[i] for i in rows], bert_score_fn(args), escalate_to_gpt, args.cascade_vader_band,
+                           args.cascade_bert_confidence, n_jobs=args.jobs,
+                           vader_cache=None if args.no_cache else SentimentCache("vader:nltk:v2"))
+    sent = result.attrs["sent"]
+    if clusters_path is not None:
+        result = result.iloc[positions].reset_index(drop=True)
+    print(f"🪜 Decided by: {tier_summary(result['cascade_tier'])}; BERT scored {sent['bert']}, GPT {sent['gpt']}")
+    write_news(result, output_path)
+
+
+def combine(normalized_path, score_paths, output_path):
+    from sentiment_rollup import update_rollups
+
+    df = read_news(normalized_path)
+    for path in score_paths:
+        scores = read_news(path)
+        if len(scores) != len(df):
+            raise ValueError(f"{path} has {len(scores)} rows, expected {len(df)}")
+        # Fresh scores replace any columns of the same name the input already had
+        df = pd.concat([df.drop(columns=scores.columns, errors="ignore"), scores], axis=1)
+    written = write_news(df, output_path)
+    summary = update_rollups(df, written)
+    print(f"📊 Rollups: {summary['new']} new, {summary['changed']} changed, {summary['removed']} removed articles")
+
+
+def make_sink(spec):
+    from bigquery_delta import BigQuerySink, SQLiteSink
+
+    if spec.startswith("sqlite:"):
+        return SQLiteSink(spec[len("sqlite:"):])
+    from google.cloud import bigquery
+    from google.oauth2 import service_account
+
+    credentials = service_account.Credentials.from_service_account_file(os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
+    project_id = os.getenv("GCP_PROJECT_ID")
+    client = bigquery.Client(credentials=credentials, project=project_id)
+    _, _, target = spec.partition(":")
+    dataset, table = target.split(".") if target else ("news_dataset_asia", "news_with_sentiment")
+    return BigQuerySink(client, bigquery.DatasetReference(project_id, dataset).table(table), location="asia-south1")
+
+
+def upload(sink, input_path, output_path):
+    from bigquery_delta import upload_delta
+
+    summary = upload_delta(read_news(input_path), sink)
+    print(f"🔁 {summary['new']} new, {summary['changed']} changed, {summary['skipped']} already loaded")
+    with open(output_path, "w") as f:
+        json.dump({"destination": sink.destination, **summary}, f, indent=2)
+
+
+# --- Configuration that decides whether a scorer's output is still valid -----
+
+
+def bert_namespace(args):
+    namespace = f"bert:{args.bert_model}:v1"
+    if args.bert_backend != "torch":
+        namespace = f"bert:{args.bert_model}:{args.bert_backend}-int8:v1"
+    if args.bert_long_text == "window":
+        namespace += f":window-{args.bert_stride}-{args.bert_max_windows}"
+    return namespace
+
+
+def gpt_prompt_version(args):
+    from gpt_classifier import (PACKED_PROMPT_TEMPLATE, PACKED_SYSTEM_PROMPT, PROMPT_TEMPLATE, SYSTEM_PROMPT,
+                                prompt_version)
+    if args.gpt_pack_size > 1:
+        return prompt_version(PACKED_SYSTEM_PROMPT, PACKED_PROMPT_TEMPLATE)
+    return prompt_version(SYSTEM_PROMPT, PROMPT_TEMPLATE)
+
+
+def build_pipeline(args):
+    # Intermediates are written in NEWS_DATA_FORMAT (Parquet by default)
+    path = lambda name: os.path.join(args.workdir, f"{name}.{DATA_FORMAT}")  # noqa: E731
+    stages = []
+
+    if args.input:
+        source = locate(args.input)
+    else:
+        source = path("raw")
+        stages.append(Stage("fetch", lambda: fetch(args, source), outputs=[source], volatile=True))
+
+    normalized = path("normalized")
+    stages.append(Stage("normalize", lambda: normalize(source, normalized), [source], [normalized],
+                        {"version": 1}))
+
+    # Model scorers label one article per near-duplicate cluster; VADER is cheap enough to score every row
+    clusters = None
+    if not args.no_dedup and {"bert", "gpt", "cascade"} & set(args.scorers):
+        clusters = path("clusters")
+        stages.append(Stage("dedup", lambda: dedup(args, normalized, clusters), [normalized], [clusters],
+                            {"threshold": args.dedup_threshold, "version": 1}))
+
+    gpt_config = {"model": args.gpt_model,
+                  "prompt": gpt_prompt_version(args) if {"gpt", "cascade"} & set(args.scorers) else None}
+    scorer_configs = {
+        "vader": {"engine": "vader:nltk:v2", "positive": args.positive_threshold,
+                  "negative": args.negative_threshold},
+        "bert": {"cache": bert_namespace(args)},
+        "gpt": gpt_config,
+        "cascade": {"vader_band": args.cascade_vader_band, "bert_confidence": args.cascade_bert_confidence,
+                    "bert": bert_namespace(args), "gpt": gpt_config, "version": 1},
+    }
+    scorer_runs = {"vader": score_vader, "bert": score_bert, "gpt": score_gpt, "cascade": score_cascade}
+    score_paths = []
+    for name in args.scorers:
+        output = path(f"scores_{name}")
+        if name == "vader" or clusters is None:
+            run = scorer_runs[name]
+            inputs = [normalized]
+        else:
+            run = partial(scorer_runs[name], clusters_path=clusters)
+            inputs = [normalized, clusters]
+        stages.append(Stage(f"score_{name}", lambda run=run, output=output: run(args, normalized, output),
+                            inputs, [output], scorer_configs[name]))
+        score_paths.append(output)
+
+    combined = path("news_scored")
+    stages.append(Stage("combine", lambda: combine(normalized, score_paths, combined), [normalized, *score_paths],
+                        [combined], {"scorers": list(args.scorers)}))
+
+    if args.sink != "none":
+        marker = os.path.join(args.workdir, "upload.json")
+        stages.append(Stage("upload", lambda: upload(make_sink(args.sink), combined, marker), [combined], [marker],
+                            {"sink": args.sink}))
+    return Pipeline(stages, args.workdir)
+
+
+def add_scorer_arguments(parser):
+    """The vader/bert/cascade/gpt option groups the scorer functions above read from `args`."""
+    from bert_engine import BACKENDS, LONG_TEXT_MODES, MODEL_NAME
+    from cascade import BERT_CONFIDENCE, VADER_BAND
+    from gpt_classifier import MODEL as GPT_MODEL
+    from vader_engine import NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD
+
+    vader_group = parser.add_argument_group("vader")
+    vader_group.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    vader_group.add_argument("--positive-threshold", type=float, default=POSITIVE_THRESHOLD)
+    vader_group.add_argument("--negative-threshold", type=float, default=NEGATIVE_THRESHOLD)
+
+    bert_group = parser.add_argument_group("bert")
+    bert_group.add_argument("--bert-model", default=MODEL_NAME)
+    bert_group.add_argument("--bert-backend", choices=BACKENDS, default="torch")
+    bert_group.add_argument("--bert-batch-size", type=int, default=32)
+    bert_group.add_argument("--bert-long-text", choices=LONG_TEXT_MODES, default="truncate")
+    bert_group.add_argument("--bert-stride", type=int, default=128)
+    bert_group.add_argument("--bert-max-windows", type=int, default=8)
+    bert_group.add_argument("--bert-server", default=os.getenv("BERT_SERVER_URL", "http://127.0.0.1:8765"))
+    bert_group.add_argument("--bert-workers", type=int, default=1,
+                            help="Score in this many processes, each with its own model (see sharded_scoring.py)")
+    bert_group.add_argument("--bert-threads", type=int, default=1, help="Intra-op threads per --bert-workers process")
+
+    cascade_group = parser.add_argument_group("cascade")
+    cascade_group.add_argument("--cascade-vader-band", type=float, default=VADER_BAND,
+                               help="Send articles with |VADER compound| below this to BERT")
+    cascade_group.add_argument("--cascade-bert-confidence", type=float, default=BERT_CONFIDENCE,
+                               help="Send articles BERT labels with lower probability to GPT")
+
+    gpt_group = parser.add_argument_group("gpt")
+    gpt_group.add_argument("--gpt-model", default=GPT_MODEL)
+    gpt_group.add_argument("--gpt-pack-size", type=int, default=1)
+    gpt_group.add_argument("--gpt-concurrency", type=int, default=8)
+    gpt_group.add_argument("--gpt-base-url", default=os.getenv("OPENAI_BASE_URL"))
+
+
+if __name__ == "__main__":
+    from near_dedup import THRESHOLD
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run the news sentiment pipeline, redoing only stale stages")
+    parser.add_argument("--workdir", default=WORKDIR, help="Where stage outputs and the run state are kept")
+    parser.add_argument("--input", help="Start from this CSV instead of fetching from GNews")
+    parser.add_argument("--scorers", default="vader,bert", help=f"Comma-separated subset of {','.join(SCORERS)}")
+    parser.add_argument("--sink", default="none",
+                        help="'none', 'bigquery[:dataset.table]' or 'sqlite:PATH' for the upload stage")
+    parser.add_argument("--force", action="append", default=[], help="Re-run this stage even if it is current")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the sentiment cache inside scorers")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Score every article with BERT/GPT instead of one per near-duplicate cluster")
+    parser.add_argument("--dedup-threshold", type=float, default=THRESHOLD,
+                        help="Estimated Jaccard similarity at which articles are near-duplicates")
+    parser.add_argument("--metrics-report", default=perf_metrics.REPORT_PATH,
+                        help="Write a JSON performance report here (default: $PERF_REPORT)")
+    parser.add_argument("--metrics-prometheus", default=perf_metrics.PROMETHEUS_PATH,
+                        help="Write Prometheus text-format metrics here (default: $PERF_PROMETHEUS)")
+
+    fetch_group = parser.add_argument_group("fetch")
+    fetch_group.add_argument("--query", action="append", help="Search keyword; repeat for several (default: India)")
+    fetch_group.add_argument("--lang", default="en")
+    fetch_group.add_argument("--country", default="in")
+    fetch_group.add_argument("--max-pages", type=int, default=10)
+
+    add_scorer_arguments(parser)
+    args = parser.parse_args()
+
+    args.scorers = [name.strip() for name in args.scorers.split(",") if name.strip()]
+    unknown = set(args.scorers) - set(SCORERS)
+    if unknown:
+        parser.error(f"Unknown scorers: {', '.join(sorted(unknown))}")
+    os.makedirs(args.workdir, exist_ok=True)
+
+    outcome = build_pipeline(args).run(force=set(args.force), dry_run=args.dry_run)
+    perf_metrics.export(args.metrics_report, args.metrics_prometheus)
+    counts = {status: list(outcome.values()).count(status) for status in ("ran", "pending", "skipped")}
+    print("🏁 " + ", ".join(f"{count} {status}" for status, count in counts.items() if count))
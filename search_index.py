@@ -0,0 +1,96 @@
+import re
+import numpy as np
+import pandas as pd
+import perf_metrics
+
+TOKEN_PATTERN = r"\w+"
+_TOKEN_RE = re.compile(TOKEN_PATTERN)
+
+
+class SearchIndex:
+    """Token-level inverted index over text columns of a frame.
+
+    Postings are stored flat: `positions[offsets[i]:offsets[i + 1]]` holds the
+    sorted row positions containing `vocabulary[i]`. The vocabulary is sorted,
+    so a prefix query is a binary search for the range of matching tokens.
+
+    Query syntax: whitespace-separated terms are ANDed, the word OR separates
+    alternatives, and a trailing * makes a term a prefix match, e.g.
+    ``air india OR aviation*``.
+    """
+
+    def __init__(self, vocabulary, offsets, positions, row_count):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.positions = positions
+        self.row_count = row_count
+
+    @classmethod
+    def build(cls, df, columns=("title", "description")):
+        texts = pd.concat([df[column].dropna().astype(str).set_axis(np.flatnonzero(df[column].notna()))
+                           for column in columns if column in df.columns])
+        tokens = texts.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        codes, vocabulary = pd.factorize(tokens.to_numpy(dtype=object), sort=True)
+        # One posting per (token, row): unique over a combined integer key sorts by token, then row
+        keys = np.unique(codes.astype(np.int64) * len(df) + tokens.index.to_numpy(dtype=np.int64))
+        token_ids = keys // max(len(df), 1)
+        positions = (keys % max(len(df), 1)).astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(token_ids, minlength=len(vocabulary)))])
+        return cls(np.asarray(vocabulary, dtype=object), offsets, positions, len(df))
+
+    @property
+    def nbytes(self):
+        return int(self.offsets.nbytes + self.positions.nbytes + sum(len(token) for token in self.vocabulary) * 2)
+
+    def _postings(self, start, stop):
+        if start >= stop:
+            return np.empty(0, dtype=np.int32)
+        if stop - start == 1:
+            return self.positions[self.offsets[start]:self.offsets[stop]]
+        return np.unique(self.positions[self.offsets[start]:self.offsets[stop]])
+
+    def lookup(self, term):
+        """Row positions for one term; 'foo*' matches every token starting with 'foo'."""
+        term = term.lower()
+        if term.endswith("*"):
+            prefix = term.rstrip("*")
+            start = np.searchsorted(self.vocabulary, prefix, side="left")
+            stop = np.searchsorted(self.vocabulary, prefix + "\U0010ffff", side="left")
+            return self._postings(start, stop)
+        i = np.searchsorted(self.vocabulary, term, side="left")
+        if i < len(self.vocabulary) and self.vocabulary[i] == term:
+            return self._postings(i, i + 1)
+        return np.empty(0, dtype=np.int32)
+
+    def _match_term(self, term):
+        # A term like "india-uk" is split the same way as the indexed text, and its parts ANDed
+        prefix = term.endswith("*")
+        parts = _TOKEN_RE.findall(term.lower())
+        if not parts:
+            return None
+        if prefix:
+            parts[-1] += "*"
+        result = self.lookup(parts[0])
+        for part in parts[1:]:
+            result = np.intersect1d(result, self.lookup(part), assume_unique=True)
+        return result
+
+    def search(self, query):
+        """Sorted row positions matching `query` (usable with DataFrame.iloc)."""
+        with perf_metrics.stage("dashboard_search", items=1), perf_metrics.metrics("dashboard_search").timer():
+            return self._search(query)
+
+    def _search(self, query):
+        matches = []
+        for group in re.split(r"\s+OR\s+", query.strip()):
+            result = None
+            for term in group.split():
+                hits = self._match_term(term)
+                if hits is None:
+                    continue
+                result = hits if result is None else np.intersect1d(result, hits, assume_unique=True)
+            if result is not None:
+                matches.append(result)
+        if not matches:
+            return np.arange(self.row_count)
+        return np.unique(np.concatenate(matches))
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import perf_metrics
+
+DEFAULT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", ".sentiment_cache.sqlite")
+DEFAULT_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "1000000"))
+
+# SQLite caps the number of bound parameters per statement
+_CHUNK = 500
+
+
+def normalize_text(text):
+    """Canonical form used for hashing: NFKC, collapsed whitespace, case kept."""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).split())
+
+
+def cache_key(namespace, text):
+    payload = f"{namespace}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SentimentCache:
+    """On-disk sentiment cache keyed by normalized text hash plus scorer version.
+
+    `namespace` identifies the scorer, model and prompt version (for example
+    "gpt:gpt-3.5-turbo:<prompt hash>"), so changing any of them never serves a
+    stale label. Entries are evicted least-recently-used once the table grows
+    past `max_entries`. The database runs in WAL mode, so several scoring
+    processes can read and write the same file at once.
+    """
+
+    def __init__(self, namespace, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.namespace = namespace
+        # Hits and misses are also reported under the scorer's stage ("vader", "bert", "gpt")
+        self.stage = namespace.split(":", 1)[0]
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment_cache ("
+            " key TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sentiment_cache_lru ON sentiment_cache (last_access)"
+        )
+
+    def get_many(self, texts):
+        """Return a list with (label, score) for cached texts and None for misses."""
+        keys = [cache_key(self.namespace, text) for text in texts]
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _CHUNK):
+                chunk = list(set(keys[i:i + _CHUNK]))
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, label, score FROM sentiment_cache WHERE key IN ({marks})", chunk
+                ).fetchall()
+                found.update((key, (label, score)) for key, label, score in rows)
+                if rows:
+                    hit_keys = [row[0] for row in rows]
+                    self._conn.execute(
+                        f"UPDATE sentiment_cache SET last_access = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        stage_metrics = perf_metrics.metrics(self.stage)
+        stage_metrics.count("cache_hits", hits)
+        stage_metrics.count("cache_misses", len(results) - hits)
+        return results
+
+    def put_many(self, items):
+        """Store (text, label, score) triples and evict the oldest entries if over budget."""
+        now = time.time()
+        rows = [(cache_key(self.namespace, text), label, score, now) for text, label, score in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sentiment_cache (key, label, score, last_access) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                count = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM sentiment_cache WHERE key IN ("
+                        " SELECT key FROM sentiment_cache ORDER BY last_access LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def cached_score(cache, texts, score_fn):
+    """Score `texts` through `cache`, calling `score_fn` only for unseen texts.
+
+    `score_fn(texts)` must return (labels, scores); scores may be None. Misses
+    are de-duplicated before scoring, and 'Unknown' results are not cached so
+    transient errors get retried on the next run.
+    """
+    texts = list(texts)
+    if cache is None:
+        labels, scores = score_fn(texts)
+        return list(labels), list(scores) if scores is not None else [None] * len(texts)
+
+    results = cache.get_many(texts)
+    pending = {}
+    for text, result in zip(texts, results):
+        if result is None:
+            pending.setdefault(normalize_text(text), text)
+
+    if pending:
+        miss_texts = list(pending.values())
+        labels, scores = score_fn(miss_texts)
+        scores = list(scores) if scores is not None else [None] * len(miss_texts)
+        # NaN scores (failed rows) are stored as NULL
+        scores = [None if score is None or score != score else float(score) for score in scores]
+        fresh = {key: (label, score) for key, label, score in zip(pending, labels, scores)}
+        cache.put_many([(text, label, score) for text, label, score in zip(miss_texts, labels, scores)
+                        if label != 'Unknown'])
+        results = [result if result is not None else fresh[normalize_text(text)]
+                   for text, result in zip(texts, results)]
+
+    return [label for label, _ in results], [score for _, score in results]
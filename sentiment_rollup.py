@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import pandas as pd
+import perf_metrics
+from bigquery_delta import row_keys
+from news_io import file_signature, read_news
+
+# Pre-aggregated article counts by day × source × sentiment column × label,
+# kept in SQLite and updated as scored rows are written. The dashboards read
+# these instead of counting labels over the whole archive on every rerun.
+#
+# Each article's fingerprint and current labels are remembered, so re-writing
+# a file only touches the counts of articles that are new or whose labels,
+# day or source changed.
+
+ROLLUP_PATH = os.getenv("ROLLUP_DB_PATH", ".sentiment_rollups.sqlite")
+# Pseudo sentiment column counting articles rather than labels
+ARTICLES = "*"
+UNKNOWN = "unknown"
+
+
+def dataset_name(path):
+    """Rollups are kept per dataset: its absolute path without the .csv/.parquet extension."""
+    return os.path.splitext(os.path.abspath(path))[0]
+
+
+def sentiment_columns(df):
+    return [column for column in df.columns if "sentiment" in column.lower()]
+
+
+def article_groups(df):
+    """Frame of article_key, day, source and every sentiment column's label; one row per row of `df`.
+
+    Every row is counted, as len(df) and value_counts() count them: a repeated
+    article_key gets a '#n' suffix for its n-th repeat. Missing labels stay None
+    and are not counted, like value_counts().
+    """
+    keys = pd.Series(row_keys(df), index=df.index, dtype=object)
+    repeat = keys.groupby(keys, sort=False).cumcount()
+    groups = pd.DataFrame({"article_key": keys.where(repeat == 0, keys + "#" + repeat.astype(str))}, index=df.index)
+    if "publishedAt" in df.columns:
+        groups["day"] = pd.to_datetime(df["publishedAt"], utc=True, errors="coerce").dt.strftime("%Y-%m-%d")
+    else:
+        groups["day"] = UNKNOWN
+    groups["source"] = df["source"].astype("string") if "source" in df.columns else UNKNOWN
+    groups[["day", "source"]] = groups[["day", "source"]].fillna(UNKNOWN)
+    for column in sentiment_columns(df):
+        groups[column] = df[column].astype("string").astype(object).where(df[column].notna(), None)
+    return groups.reset_index(drop=True)
+
+
+def _hash_text(text):
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+def _fingerprints(groups):
+    # Column names are part of the fingerprint so adding a scorer counts as a change
+    columns = [column for column in groups.columns if column != "article_key"]
+    values = groups[columns].astype(str)
+    values.columns = range(len(columns))
+    salt = _hash_text("\x1f".join(columns))
+    return (pd.util.hash_pandas_object(values, index=False).to_numpy() ^ salt).astype("int64")
+
+
+def _contributions(day, source, labels, sign):
+    """Count deltas (sentiment_column, label, day, source, delta) for articles with the given labels dicts."""
+    rows = []
+    for article_day, article_source, article_labels in zip(day, source, labels):
+        rows.append((ARTICLES, ARTICLES, article_day, article_source, sign))
+        rows.extend((column, label, article_day, article_source, sign)
+                    for column, label in article_labels.items() if label is not None)
+    return rows
+
+
+class SentimentRollup:
+    """Incrementally maintained label counts for one dataset."""
+
+    def __init__(self, dataset, path=ROLLUP_PATH):
+        self.dataset = dataset
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS rollup_counts ("
+            " dataset TEXT NOT NULL, sentiment_column TEXT NOT NULL, label TEXT NOT NULL,"
+            " day TEXT NOT NULL, source TEXT NOT NULL, count INTEGER NOT NULL,"
+            " PRIMARY KEY (dataset, sentiment_column, label, day, source));"
+            # What each article is currently counted under, to take it back out when it changes
+            "CREATE TABLE IF NOT EXISTS rollup_articles ("
+            " dataset TEXT NOT NULL, article_key TEXT NOT NULL, fingerprint INTEGER NOT NULL,"
+            " day TEXT NOT NULL, source TEXT NOT NULL, labels TEXT NOT NULL,"
+            " PRIMARY KEY (dataset, article_key));"
+            "CREATE TABLE IF NOT EXISTS rollup_synced ("
+            " dataset TEXT PRIMARY KEY, path TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);"
+            "CREATE TEMP TABLE IF NOT EXISTS incoming (article_key TEXT PRIMARY KEY, fingerprint INTEGER NOT NULL);"
+        )
+
+    @classmethod
+    def for_path(cls, path, db_path=ROLLUP_PATH):
+        return cls(dataset_name(path), db_path)
+
+    def update(self, df, prune=False):
+        """Fold `df`'s scored rows into the counts; returns {"new", "changed", "removed"} article counts.
+
+        Articles already counted with the same day, source and labels only cost
+        a fingerprint lookup. With `prune`, `df` is taken to be the whole
+        dataset and articles no longer in it are taken out of the counts.
+        """
+        groups = article_groups(df)
+        fingerprints = _fingerprints(groups)
+        label_columns = [column for column in groups.columns if column not in ("article_key", "day", "source")]
+        with perf_metrics.stage("rollup", items=len(df)) as stage_metrics, self._conn:
+            self._conn.execute("DELETE FROM incoming")
+            self._conn.executemany("INSERT INTO incoming VALUES (?, ?)",
+                                   zip(groups["article_key"], fingerprints.tolist()))
+            stale = self._conn.execute(
+                "SELECT i.article_key, r.article_key IS NOT NULL, r.day, r.source, r.labels FROM incoming i "
+                "LEFT JOIN rollup_articles r ON r.dataset = ? AND r.article_key = i.article_key "
+                "WHERE r.fingerprint IS NOT i.fingerprint", (self.dataset,)).fetchall()
+            gone = []
+            if prune:
+                gone = self._conn.execute(
+                    "SELECT article_key, day, source, labels FROM rollup_articles r WHERE dataset = ? AND NOT EXISTS "
+                    "(SELECT 1 FROM incoming i WHERE i.article_key = r.article_key)", (self.dataset,)).fetchall()
+            self._conn.execute("DELETE FROM incoming")
+
+            old = [row[2:] for row in stale if row[1]] + [row[1:] for row in gone]
+            deltas = _contributions([row[0] for row in old], [row[1] for row in old],
+                                    [json.loads(row[2]) for row in old], -1)
+            current = groups[groups["article_key"].isin({row[0] for row in stale})]
+            current_labels = current[label_columns].to_dict("records")
+            deltas += _contributions(current["day"], current["source"], current_labels, 1)
+            if deltas:
+                deltas = (pd.DataFrame(deltas, columns=["sentiment_column", "label", "day", "source", "delta"])
+                          .groupby(["sentiment_column", "label", "day", "source"], as_index=False)["delta"].sum())
+                deltas = deltas[deltas["delta"] != 0]
+                self._conn.executemany(
+                    "INSERT INTO rollup_counts (dataset, sentiment_column, label, day, source, count) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (dataset, sentiment_column, label, day, source) "
+                    "DO UPDATE SET count = count + excluded.count",
+                    [(self.dataset, *row) for row in deltas.itertuples(index=False, name=None)])
+                self._conn.execute("DELETE FROM rollup_counts WHERE dataset = ? AND count = 0", (self.dataset,))
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rollup_articles (dataset, article_key, fingerprint, day, source, labels) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                zip([self.dataset] * len(current), current["article_key"],
+                    fingerprints[current.index].tolist(), current["day"], current["source"],
+                    [json.dumps(labels, sort_keys=True) for labels in current_labels]))
+            self._conn.executemany("DELETE FROM rollup_articles WHERE dataset = ? AND article_key = ?",
+                                   [(self.dataset, row[0]) for row in gone])
+
+            summary = {"new": sum(1 for row in stale if not row[1]), "changed": sum(1 for row in stale if row[1]),
+                       "removed": len(gone)}
+            for name, value in summary.items():
+                stage_metrics.count(f"rows_{name}", value)
+        return summary
+
+    def mark_synced(self, path):
+        """Record that the counts describe the current version of the file at `path`."""
+        signature = file_signature(path)
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO rollup_synced (dataset, path, mtime_ns, size) "
+                               "VALUES (?, ?, ?, ?)", (self.dataset, *signature))
+
+    def is_synced(self, path):
+        try:
+            signature = file_signature(path)
+        except FileNotFoundError:
+            return False
+        stored = self._conn.execute("SELECT path, mtime_ns, size FROM rollup_synced WHERE dataset = ?",
+                                    (self.dataset,)).fetchone()
+        return stored == signature
+
+    def sync(self, df, path):
+        """Make the counts match `df`, the full contents of `path`, and mark them current."""
+        summary = self.update(df, prune=True)
+        self.mark_synced(path)
+        return summary
+
+    def _filters(self, start=None, end=None, sources=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(str(start))
+        if end is not None:
+            clauses.append("day <= ?")
+            params.append(str(end))
+        if sources:
+            clauses.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def columns(self):
+        return [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT sentiment_column FROM rollup_counts WHERE dataset = ? AND sentiment_column != ? "
+            "ORDER BY sentiment_column", (self.dataset, ARTICLES))]
+
+    def counts(self, column, start=None, end=None, sources=None):
+        """Articles per label for `column`, largest first; `start`/`end` are inclusive YYYY-MM-DD days."""
+        where, params = self._filters(start, end, sources)
+        rows = self._conn.execute(
+            f"SELECT label, SUM(count) AS n FROM rollup_counts WHERE dataset = ? AND sentiment_column = ?{where} "
+            "GROUP BY label ORDER BY n DESC, label", (self.dataset, column, *params)).fetchall()
+        return pd.Series(dict(rows), dtype="int64", name="count").rename_axis(column)
+
+    def total(self, start=None, end=None, sources=None):
+        return int(self.counts(ARTICLES, start, end, sources).sum())
+
+    def daily(self, column, start=None, end=None, sources=None):
+        """Frame of day, label, count for `column`."""
+        where, params = self._filters(start, end, sources)
+        return pd.read_sql_query(
+            f"SELECT day, label, SUM(count) AS count FROM rollup_counts WHERE dataset = ? AND sentiment_column = ?"
+            f"{where} GROUP BY day, label ORDER BY day, label", self._conn, params=(self.dataset, column, *params))
+
+    def close(self):
+        self._conn.close()
+
+
+def update_rollups(df, path, db_path=ROLLUP_PATH):
+    """After writing `df` as the whole dataset at `path`: bring its rollups up to date."""
+    rollup = SentimentRollup.for_path(path, db_path)
+    try:
+        return rollup.sync(df, path)
+    finally:
+        rollup.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the sentiment rollup tables")
+    parser.add_argument("paths", nargs="+", help="Datasets to roll up (news_with_sentiment.csv, ...)")
+    parser.add_argument("--show", action="store_true", help="Print label counts instead of updating")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.show:
+            rollup = SentimentRollup.for_path(path)
+            print(f"📊 {path}: {rollup.total()} articles{'' if rollup.is_synced(path) else ' (out of date)'}")
+            for column in rollup.columns():
+                print(f"   {column}: " + ", ".join(f"{label} {n}" for label, n in rollup.counts(column).items()))
+            rollup.close()
+        else:
+            summary = update_rollups(read_news(path), path)
+            print(f"✅ {path}: {summary['new']} new, {summary['changed']} changed, {summary['removed']} removed")
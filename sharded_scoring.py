@@ -0,0 +1,205 @@
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+import perf_metrics
+
+# ⚡ Multi-core scoring: texts are split into shards that a pool of worker
+# processes score in parallel. Each worker loads the model once and runs it with
+# `threads` intra-op threads, so workers × threads should match the cores of the
+# host. Results come back in input order, whatever order the shards finish in.
+
+SCORERS = ("vader", "bert")
+MIN_SHARD = 256
+MAX_SHARD = 5000
+_THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_worker_scorer = None
+
+
+class _VaderScorer:
+    def score(self, texts, progress=False):
+        from vader_engine import bucket_compound, compound_scores
+
+        compound = compound_scores(texts)
+        return bucket_compound(compound).tolist(), compound.tolist()
+
+
+def _init_worker(scorer, threads, scorer_kwargs):
+    global _worker_scorer
+    # Before torch/onnxruntime/BLAS create their thread pools
+    for variable in _THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+    if scorer == "vader":
+        _worker_scorer = _VaderScorer()
+        return
+    backend = scorer_kwargs.pop("backend", "torch")
+    if backend == "torch":
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    else:
+        scorer_kwargs["threads"] = threads
+    from bert_engine import make_scorer
+
+    _worker_scorer = make_scorer(backend, **scorer_kwargs)
+
+
+def _score_shard(texts):
+    start = time.perf_counter()
+    labels, scores = _worker_scorer.score(texts)
+    return list(labels), list(scores), os.getpid(), time.perf_counter() - start
+
+
+def shard_size(rows, workers):
+    """About four shards per worker so a slow shard doesn't leave the others idle at the end."""
+    return max(MIN_SHARD, min(MAX_SHARD, math.ceil(rows / max(workers * 4, 1))))
+
+
+class ShardedScorer:
+    """(labels, scores) over `texts` from `workers` processes, each with its own copy of the model.
+
+    `scorer` is 'vader' or 'bert'; `scorer_kwargs` go to bert_engine.make_scorer
+    (backend, model_name, batch_size, long_text, ...). Workers are started on
+    first use and kept until `close()`, so the model is loaded once per worker
+    however many calls are made. At most two shards per worker are in flight.
+    """
+
+    def __init__(self, scorer="bert", workers=None, threads=1, shard_rows=None, **scorer_kwargs):
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer {scorer!r}; choose one of {SCORERS}")
+        self.scorer = scorer
+        self.threads = max(1, threads)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads)
+        self.shard_rows = shard_rows
+        self.scorer_kwargs = scorer_kwargs
+        self._pool = None
+
+    def _get_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._pool is None:
+            if self.scorer == "bert" and self.scorer_kwargs.get("backend") == "onnx":
+                from bert_engine import MODEL_NAME, export_onnx
+
+                # Export here, once, rather than in every worker at the same time
+                export_onnx(self.scorer_kwargs.get("model_name", MODEL_NAME), self.scorer_kwargs.get("quantize", True))
+            # Fresh interpreters: torch's thread pools don't survive a fork
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker,
+                                             initargs=(self.scorer, self.threads, dict(self.scorer_kwargs)))
+        return self._pool
+
+    def score(self, texts, progress=False):
+        texts = list(texts)
+        size = self.shard_rows or shard_size(len(texts), self.workers)
+        shards = [texts[i:i + size] for i in range(0, len(texts), size)]
+        pool = self._get_pool()
+        labels, scores = [], []
+        stage_metrics = perf_metrics.metrics(f"sharded_{self.scorer}")
+        with perf_metrics.stage(f"sharded_{self.scorer}", items=len(texts)):
+            in_flight = deque()
+            pending = iter(shards)
+            for shard in pending:
+                in_flight.append((len(shard), pool.submit(_score_shard, shard)))
+                if len(in_flight) >= 2 * self.workers:
+                    break
+            done = 0
+            while in_flight:
+                rows, future = in_flight.popleft()
+                shard_labels, shard_scores, pid, seconds = future.result()
+                next_shard = next(pending, None)
+                if next_shard is not None:
+                    in_flight.append((len(next_shard), pool.submit(_score_shard, next_shard)))
+                labels.extend(shard_labels)
+                scores.extend(shard_scores)
+                stage_metrics.observe(seconds, rows)
+                done += 1
+                if progress:
+                    print(f"⚡ Shard {done}/{len(shards)}: {rows} rows in {seconds:.1f}s (worker {pid})")
+            stage_metrics.count("shards", len(shards))
+        return labels, scores
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import numpy as np
+    import pandas as pd
+    from bert_engine import BACKENDS, LONG_TEXT_MODES, MODEL_NAME
+    from news_io import read_news, write_news
+    from sentiment_cache import SentimentCache, cached_score
+    from sentiment_rollup import update_rollups
+    from vader_engine import bucket_compound
+
+    parser = argparse.ArgumentParser(description="Score a large dataset on every core with a pool of scorer processes")
+    parser.add_argument("--input", default="gnews_output.csv")
+    parser.add_argument("--output", help="Default: news_with_bert_sentiment.csv / news_with_sentiment.csv")
+    parser.add_argument("--scorer", choices=SCORERS, default="bert")
+    parser.add_argument("--workers", type=int, help="Scorer processes (default: cores / --threads)")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per worker")
+    parser.add_argument("--shard-rows", type=int, help="Texts per shard (default: about four shards per worker)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--batch-size", type=int, default=32, help="Articles per forward pass")
+    parser.add_argument("--long-text", choices=LONG_TEXT_MODES, default="truncate")
+    parser.add_argument("--stride", type=int, default=128)
+    parser.add_argument("--max-windows", type=int, default=8)
+    parser.add_argument("--no-cache", action="store_true", help="Re-score every row instead of using the sentiment cache")
+    args = parser.parse_args()
+
+    if args.scorer == "bert":
+        # Same labels as news_sentiment_BERT.py, so the same cache namespace
+        namespace = f"bert:{args.model}:v1" if args.backend == "torch" else f"bert:{args.model}:{args.backend}-int8:v1"
+        if args.long_text == "window":
+            namespace += f":window-{args.stride}-{args.max_windows}"
+        scorer = ShardedScorer("bert", args.workers, args.threads, args.shard_rows, backend=args.backend,
+                               model_name=args.model, batch_size=args.batch_size, long_text=args.long_text,
+                               stride=args.stride, max_windows=args.max_windows)
+        output = args.output or "news_with_bert_sentiment.csv"
+    else:
+        import nltk
+
+        nltk.download("vader_lexicon", quiet=True)
+        namespace = "vader:nltk:v2"
+        scorer = ShardedScorer("vader", args.workers, 1, args.shard_rows)
+        output = args.output or "news_with_sentiment.csv"
+    cache = None if args.no_cache else SentimentCache(namespace)
+
+    df = read_news(args.input)
+    print(f"⚡ {len(df)} rows on {scorer.workers} workers × {scorer.threads} threads")
+    start = time.perf_counter()
+    with scorer:
+        score_fn = lambda texts: scorer.score(texts, progress=True)  # noqa: E731
+        if args.scorer == "bert":
+            df["bert_sentiment"] = cached_score(cache, df["description"].astype(str).tolist(), score_fn)[0]
+        else:
+            # Each distinct title/description once, like vader_engine.score_columns
+            codes, uniques = pd.factorize(pd.Series(np.concatenate(
+                [df[column].to_numpy(dtype=object) for column in ("title", "description")]), dtype=object))
+            unique_scores = np.asarray(cached_score(cache, [str(text) for text in uniques], score_fn)[1],
+                                       dtype=np.float64)
+            scores = np.full(len(codes), np.nan)
+            scores[codes >= 0] = unique_scores[codes[codes >= 0]]
+            df["sentiment_title"], df["sentiment_description"] = np.split(bucket_compound(scores), 2)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {len(df)} rows in {elapsed:.1f}s ({len(df) / max(elapsed, 1e-9):.0f} rows/s)")
+
+    written = write_news(df, output)
+    update_rollups(df, written)
+    print(f"💾 Saved to {written}")
+
+    # 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+    perf_metrics.export()
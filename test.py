@@ -1,7 +1,8 @@
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from dotenv import load_dotenv
-import pandas as pd
+from bigquery_delta import BigQuerySink, upload_delta
+from news_io import read_news
 import os
 
 # 🔐 Load environment variables from .env
@@ -23,10 +24,9 @@ if not credentials_path or not os.path.exists(credentials_path):
 # 🔑 Load service account credentials
 credentials = service_account.Credentials.from_service_account_file(credentials_path)
 
-# 📄 Load CSV data
-csv_file = "news_with_bert_sentiment.csv"
-df = pd.read_csv(csv_file)
-print(f"📄 Total rows in CSV: {len(df)}")
+# 📄 Load scored data (Parquet, or the CSV if that is newer)
+df = read_news("news_with_bert_sentiment.csv")
+print(f"📄 Total rows in dataset: {len(df)}")
 
 # 🚀 Initialize BigQuery client
 client = bigquery.Client(credentials=credentials, project=project_id)
@@ -45,9 +45,9 @@ except Exception:
     client.create_dataset(dataset)
     print("✅ Dataset created.")
 
-# ⬆️ Upload DataFrame to BigQuery
+# ⬆️ Upload DataFrame to BigQuery (only rows not loaded before, merged on article_key)
 table_ref = dataset_ref.table(table_id)
-job = client.load_table_from_dataframe(df, table_ref, location="asia-south1")
-job.result()  # Wait for upload to finish
+summary = upload_delta(df, BigQuerySink(client, table_ref, location="asia-south1"))
+print(f"🔁 {summary['new']} new, {summary['changed']} changed, {summary['skipped']} already loaded")
 
 print("✅ Data uploaded successfully to BigQuery!")
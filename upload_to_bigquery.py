@@ -1,9 +1,16 @@
+import argparse
 from google.cloud import bigquery
 from google.oauth2 import service_account
-import pandas as pd
+from bigquery_delta import BigQuerySink, upload_delta
+import perf_metrics
+from news_io import read_news
 # from dotenv import load_dotenv
 import os
 
+parser = argparse.ArgumentParser(description="Upload new and changed scored rows to BigQuery")
+parser.add_argument("--repartition", action="store_true",
+                    help="First rewrite an existing unpartitioned table as partitioned on publishedAt and clustered")
+args = parser.parse_args()
 
 # 🔐 Load environment variables
 # load_dotenv()
@@ -25,8 +32,8 @@ dataset_id = 'news_dataset_asia'
 table_id = 'news_with_sentiment'
 
 # 📄 Load CSV file
-df = pd.read_csv("news_with_bert_sentiment.csv")
-print(f"📄 Total rows in CSV: {len(df)}")
+df = read_news("news_with_bert_sentiment.csv")
+print(f"📄 Total rows in dataset: {len(df)}")
 
 # 🚀 Initialize BigQuery client
 client = bigquery.Client(credentials=credentials, project=project_id)
@@ -45,9 +52,18 @@ except Exception as e:
     client.create_dataset(dataset)
     print("✅ Dataset created successfully.")
 
-# ⬆️ Upload DataFrame to BigQuery table
+# ⬆️ Upload DataFrame to BigQuery table (only rows not loaded before, merged on article_key)
 table_ref = dataset_ref.table(table_id)
-job = client.load_table_from_dataframe(df, table_ref, location="asia-south1")
-job.result()  # Wait for the job to complete
+sink = BigQuerySink(client, table_ref, location="asia-south1")
+if args.repartition:
+    if sink.repartition():
+        print("✅ Table rewritten as partitioned on publishedAt and clustered on source/sentiment.")
+    else:
+        print("✅ Table is already partitioned.")
+summary = upload_delta(df, sink)
+print(f"🔁 {summary['new']} new, {summary['changed']} changed, {summary['skipped']} already loaded")
 
 print("✅ Data uploaded successfully to BigQuery!")
+
+# 📈 Performance report (set PERF_REPORT / PERF_PROMETHEUS)
+perf_metrics.export()
@@ -0,0 +1,252 @@
+import string
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+import perf_metrics
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+# Below this many distinct texts a process pool costs more than it saves
+_MIN_PARALLEL_TEXTS = 5000
+# Texts per latency sample when scoring in-process
+_LATENCY_SLICE = 256
+
+_vader = None
+
+
+_PUNCTUATION = frozenset(string.punctuation)
+_SO_THIS = ("so", "this")
+
+
+class FastSentimentIntensityAnalyzer(SentimentIntensityAnalyzer):
+    """VADER analyzer whose `compound()` equals NLTK's `polarity_scores(text)["compound"]`, faster.
+
+    NLTK builds a dict of every (word, punctuation) combination per text just
+    to strip punctuation off tokens, lower-cases each word several times and
+    runs the full rule chain for every token. Here tokens are stripped
+    directly, lower-cased once, and only words in the lexicon go through the
+    rules: every other token scores 0 in NLTK too. `stock_mismatches()` checks
+    the result against NLTK itself.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        constants = self.constants
+        self._punc_list = frozenset(constants.PUNC_LIST)
+        self._negate = frozenset(constants.NEGATE)
+        # Every idiom and two-word booster contains one of these adjacent word pairs
+        phrases = list(constants.SPECIAL_CASE_IDIOMS) + [key for key in constants.BOOSTER_DICT if " " in key]
+        self._phrase_pairs = {}
+        for phrase in phrases:
+            words = phrase.split()
+            for head, tail in zip(words, words[1:]):
+                self._phrase_pairs.setdefault(head, set()).add(tail)
+        # Lower-cased tokens that can change a lexicon word's valence within three positions of it
+        self._modifiers = frozenset(constants.BOOSTER_DICT) | self._negate | {"never", "so", "this", "least"}
+
+    def _phrase_at(self, lower, k):
+        """Whether lower-cased tokens k and k + 1 are adjacent words of an idiom or two-word booster."""
+        return k + 1 < len(lower) and lower[k + 1] in self._phrase_pairs.get(lower[k], ())
+
+    def tokens(self, text):
+        """SentiText.words_and_emoticons: tokens over one character, with leading/trailing punctuation stripped."""
+        wes = [we for we in text.split() if len(we) > 1]
+        edges = [i for i, we in enumerate(wes) if we[0] in _PUNCTUATION or we[-1] in _PUNCTUATION]
+        words_only = None
+        for i in edges:
+            we = wes[i]
+            for word in (we.rstrip(string.punctuation), we.lstrip(string.punctuation)):
+                if word == we:
+                    continue
+                affix = we[len(word):] if we.startswith(word) else we[:len(we) - len(word)]
+                if affix not in self._punc_list:
+                    continue
+                # A bare word over one character is its own punctuation-free token
+                if len(word) < 2 or not _PUNCTUATION.isdisjoint(word):
+                    if words_only is None:
+                        words_only = {w for w in self.constants.REGEX_REMOVE_PUNCTUATION.sub("", text).split()
+                                      if len(w) > 1}
+                    if word not in words_only:
+                        continue
+                wes[i] = word
+                break
+        return wes
+
+    def _negated(self, lower_word):
+        return lower_word in self._negate or "n't" in lower_word
+
+    def _valence(self, words, lower, i, is_cap_diff):
+        """NLTK's sentiment_valence for the lexicon word at position `i`."""
+        constants, lexicon, boosters = self.constants, self.lexicon, self.constants.BOOSTER_DICT
+        valence = lexicon[lower[i]]
+        if is_cap_diff and words[i].isupper():
+            valence = valence + constants.C_INCR if valence > 0 else valence - constants.C_INCR
+        for start_i in range(3):
+            k = i - start_i - 1
+            if k < 0 or lower[k] in lexicon:
+                continue
+            if lower[k] in boosters:
+                scalar = boosters[lower[k]]
+                if valence < 0:
+                    scalar *= -1
+                if words[k].isupper() and is_cap_diff:
+                    scalar = scalar + constants.C_INCR if valence > 0 else scalar - constants.C_INCR
+                if start_i == 1:
+                    scalar = scalar * 0.95
+                elif start_i == 2:
+                    scalar = scalar * 0.9
+                valence = valence + scalar
+            # _never_check
+            if start_i == 0:
+                if self._negated(lower[k]):
+                    valence = valence * constants.N_SCALAR
+            elif start_i == 1:
+                if words[i - 2] == "never" and words[i - 1] in _SO_THIS:
+                    valence = valence * 1.5
+                elif self._negated(lower[k]):
+                    valence = valence * constants.N_SCALAR
+            else:
+                if (words[i - 3] == "never" and words[i - 2] in _SO_THIS) or words[i - 1] in _SO_THIS:
+                    valence = valence * 1.25
+                elif self._negated(lower[k]):
+                    valence = valence * constants.N_SCALAR
+                if any(self._phrase_at(lower, m) for m in range(i - 3, i + 2)):
+                    valence = self._idioms_check(valence, words, i)
+        # _least_check
+        if i > 1 and lower[i - 1] not in lexicon and lower[i - 1] == "least":
+            if lower[i - 2] != "at" and lower[i - 2] != "very":
+                valence = valence * constants.N_SCALAR
+        elif i > 0 and lower[i - 1] not in lexicon and lower[i - 1] == "least":
+            valence = valence * constants.N_SCALAR
+        return valence
+
+    def compound(self, text):
+        words = self.tokens(text)
+        lower = [word.lower() for word in words]
+        lexicon, boosters, modifiers = self.lexicon, self.constants.BOOSTER_DICT, self._modifiers
+        hits = [j for j, word in enumerate(lower) if word in lexicon]
+        if not hits:
+            return 0.0
+        n = len(words)
+        allcaps = sum(map(str.isupper, words))
+        is_cap_diff = 0 < n - allcaps < n
+        phrase_pairs = self._phrase_pairs
+        negation = "'" in text
+        marked = [m for m, word in enumerate(lower)
+                  if word in modifiers or (negation and "n't" in word)
+                  or (word in phrase_pairs and self._phrase_at(lower, m))]
+        # Lexicon words with a modifier from three before to two after them need the full rules
+        ruled = {m + d for m in marked for d in range(-2, 4)}
+        but = lower.index("but") if "but" in lower else None
+        first = {}
+        sum_s = 0
+        for j in hits:
+            # NLTK scores a repeated token in the context of its first occurrence (itself a hit)
+            i = first.setdefault(words[j], j)
+            if i not in ruled:
+                valence = lexicon[lower[i]]
+                if is_cap_diff and words[i].isupper():
+                    valence = valence + self.constants.C_INCR if valence > 0 else valence - self.constants.C_INCR
+            elif lower[i] in boosters or (lower[i] == "kind" and i < n - 1 and lower[i + 1] == "of"):
+                continue
+            else:
+                valence = self._valence(words, lower, i, is_cap_diff)
+            if but is not None and j != but:
+                valence = valence * 0.5 if j < but else valence * 1.5
+            sum_s += valence
+        sum_s = float(sum_s)
+        if sum_s:
+            amplifier = self._punctuation_emphasis(sum_s, text)
+            sum_s = sum_s + amplifier if sum_s > 0 else sum_s - amplifier
+        return round(self.constants.normalize(sum_s), 4)
+
+
+def _get_vader():
+    global _vader
+    if _vader is None:
+        _vader = FastSentimentIntensityAnalyzer()
+    return _vader
+
+
+def _compound(text):
+    return _get_vader().compound(text)
+
+
+def _compound_many(texts, n_jobs):
+    stage_metrics = perf_metrics.metrics("vader")
+    if n_jobs > 1 and len(texts) >= _MIN_PARALLEL_TEXTS:
+        with stage_metrics.timer(len(texts)), Pool(n_jobs) as pool:
+            return pool.map(_compound, texts, chunksize=max(1, len(texts) // (n_jobs * 8)))
+    scores = []
+    # Timed in slices so the latency percentiles mean something without a clock call per text
+    for i in range(0, len(texts), _LATENCY_SLICE):
+        with stage_metrics.timer(len(texts[i:i + _LATENCY_SLICE])):
+            scores.extend(_compound(text) for text in texts[i:i + _LATENCY_SLICE])
+    return scores
+
+
+def compound_scores(texts, n_jobs=1, cache=None):
+    """Return a float64 array of VADER compound scores, NaN where the text is missing.
+
+    Each distinct text is scored once, so repeated headlines and syndicated
+    descriptions are scored a single time. With `n_jobs > 1` the
+    distinct texts are spread over a process pool, and with a `SentimentCache`
+    only texts never seen before are scored at all.
+    """
+    with perf_metrics.stage("vader") as stage_metrics:
+        codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+        uniques = [str(text) for text in uniques]
+        stage_metrics.add_items(len(codes))
+        stage_metrics.count("unique_texts", len(uniques))
+
+        if cache is None:
+            unique_scores = _compound_many(uniques, n_jobs)
+        else:
+            from sentiment_cache import cached_score
+
+            def score_texts(batch):
+                values = np.asarray(_compound_many(batch, n_jobs), dtype=np.float64)
+                return bucket_compound(values).tolist(), values
+
+            unique_scores = cached_score(cache, uniques, score_texts)[1]
+
+    unique_scores = np.asarray(unique_scores, dtype=np.float64)
+    scores = np.full(len(codes), np.nan)
+    present = codes >= 0
+    scores[present] = unique_scores[codes[present]]
+    return scores
+
+
+def stock_mismatches(texts):
+    """Texts whose label from FastSentimentIntensityAnalyzer differs from NLTK's own analyzer.
+
+    The fast analyzer re-implements NLTK's rules, so this is the check to run
+    after an nltk upgrade (benchmark_suite.py runs it with the VADER benchmark).
+    """
+    stock = SentimentIntensityAnalyzer()
+    texts = [str(text) for text in texts]
+    fast = bucket_compound([_compound(text) for text in texts])
+    expected = bucket_compound([stock.polarity_scores(text)["compound"] for text in texts])
+    return [text for text, a, b in zip(texts, fast, expected) if a != b]
+
+
+def bucket_compound(scores, positive=POSITIVE_THRESHOLD, negative=NEGATIVE_THRESHOLD):
+    """Map compound scores to Positive/Negative/Neutral; NaN (missing text) is Neutral."""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select(
+        [np.isnan(scores), scores >= positive, scores <= negative],
+        ["Neutral", "Positive", "Negative"],
+        default="Neutral",
+    )
+
+
+def score_columns(df, columns, n_jobs=1, cache=None):
+    """Score several text columns in one pass, sharing work between them.
+
+    Returns a dict of column name -> compound score array aligned with `df`.
+    """
+    stacked = np.concatenate([df[column].to_numpy(dtype=object) for column in columns])
+    scores = compound_scores(stacked, n_jobs=n_jobs, cache=cache)
+    return dict(zip(columns, np.split(scores, len(columns))))